@@ -95,6 +95,7 @@ import copy
 from operator import itemgetter
 
 from nltk.internals import read_str, raise_unorderable_types
+from nltk.util import LRUCache
 from nltk.sem.logic import (Variable, Expression, SubstituteBindingsI,
                             LogicParser, LogicalExpressionException)
 from nltk.compat import (string_types, integer_types, total_ordering,
@@ -272,6 +273,18 @@ class FeatStruct(SubstituteBindingsI):
             self._hash = self._calculate_hashvalue(set())
             return self._hash
 
+    def __getstate__(self):
+        """
+        The cached hash value is not pickled, since string hashes differ
+        between processes; it is recalculated on demand after unpickling.
+        """
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
     def _equal(self, other, check_reentrance, visited_self,
                visited_other, visited_pairs):
         """
@@ -1342,48 +1355,34 @@ def unify(fstruct1, fstruct2, bindings=None, trace=False,
     forward = {}
 
     if EXPRESSION in fstruct1 or EXPRESSION in fstruct2:
-        fstructs1 = []
-        fstructs2 = []
-        if EXPRESSION in fstruct1:
-            simp_expressions = simplify_expression(fstruct1[EXPRESSION])
-            if isinstance(simp_expressions, dict):
-                simp_expressions = list(simp_expressions)
-            for ex in simp_expressions:
-                fstructcopy = fstruct1.copy()
-
-                del fstructcopy[EXPRESSION]
-                fstructcopy.update(ex)
-                fstructs1.append(fstructcopy)
-        else:
-            fstructs1.append(fstruct1.copy())
-
-        if EXPRESSION in fstruct2:
-            simp_expressions = simplify_expression(fstruct2[EXPRESSION])
-            if isinstance(simp_expressions, dict):
-                simp_expressions = list(simp_expressions)
-            for ex in simp_expressions:
-                fstructcopy = fstruct2.copy()
-
-                del fstructcopy[EXPRESSION]
-                fstructcopy.update(ex)
-                fstructs2.append(fstructcopy)
-        else:
-            fstructs2.append(fstruct2.copy())
+        disjuncts1 = _expression_disjuncts(fstruct1, fs_class)
+        disjuncts2 = _expression_disjuncts(fstruct2, fs_class)
 
         #get all matches, then combine them in results
         results = set()
-        for fs1 in fstructs1:
-            for fs2 in fstructs2:
+        trail = []
+        for case1, fmap1, vars1 in disjuncts1:
+            for case2, fmap2, vars2 in disjuncts2:
+                # check the pair without copying; most pairs fail here.  A
+                # fail function may resolve conflicts and trace shows every
+                # pair, so both need the full unification.
+                if fail is None and not trace:
+                    renamed = vars1 & vars2 if rename_vars else ()
+                    compatible = _trial_unify(fmap1, fmap2, bindings, trail, renamed, fs_class, treatBool)
+                    _undo_trail(bindings, trail)
+                    if not compatible:
+                        continue
+
+                fs1 = _expression_case(fstruct1, case1)
+                fs2 = _expression_case(fstruct2, case2)
                 bindings_copy = copy.deepcopy(bindings)
                 if rename_vars:
-                    vars1 = find_variables(fs1, fs_class)
-                    vars2 = find_variables(fs2, fs_class)
-                    _rename_variables(fs2, vars1, vars2, {}, fs_class, set())
+                    _rename_variables(fs2, vars1, set(vars2), {}, fs_class, set())
 
                 # Do the actual unification.  If it fails, return None.
                 if trace: _trace_unify_start((), fs1, fs2)
                 try:
-                    fs1_fs2 = _destructively_unify(fs1.copy(), fs2.copy(), bindings_copy, {}, trace, fail, fs_class, (), treatBool)
+                    fs1_fs2 = _destructively_unify(fs1, fs2, bindings_copy, {}, trace, fail, fs_class, (), treatBool)
                     if fs1_fs2 is not UnificationFailure:
                         bindings.update(bindings_copy)
                         results.add(fs1_fs2)
@@ -1445,6 +1444,239 @@ def unify(fstruct1, fstruct2, bindings=None, trace=False,
     if trace: _trace_bindings((), bindings)
     return result
 
+def _expression_disjuncts(fstruct, fs_class):
+    """
+    :return: a list of ``(case, fmap, variables)`` triples, one for each case of the
+        simplified ``EXPRESSION`` of ``fstruct``.  ``fmap`` is a flat read-only view of
+        ``fstruct`` with the case applied, which is used by ``_trial_unify``.  Without an
+        expression, the only triple is ``(None, fstruct, variables)``.
+    """
+    from nltk.topology.FeatTree import expression_cases
+
+    if EXPRESSION not in fstruct:
+        return [(None, fstruct, find_variables(fstruct, fs_class))]
+    disjuncts = []
+    for case in expression_cases(fstruct):
+        fmap = dict(fstruct)
+        del fmap[EXPRESSION]
+        fmap.update(case)
+        disjuncts.append((case, fmap, _variables(fmap, set(), fs_class, set())))
+    return disjuncts
+
+def _expression_case(fstruct, case):
+    """
+    :return: a copy of ``fstruct`` with its ``EXPRESSION`` replaced by the features of ``case``
+    """
+    fstructcopy = fstruct.copy()
+    if case is not None:
+        del fstructcopy[EXPRESSION]
+        fstructcopy.update(case)
+    return fstructcopy
+
+def _trial_unify(fmap1, fmap2, bindings, trail, renamed, fs_class, treatBool):
+    """
+    Check whether ``_destructively_unify`` could unify two flat feature maps, without
+    modifying or copying them.  Variables bound by the check are added to ``bindings``
+    and their previous values are pushed onto ``trail``, so that the caller can restore
+    the bindings with ``_undo_trail``.  Variables of ``fmap2`` in ``renamed`` would be
+    renamed before the unification, so they match any value.
+
+    Without a ``fail`` function, the check never rejects a pair that unifies; with one,
+    conflicting values may still be resolved, so ``unify`` skips the check.  Nested
+    feature structures and values with custom unification are not inspected, so it may
+    accept pairs that do not.
+    """
+    for fname, fval2 in fmap2.items():
+        if fname in fmap1:
+            if not _trial_unify_values(fname, fmap1[fname], fval2, bindings, trail, renamed, fs_class):
+                return False
+        elif treatBool and fval2 is True and getattr(fname, 'default', None) is None:
+            return False
+    return True
+
+def _trial_unify_values(fname, fval1, fval2, bindings, trail, renamed, fs_class):
+    """
+    Read-only counterpart of ``_unify_feature_values`` used by ``_trial_unify``.
+    """
+    if isinstance(fval2, Variable) and fval2 in renamed:
+        return True
+
+    fvar1 = fvar2 = None
+    while isinstance(fval1, Variable) and fval1 in bindings:
+        fvar1 = fval1
+        fval1 = bindings[fval1]
+    while isinstance(fval2, Variable) and fval2 in bindings:
+        fvar2 = fval2
+        fval2 = bindings[fval2]
+
+    if isinstance(fval1, Variable) and isinstance(fval2, Variable):
+        if fval1 != fval2:
+            _bind_on_trail(bindings, trail, fval2, fval1)
+        return True
+    elif isinstance(fval1, Variable):
+        _bind_on_trail(bindings, trail, fval1, fval2)
+        return True
+    elif isinstance(fval2, Variable):
+        _bind_on_trail(bindings, trail, fval2, fval1)
+        return True
+
+    if isinstance(fval1, fs_class) or isinstance(fval2, fs_class):
+        # nested structures and structure/value clashes are left to _destructively_unify
+        return True
+    elif isinstance(fname, Feature):
+        if type(fname) is not Feature:
+            return True
+        result = fval1 if fval1 == fval2 else UnificationFailure
+    elif (isinstance(fval1, (CustomFeatureValue, SubstituteBindingsI)) or
+          isinstance(fval2, (CustomFeatureValue, SubstituteBindingsI))):
+        return True
+    elif fval1 == fval2:
+        result = fval1
+    elif not (isinstance(fval1, str) and isinstance(fval2, str)) and (isinstance(fval1, Iterable) or isinstance(fval2, Iterable)):
+        fval1s = set(fval1) if not isinstance(fval1, str) and isinstance(fval1, Iterable) else {fval1}
+        fval2s = set(fval2) if not isinstance(fval2, str) and isinstance(fval2, Iterable) else {fval2}
+        inter = fval1s.intersection(fval2s)
+        if not inter:
+            return False
+        result = tuple(inter) if len(inter) > 1 else inter.pop()
+    else:
+        return False
+
+    if result is UnificationFailure:
+        return False
+    # bound variables are narrowed to the unified value, as _unify_feature_values does
+    if fvar1 is not None:
+        _bind_on_trail(bindings, trail, fvar1, result)
+    if fvar2 is not None and fvar2 != fvar1:
+        _bind_on_trail(bindings, trail, fvar2, result)
+    return True
+
+# marks a variable that was unbound before _trial_unify bound it
+_UNBOUND = object()
+
+def _bind_on_trail(bindings, trail, var, value):
+    trail.append((var, bindings.get(var, _UNBOUND)))
+    bindings[var] = value
+
+def _undo_trail(bindings, trail):
+    """
+    Restore the bindings changed by ``_trial_unify`` and empty the trail.
+    """
+    while trail:
+        var, value = trail.pop()
+        if value is _UNBOUND:
+            del bindings[var]
+        else:
+            bindings[var] = value
+
+# default number of unification results kept by a UnificationCache
+UNIFICATION_CACHE_SIZE = 8192
+
+# marks a pair that is not in a UnificationCache
+_NOT_CACHED = object()
+
+def _is_unfrozen(value):
+    """
+    :return: True if the value is or contains a feature structure, which is not frozen
+    """
+    if isinstance(value, FeatStruct):
+        return not value.frozen()
+    if isinstance(value, (tuple, frozenset)):
+        return any(_is_unfrozen(element) for element in value)
+    return False
+
+class UnificationCache(object):
+    """
+    Bounded memo of ``unify`` for frozen feature structures, keyed by the
+    structures themselves, i.e. by their structural hash and equality.
+    Failures are cached as well.  Unlike ``unify``, the results are frozen,
+    on a miss too, since they are shared by all callers; a caller that
+    modifies a result must ``copy`` it first.
+
+    With ``bindings``, the key includes the bindings and the cache stores the
+    bindings added or changed by the unification, which are applied to
+    ``bindings`` again on a hit.  Unfrozen structures, bindings to unfrozen
+    structures and unhashable bindings are unified without the cache, since
+    hashing a ``FeatStructNonterminal`` would freeze it.
+
+        >>> from nltk.featstruct import FeatStruct, UnificationCache
+        >>> cache = UnificationCache(maxsize=16)
+        >>> fs1, fs2 = FeatStruct('[a=?x]'), FeatStruct('[a=1, b=2]')
+        >>> fs1.freeze(); fs2.freeze()
+        >>> cache.unify(fs1, fs2) == cache.unify(fs1, fs2)
+        True
+        >>> bindings = {}
+        >>> cache.unify(fs1, fs2, bindings)
+        [a=1, b=2]
+        >>> bindings
+        {Variable('?x'): 1}
+        >>> cache.hits, cache.misses
+        (1, 2)
+
+    :param maxsize: the maximal number of cached pairs
+    :param unify_args: further keyword arguments of ``unify``, e.g. ``treatBool``
+    """
+
+    def __init__(self, maxsize=UNIFICATION_CACHE_SIZE, **unify_args):
+        self._cache = LRUCache(maxsize)
+        self._unify_args = unify_args
+
+    def unify(self, fstruct1, fstruct2, bindings=None):
+        if not (fstruct1.frozen() and fstruct2.frozen()):
+            return unify(fstruct1, fstruct2, bindings, **self._unify_args)
+        if bindings is not None:
+            if any(_is_unfrozen(value) for value in bindings.values()):
+                return unify(fstruct1, fstruct2, bindings, **self._unify_args)
+            try:
+                key = (fstruct1, fstruct2, frozenset(bindings.items()))
+                hash(key)
+            except TypeError:
+                return unify(fstruct1, fstruct2, bindings, **self._unify_args)
+        else:
+            key = (fstruct1, fstruct2)
+
+        cached = self._cache.get(key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            result, delta = cached
+            if delta:
+                bindings.update(delta)
+            return result
+
+        previous = dict(bindings) if bindings else {}
+        result = unify(fstruct1, fstruct2, bindings, **self._unify_args)
+        if result is not None:
+            result.freeze()
+        delta = None
+        if bindings is not None:
+            delta = dict((var, value) for (var, value) in bindings.items()
+                         if var not in previous or previous[var] != value)
+        self._cache[key] = (result, delta)
+        return result
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    def hit_rate(self):
+        return self._cache.hit_rate()
+
+    def maxsize(self):
+        return self._cache.maxsize()
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __repr__(self):
+        return '<UnificationCache with %d/%s pairs, %d hits, %d misses>' % (
+            len(self._cache), self._cache.maxsize(), self.hits, self.misses)
+
 class _UnificationFailureError(Exception):
     """An exception that is used by ``_destructively_unify`` to abort
     unification when a failure is encountered."""
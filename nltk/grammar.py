@@ -76,13 +76,14 @@ import re
 import itertools
 
 from nltk.topology.compassFeat import GRAM_FUNC_FEATURE, INHERITED_FEATURE, STATUS_FEATURE, \
-    NUMBER_FEATURE, PERSON_FEATURE
+    NUMBER_FEATURE, PERSON_FEATURE, BRANCH_FEATURE, FACULTATIVE_FEATURE
 
 from nltk.util import transitive_closure, invert_graph
 from nltk.compat import (string_types, total_ordering, python_2_unicode_compatible, unicode_repr)
 from nltk.internals import raise_unorderable_types
 from nltk.probability import ImmutableProbabilisticMixIn
-from nltk.featstruct import FeatStruct, FeatDict, FeatStructReader, SLASH, TYPE, EXPRESSION, unify
+from nltk.featstruct import FeatStruct, FeatDict, FeatStructReader, SLASH, TYPE, EXPRESSION, unify, Feature, \
+    CustomFeatureValue
 
 #################################################################
 # Nonterminal
@@ -150,6 +151,16 @@ class Nonterminal(object):
     def __hash__(self):
         return self._hash
 
+    def __getstate__(self):
+        # string hashes differ between processes, so the hash is recalculated on unpickling
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._hash = hash(self._symbol)
+
     def __repr__(self):
         """
         Return a string representation for this ``Nonterminal``.
@@ -213,6 +224,52 @@ class FeatStructNonterminal(FeatDict, Nonterminal):
         self.freeze()
         return FeatStruct.__hash__(self)
 
+    def _freeze(self, visited):
+        # the signature and expression cases of a structure that was unfrozen and modified are outdated
+        self.__dict__.pop('_signature', None)
+        self.__dict__.pop('_expression_cases', None)
+        FeatDict._freeze(self, visited)
+
+    def __getstate__(self):
+        # signature bits are numbered per process
+        state = FeatDict.__getstate__(self)
+        state.pop('_signature', None)
+        return state
+
+    def signature(self):
+        """
+        :return: a map from the features with atomic values to a bitset of their possible values.
+            A disjunctive expression contributes the union of the values of its cases; a feature is
+            left out if a case does not constrain it, e.g. it is missing or a variable.
+            The signature is cached while the nonterminal is frozen.
+        """
+        if not self._frozen:
+            return _signature(self)
+        try:
+            return self._signature
+        except AttributeError:
+            self._signature = _signature(self)
+            return self._signature
+
+    def compatible(self, other, ignore=()):
+        """
+        Cheap check before unification, which compares the signatures of two nonterminals like
+        ``test_unify`` compares atomic values and value sets. Sets are compatible if they overlap,
+        as ``unify`` intersects them, so a pair rejected here never unifies.
+
+        :param ignore: features which are not compared, e.g. features filtered before unification
+        :return: False if the nonterminals can not be unified
+        """
+        signature1 = self.signature()
+        signature2 = other.signature()
+        if len(signature2) < len(signature1):
+            signature1, signature2 = signature2, signature1
+        for fname, bits in signature1.items():
+            other_bits = signature2.get(fname)
+            if other_bits is not None and not bits & other_bits and fname not in ignore:
+                return False
+        return True
+
     def symbol(self):
         return self
 
@@ -272,13 +329,19 @@ class FeatStructNonterminal(FeatDict, Nonterminal):
             self.update(feature_map)
 
 
+    def expression_cases(self):
+        """
+        :return: the cases of the simplified expression as immutable feature maps, or None without an expression.
+            They are cached on the nonterminal while it is frozen.
+        """
+        return simplified_expressions().nonterminal_cases(self)
+
     def get_feature(self, feature):
         """try to find feature and return it value/set of values"""
 
         if EXPRESSION in self:
-            simpl_expres = simplify_expression(self[EXPRESSION])
             result = set()
-            for ex in simpl_expres:
+            for ex in self.expression_cases():
                 if feature in ex:
                     val = ex[feature]
                     if isinstance(val, tuple):
@@ -316,6 +379,65 @@ class FeatStructNonterminal(FeatDict, Nonterminal):
         return filter_node
 
 
+# bits of the atomic values of every feature name in the signatures of FeatStructNonterminals
+_value_bits = {}
+
+# values with a bit per feature name; the values of open-class features, like lemmas, beyond
+# this number are not encoded, so the table and the bitsets stay small
+SIGNATURE_VALUES = 64
+
+def _feature_value_bits(fname, value):
+    """
+    :return: bitset of an atomic value or a collection of them of the feature ``fname``, or 0 if the
+        value does not constrain unification or is not encoded
+    """
+    if isinstance(value, (FeatStruct, Variable, CustomFeatureValue)):
+        return 0
+    if isinstance(value, (tuple, list, set, frozenset)):
+        values = value
+    else:
+        values = (value,)
+    bits = 0
+    try:
+        value_bits = _value_bits.setdefault(fname, {})
+        for value in values:
+            if isinstance(value, (FeatStruct, Variable, CustomFeatureValue)):
+                return 0
+            bit = value_bits.get(value)
+            if bit is None:
+                if len(value_bits) >= SIGNATURE_VALUES:
+                    return 0
+                bit = value_bits[value] = 1 << len(value_bits)
+            bits |= bit
+    except TypeError:
+        # unhashable value
+        return 0
+    return bits
+
+def _signature(fstruct):
+    cases = fstruct.expression_cases() or ({},)
+    features = set(fstruct.keys()).union(*cases)
+    features.discard(EXPRESSION)
+    signature = {}
+    for fname in features:
+        # features with custom unification of their values are not compared
+        if isinstance(fname, Feature) and type(fname) is not Feature:
+            continue
+        bits = 0
+        for case in cases:
+            if fname in case:
+                case_bits = _feature_value_bits(fname, case[fname])
+            elif fname in fstruct:
+                case_bits = _feature_value_bits(fname, fstruct[fname])
+            else:
+                case_bits = 0
+            if not case_bits:
+                break
+            bits |= case_bits
+        else:
+            signature[fname] = bits
+    return signature
+
 def is_nonterminal(item):
     """
     :return: True if the item is a ``Nonterminal``.
@@ -1089,19 +1211,108 @@ class FeatureGrammar(CFG):
             return [prod for prod in self._lhs_index.get(self._get_type_if_possible(lhs), [])
                     if prod in self._rhs_index.get(self._get_type_if_possible(rhs), [])]
 
+    # The leftcorner relations are calculated on the TYPE categories of the
+    # nonterminals.  A nonterminal that can be skipped, because it is
+    # facultative or its category derives the empty string, lets the next
+    # symbol of the right hand side be a leftcorner as well.
+
+    def _calculate_leftcorners(self):
+        categories = set(self._get_type_if_possible(prod.lhs()) for prod in self._productions)
+
+        # the categories, which derive the empty string
+        self._nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for prod in self._productions:
+                cat = self._get_type_if_possible(prod.lhs())
+                if cat not in self._nullable and all(self.is_nullable(symbol) for symbol in prod.rhs()):
+                    self._nullable.add(cat)
+                    changed = True
+
+        self._immediate_leftcorner_categories = dict((cat, set([cat])) for cat in categories)
+        self._immediate_leftcorner_words = dict((cat, set()) for cat in categories)
+        for prod in self._productions:
+            cat = self._get_type_if_possible(prod.lhs())
+            for left in prod.rhs():
+                if not is_nonterminal(left):
+                    self._immediate_leftcorner_words[cat].add(left)
+                    break
+                self._immediate_leftcorner_categories[cat].add(self._get_type_if_possible(left))
+                if not self.is_nullable(left):
+                    break
+
+        self._leftcorners = transitive_closure(self._immediate_leftcorner_categories, reflexive=True)
+        self._leftcorner_parents = invert_graph(self._leftcorners)
+        self._leftcorner_words = {}
+        for cat, lefts in self._leftcorners.items():
+            words = self._leftcorner_words[cat] = set()
+            for left in lefts:
+                words.update(self._immediate_leftcorner_words.get(left, ()))
+
     def leftcorners(self, cat):
         """
-        Return the set of all words that the given category can start with.
-        Also called the "first set" in compiler construction.
+        Return the set of all categories that the given category or
+        nonterminal can start with, including its own category.
+
+        :rtype: set(FeatureValueType)
         """
-        raise NotImplementedError("Not implemented yet")
+        cat = self._get_type_if_possible(cat)
+        return self._leftcorners.get(cat, set([cat]))
 
     def leftcorner_parents(self, cat):
         """
         Return the set of all categories for which the given category
         is a left corner.
+
+        :rtype: set(FeatureValueType)
+        """
+        cat = self._get_type_if_possible(cat)
+        return self._leftcorner_parents.get(cat, set([cat]))
+
+    def leftcorner_words(self, cat):
+        """
+        Return the set of all words that the given category or
+        nonterminal can start with.  Also called the "first set" in
+        compiler construction.
+
+        :rtype: set(str)
+        """
+        return self._leftcorner_words.get(self._get_type_if_possible(cat), set())
+
+    def is_leftcorner(self, cat, left):
+        if is_nonterminal(left):
+            return self._get_type_if_possible(left) in self.leftcorners(cat)
+        return left in self.leftcorner_words(cat)
+
+    def is_nullable(self, symbol):
+        """
+        True if ``symbol`` is a facultative nonterminal or its category
+        derives the empty string.
+        """
+        if not is_nonterminal(symbol):
+            return False
+        # the same test as the skipping of facultative nonterminals in the top down prediction
+        if isinstance(symbol, FeatStructNonterminal) and symbol.has_feature({BRANCH_FEATURE: FACULTATIVE_FEATURE}):
+            return True
+        return self._get_type_if_possible(symbol) in self._nullable
+
+    def rhs_leftcorner_words(self, rhs):
+        """
+        Return the set of all words that a sequence of symbols can start
+        with, and whether the sequence can derive the empty string.
+
+        :rtype: tuple(set(str), bool)
         """
-        raise NotImplementedError("Not implemented yet")
+        words = set()
+        for symbol in rhs:
+            if not is_nonterminal(symbol):
+                words.add(symbol)
+                return words, False
+            words.update(self.leftcorner_words(symbol))
+            if not self.is_nullable(symbol):
+                return words, False
+        return words, True
 
     def _get_type_if_possible(self, item):
         """
@@ -1782,5 +1993,6 @@ __all__ = ['Nonterminal', 'nonterminals',
            'ProbabilisticDependencyGrammar',
            'induce_pcfg', 'read_grammar']
 
-from nltk.topology.FeatTree import combine_expression, simplify_expression, pprint_expression
+from nltk.topology.FeatTree import combine_expression, simplify_expression, pprint_expression, \
+    simplified_expressions
 from nltk.sem.logic import Variable
@@ -801,6 +801,15 @@ class Chart(object):
         # Make a copy, in case they modify it.
         return self._edge_to_cpls.get(edge, {}).keys()
 
+    def forest(self, tree_class=Tree, complete=True):
+        """
+        Return a packed forest view of the derivations in this chart,
+        which builds trees lazily and shares their subtrees.
+
+        :rtype: ChartForest
+        """
+        return ChartForest(self, tree_class=tree_class, complete=complete)
+
     #////////////////////////////////////////////////////////////
     # Display
     #////////////////////////////////////////////////////////////
@@ -928,6 +937,154 @@ class Chart(object):
         return s
 
 
+########################################################################
+##  Chart Forest
+########################################################################
+
+class ChartForest(object):
+    """
+    A packed forest view of the derivations stored in a chart.  The
+    trees of an edge are built lazily, in the order of ``Chart.trees``,
+    and kept, so that every subtree is built once and shared by
+    identity between all trees that contain it.  The number of
+    derivations can be counted without building any trees.
+
+    Derivations that contain an edge as its own descendant are left
+    out: an edge that is reached again while its trees are generated
+    appears to have no trees.
+    """
+
+    def __init__(self, chart, tree_class=Tree, complete=True):
+        """
+        :param complete: If true, incomplete edges have no trees.
+            Otherwise, the unexpanded children of incomplete edges are
+            encoded as childless subtrees.
+        """
+        self._chart = chart
+        self._tree_class = tree_class
+        self._complete = complete
+        # edge -> the trees built so far
+        self._trees = {}
+        # edge -> the generator building the remaining trees
+        self._generators = {}
+        # edges, whose trees are generated or counted at the moment
+        self._active = set()
+        self._counts = {}
+
+    def trees(self, edge):
+        """
+        Return an iterator of the tree structures that are associated
+        with ``edge``.
+
+        :rtype: iter(Tree)
+        """
+        if edge in self._active:
+            return
+        trees = self._trees.get(edge)
+        if trees is None:
+            trees = self._trees[edge] = []
+            self._generators[edge] = self._generate(edge)
+        i = 0
+        while True:
+            if i < len(trees):
+                yield trees[i]
+                i += 1
+                continue
+            generator = self._generators.get(edge)
+            if generator is None or edge in self._active:
+                return
+            self._active.add(edge)
+            try:
+                tree = next(generator)
+            except StopIteration:
+                del self._generators[edge]
+                return
+            finally:
+                self._active.discard(edge)
+            trees.append(tree)
+
+    def count(self, edge):
+        """
+        Return the number of tree structures that are associated with
+        ``edge``, without building them.
+
+        :rtype: int
+        """
+        if edge in self._counts:
+            return self._counts[edge]
+        if edge in self._active:
+            return 0
+        if self._complete and edge.is_incomplete():
+            count = 0
+        elif isinstance(edge, LeafEdge):
+            count = 1
+        else:
+            self._active.add(edge)
+            try:
+                count = 0
+                for cpl in self._chart.child_pointer_lists(edge):
+                    product = 1
+                    for child in cpl:
+                        product *= self.count(child)
+                        if not product:
+                            break
+                    count += product
+            finally:
+                self._active.discard(edge)
+        self._counts[edge] = count
+        return count
+
+    def cpl_trees(self, edge, cpl):
+        """
+        Return an iterator of the tree structures of the complete
+        ``edge`` that are built from the child pointer list ``cpl``.
+
+        :rtype: iter(Tree)
+        """
+        if edge.is_incomplete() or isinstance(edge, LeafEdge):
+            return
+        lhs = edge.lhs().symbol()
+        products = self._product(tuple(cpl), 0)
+        while True:
+            self._active.add(edge)
+            try:
+                children = next(products)
+            except StopIteration:
+                return
+            finally:
+                self._active.discard(edge)
+            yield self._tree_class(lhs, children)
+
+    def _generate(self, edge):
+        # when we're reading trees off the chart, don't use incomplete edges
+        if self._complete and edge.is_incomplete():
+            return
+
+        if isinstance(edge, LeafEdge):
+            yield edge.lhs()
+            return
+
+        lhs = edge.lhs().symbol()
+        unexpanded = ()
+        if edge.is_incomplete():
+            unexpanded = tuple(self._tree_class(elt, []) for elt in edge.rhs()[edge.dot():])
+        for cpl in self._chart.child_pointer_lists(edge):
+            for children in self._product(tuple(cpl), 0):
+                yield self._tree_class(lhs, children + unexpanded)
+
+    def _product(self, cpl, position):
+        """
+        A lazy ``itertools.product`` of the trees of the child pointers
+        from ``position`` on.
+        """
+        if position == len(cpl):
+            yield ()
+            return
+        for child in self.trees(cpl[position]):
+            for rest in self._product(cpl, position + 1):
+                yield (child,) + rest
+
+
 ########################################################################
 ##  Chart Rules
 ########################################################################
@@ -1472,7 +1629,7 @@ class ChartParser(ParserI):
         if self._use_agenda:
             # Use an agenda-based algorithm.
             for axiom in self._axioms:
-                new_edges = axiom.apply(chart, grammar)
+                new_edges = list(axiom.apply(chart, grammar))
                 trace_new_edges(chart, axiom, new_edges, trace, trace_edge_width)
 
             inference_rules = self._inference_rules
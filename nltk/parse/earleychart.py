@@ -114,6 +114,10 @@ class IncrementalChart(Chart):
 
 
 class FeatureIncrementalChart(IncrementalChart, FeatureChart):
+    def initialize(self):
+        IncrementalChart.initialize(self)
+        self._initialize_category_indexes()
+
     def select(self, end, **restrictions):
         edgelist = self._edgelists[end]
 
@@ -150,6 +154,7 @@ class FeatureIncrementalChart(IncrementalChart, FeatureChart):
                 this_index.setdefault(vals, []).append(edge)
 
     def _register_with_indexes(self, edge):
+        self._register_with_category_indexes(edge)
         end = edge.end()
         for (restr_keys, index) in self._indexes.items():
             vals = tuple(self._get_type_if_possible(getattr(edge, key)())
@@ -13,13 +13,14 @@ feature structures as nodes.
 """
 from __future__ import print_function, unicode_literals
 import copy
+import heapq
+import itertools
 
 from nltk.compat import xrange, python_2_unicode_compatible
 from nltk.draw.tree import TreeTabView
 from nltk.featstruct import FeatStruct, unify, TYPE, find_variables, EXPRESSION, _unify_feature_values, \
     _UnificationFailureError
 from nltk.sem import logic, Variable
-from nltk.topology.FeatTree import simplify_expression
 from nltk.topology.compassFeat import GRAM_FUNC_FEATURE, INHERITED_FEATURE, PRODUCTION_ID_FEATURE, POS_FEATURE, \
     BRANCH_FEATURE
 from nltk.tree import Tree
@@ -32,6 +33,11 @@ from nltk.parse.chart import (TreeEdge, Chart, ChartParser, EdgeI,
                               BottomUpPredictCombineRule,
                               TopDownInitRule, CachedTopDownPredictRule, AbstractChartRule, PGLeafInitRule)
 
+# The edge types of ``EDGE_TYPES``, which tell the agenda of
+# ``FeatureAgendaChartParser`` the edges an inference rule applies to.
+COMPLETE = 'complete'
+INCOMPLETE = 'incomplete'
+
 #////////////////////////////////////////////////////////////
 # Tree Edge
 #////////////////////////////////////////////////////////////
@@ -241,9 +247,51 @@ class FeatureTreeEdge(TreeEdge):
 class FeatureChart(Chart):
     """
     A Chart for feature grammars.
+
+    Besides the indexes of ``select``, the chart keeps two indexes
+    keyed on the ``TYPE`` of nonterminals, which are updated on every
+    insert: incomplete edges by their end and the category of their
+    next symbol, and complete edges by their start and the category of
+    their left hand side.  The fundamental rules look up the edges that
+    can be combined with a new edge there.
+
     :see: ``Chart`` for more information.
     """
 
+    def initialize(self):
+        Chart.initialize(self)
+        self._initialize_category_indexes()
+
+    def _initialize_category_indexes(self):
+        # (end, category of nextsym) -> incomplete edges
+        self._incomplete_by_category = {}
+        # (start, category of lhs) -> complete edges
+        self._complete_by_category = {}
+
+    def select_incomplete(self, end, nextsym):
+        """
+        Return an iterator over the incomplete edges that end at
+        ``end`` and whose next symbol has the category of ``nextsym``.
+        """
+        key = (end, self._get_type_if_possible(nextsym))
+        return iter(self._incomplete_by_category.get(key, ()))
+
+    def select_complete(self, start, lhs):
+        """
+        Return an iterator over the complete edges that start at
+        ``start`` and whose left hand side has the category of ``lhs``.
+        """
+        key = (start, self._get_type_if_possible(lhs))
+        return iter(self._complete_by_category.get(key, ()))
+
+    def _register_with_category_indexes(self, edge):
+        if edge.is_complete():
+            key = (edge.start(), self._get_type_if_possible(edge.lhs()))
+            self._complete_by_category.setdefault(key, []).append(edge)
+        else:
+            key = (edge.end(), self._get_type_if_possible(edge.nextsym()))
+            self._incomplete_by_category.setdefault(key, []).append(edge)
+
     def select(self, **restrictions):
         """
         Returns an iterator over the edges in this chart.
@@ -289,6 +337,7 @@ class FeatureChart(Chart):
         A helper function for ``insert``, which registers the new
         edge with all existing indexes.
         """
+        self._register_with_category_indexes(edge)
         for (restr_keys, index) in self._indexes.items():
             vals = tuple(self._get_type_if_possible(getattr(edge, key)())
                          for key in restr_keys)
@@ -304,14 +353,41 @@ class FeatureChart(Chart):
         else:
             return item
 
-    def parses(self, start, tree_class=Tree):
+    def parse_edges(self, start):
+        """
+        Return an iterator of the edges that span the entire chart and
+        whose left hand side unifies with ``start``.
+        """
         for edge in self.select(start=0, end=self._num_leaves):
             if ((isinstance(edge, FeatureTreeEdge)) and
                     (edge.lhs()[TYPE] == start[TYPE]) and
                     (unify(edge.lhs(), start, rename_vars=True))
             ):
-                for tree in self.trees(edge, complete=True, tree_class=tree_class):
-                    yield tree
+                yield edge
+
+    def parses(self, start, tree_class=Tree):
+        """
+        Return an iterator of the complete tree structures that span
+        the entire chart, and whose root node unifies with ``start``.
+        The trees are built lazily and share their common subtrees.
+        """
+        forest = self.forest(tree_class=tree_class)
+        for edge in self.parse_edges(start):
+            for tree in forest.trees(edge):
+                yield tree
+
+    def count_parses(self, start):
+        """
+        Return the number of the trees ``parses`` yields, without
+        building them.
+
+        :rtype: int
+        """
+        forest = self.forest()
+        return sum(forest.count(edge) for edge in self.parse_edges(start))
+
+    def trees(self, edge, tree_class=Tree, complete=False):
+        return self.forest(tree_class=tree_class, complete=complete).trees(edge)
 
 
 #////////////////////////////////////////////////////////////
@@ -352,6 +428,7 @@ class FeatureFundamentalRule(FundamentalRule):
         if isinstance(right_edge, FeatureTreeEdge):
             if not is_nonterminal(nextsym): return
             if left_edge.nextsym()[TYPE] != right_edge.lhs()[TYPE]: return
+            if not nextsym.compatible(found): return
             # Create a copy of the bindings.
             bindings = left_edge.bindings()
             # We rename vars here, because we don't want variables
@@ -385,17 +462,13 @@ class FeatureSingleEdgeFundamentalRule(SingleEdgeFundamentalRule):
 
     def _apply_complete(self, chart, grammar, right_edge):
         fr = self._fundamental_rule
-        for left_edge in chart.select(end=right_edge.start(),
-                                      is_complete=False,
-                                      nextsym=right_edge.lhs()):
+        for left_edge in chart.select_incomplete(right_edge.start(), right_edge.lhs()):
             for new_edge in fr.apply(chart, grammar, left_edge, right_edge):
                 yield new_edge
 
     def _apply_incomplete(self, chart, grammar, left_edge):
         fr = self._fundamental_rule
-        for right_edge in chart.select(start=left_edge.end(),
-                                       is_complete=True,
-                                       lhs=left_edge.nextsym()):
+        for right_edge in chart.select_complete(left_edge.end(), left_edge.nextsym()):
             for new_edge in fr.apply(chart, grammar, left_edge, right_edge):
                 yield new_edge
 
@@ -423,16 +496,12 @@ class PGFeatureSingleEdgeFundamentalRule(FeatureSingleEdgeFundamentalRule):
     """
 
     def _apply_complete(self, chart, grammar, right_edge):
-        for left_edge in chart.select(end=right_edge.start(),
-                                      is_complete=False,
-                                      nextsym=right_edge.lhs()):
+        for left_edge in chart.select_incomplete(right_edge.start(), right_edge.lhs()):
             for new_edge in self.apply_rule(chart, grammar, left_edge, right_edge):
                 yield new_edge
 
     def _apply_incomplete(self, chart, grammar, left_edge):
-        for right_edge in chart.select(start=left_edge.end(),
-                                       is_complete=True,
-                                       lhs=left_edge.nextsym()):
+        for right_edge in chart.select_complete(left_edge.end(), left_edge.nextsym()):
             for new_edge in self.apply_rule(chart, grammar, left_edge, right_edge):
                 yield new_edge
 
@@ -448,6 +517,8 @@ class PGFeatureSingleEdgeFundamentalRule(FeatureSingleEdgeFundamentalRule):
         if isinstance(right_edge, FeatureTreeEdge):
             if not is_nonterminal(nextsym): return
             if left_edge.nextsym()[TYPE] != right_edge.lhs()[TYPE]: return
+            # the branch feature of nextsym is filtered before the unification
+            if not nextsym.compatible(found, ignore=(BRANCH_FEATURE,)): return
             # Create a copy of the bindings.
             bindings = left_edge.bindings()
             # We rename vars here, because we don't want variables
@@ -501,8 +572,7 @@ def sync_bindings(lhs, rhs, bindings):
     :return: none
     """
     if EXPRESSION in lhs:
-        simpl_expres = simplify_expression(lhs[EXPRESSION])
-        for exp in simpl_expres:
+        for exp in lhs.expression_cases():
             for key,value in exp.items():
                 if isinstance(value, Variable):
                     feat_val = rhs.get_feature(key)
@@ -540,6 +610,44 @@ class FeatureTopDownInitRule(TopDownInitRule):
                 yield new_edge
 
 
+SENTENCE_LOOKAHEAD = 'sentence'
+WORDS_LOOKAHEAD = 'words'
+
+
+class LookaheadFilter(object):
+    """
+    The lookahead of the top down prediction in a sentence.  A
+    production is predicted at a position if it can derive the empty
+    string, or if it can start with a word that may follow there: with
+    ``SENTENCE_LOOKAHEAD`` the word at this position, with
+    ``WORDS_LOOKAHEAD`` any word of the sentence.  At the end of the
+    sentence no word follows.  The words a production can start with
+    are looked up in the leftcorner table of the ``FeatureGrammar``.
+    """
+
+    def __init__(self, grammar, tokens, lookahead=WORDS_LOOKAHEAD):
+        self._grammar = grammar
+        self._tokens = tuple(tokens)
+        self._words = set(tokens)
+        self._lookahead = lookahead
+        # id of production -> (leftcorner words, nullable)
+        self._leftcorner_words = {}
+
+    def __call__(self, production, index):
+        leftcorner_words = self._leftcorner_words.get(id(production))
+        if leftcorner_words is None:
+            leftcorner_words = self._leftcorner_words[id(production)] = \
+                self._grammar.rhs_leftcorner_words(production.rhs())
+        words, nullable = leftcorner_words
+        if nullable:
+            return True
+        if index >= len(self._tokens):
+            return False
+        if self._lookahead == SENTENCE_LOOKAHEAD:
+            return self._tokens[index] in words
+        return not self._words.isdisjoint(words)
+
+
 class FeatureTopDownPredictRule(AbstractChartRule):
     """
     A rule licensing edges corresponding to the grammar productions
@@ -551,6 +659,7 @@ class FeatureTopDownPredictRule(AbstractChartRule):
     :note: This rule corresponds to the Predictor Rule in Earley parsing.
     """
     NUM_EDGES = 1
+    EDGE_TYPES = (INCOMPLETE,)
 
     def apply(self, chart, grammar, edge):
         if edge.is_complete(): return
@@ -572,14 +681,40 @@ class PGFeatureTopDownPredictRule(AbstractChartRule):
     :note: This rule corresponds to the Predictor Rule in Earley parsing.
     """
     NUM_EDGES = 1
+    EDGE_TYPES = (INCOMPLETE,)
     FACULTATIVE_VAL = "facultative"
     inserted_edges = []
 
+    def __init__(self, lookahead=WORDS_LOOKAHEAD):
+        """
+        :param lookahead: ``WORDS_LOOKAHEAD`` to predict only the
+            productions, which can start with a word of the sentence,
+            since the leaves are inserted in all orders of the words;
+            ``SENTENCE_LOOKAHEAD`` to predict only the productions, which
+            can start with the word at the position of the prediction;
+            None to predict all productions.  Productions deriving the
+            empty string are always predicted.
+        """
+        self._lookahead = lookahead
+
+    def _lookahead_filter(self, chart, grammar):
+        # the filters live on the chart, since a rule is shared by the parses of all sentences;
+        # a filter holds its grammar, so the id of the grammar is not reused while it is cached
+        filters = chart.__dict__.setdefault('_lookahead_filters', {})
+        key = (id(grammar), self._lookahead)
+        lookahead_filter = filters.get(key)
+        if lookahead_filter is None:
+            lookahead_filter = filters[key] = LookaheadFilter(grammar, chart.leaves(), self._lookahead)
+        return lookahead_filter
+
     def apply(self, chart, grammar, edge):
         if edge.is_complete(): return
         lhs=edge.nextsym()
         bindings = edge.bindings()
+        lookahead_filter = self._lookahead_filter(chart, grammar) if self._lookahead else None
         for prod in grammar.productions(lhs):
+            if lookahead_filter and not lookahead_filter(prod, edge.end()):
+                continue
             new_edge = FeatureTreeEdge.from_production(prod, edge.end())
             if chart.insert(new_edge, ()):
                 yield new_edge
@@ -654,6 +789,7 @@ class FeatureCachedTopDownPredictRule(CachedTopDownPredictRule):
     for each grammar production ``B2 -> gamma``, assuming that B1
     and B2 can be unified.
     """
+    EDGE_TYPES = (INCOMPLETE,)
 
     def apply(self, chart, grammar, edge):
         if edge.is_complete(): return
@@ -693,6 +829,8 @@ class FeatureCachedTopDownPredictRule(CachedTopDownPredictRule):
 #////////////////////////////////////////////////////////////
 
 class FeatureBottomUpPredictRule(BottomUpPredictRule):
+    EDGE_TYPES = (COMPLETE,)
+
     def apply(self, chart, grammar, edge):
         if edge.is_incomplete(): return
         for prod in grammar.productions(rhs=edge.lhs()):
@@ -706,6 +844,8 @@ class FeatureBottomUpPredictRule(BottomUpPredictRule):
 
 
 class FeatureBottomUpPredictCombineRule(BottomUpPredictCombineRule):
+    EDGE_TYPES = (COMPLETE,)
+
     def apply(self, chart, grammar, edge):
         if edge.is_incomplete(): return
         found = edge.lhs()
@@ -785,6 +925,197 @@ class FeatureBottomUpLeftCornerChartParser(FeatureChartParser):
         FeatureChartParser.__init__(self, grammar, BU_LC_FEATURE_STRATEGY, **parser_args)
 
 
+#////////////////////////////////////////////////////////////
+# Agenda Feature Chart Parser
+#////////////////////////////////////////////////////////////
+
+def span_priority(edge):
+    """
+    Process the shortest edges first.
+    """
+    return edge.length()
+
+
+def head_first_priority(edge):
+    """
+    Process the edges of head constituents and the edges waiting for
+    their head first, shortest edges first among them.
+    """
+    head = is_head(edge.lhs()) or (edge.is_incomplete() and is_head(edge.nextsym()))
+    return (not head, edge.length())
+
+
+def is_head(nonterminal):
+    return (isinstance(nonterminal, FeatStructNonterminal) and
+            nonterminal.get(GRAM_FUNC_FEATURE) == 'hd')
+
+
+class EdgeAgenda(object):
+    """
+    The edges a chart parser has still to process.  An edge, which is
+    pushed again while it is waiting, keeps its place: it is processed
+    once with all the child pointer lists it has by then.
+
+    Without a priority function the agenda is a stack.  Otherwise the
+    edges with the lowest priority come first, and the edges with equal
+    priority in the order of a stack.
+    """
+
+    def __init__(self, priority=None):
+        """
+        :param priority: function mapping an edge to a sortable value
+        """
+        self._priority = priority
+        self._edges = []
+        self._waiting = set()
+        self._counter = itertools.count()
+
+    def push(self, edge):
+        """
+        Add ``edge`` to the agenda, and return True if it was not
+        waiting already.
+        """
+        if edge in self._waiting:
+            return False
+        self._waiting.add(edge)
+        if self._priority is None:
+            self._edges.append(edge)
+        else:
+            heapq.heappush(self._edges, (self._priority(edge), -next(self._counter), edge))
+        return True
+
+    def pop(self):
+        if self._priority is None:
+            edge = self._edges.pop()
+        else:
+            edge = heapq.heappop(self._edges)[-1]
+        self._waiting.discard(edge)
+        return edge
+
+    def __len__(self):
+        return len(self._edges)
+
+
+class FeatureAgendaChartParser(FeatureChartParser):
+    """
+    A ``FeatureChartParser`` driven by an ``EdgeAgenda``.  Every edge
+    taken from the agenda is passed to the inference rules for its type
+    only, as declared by their ``EDGE_TYPES``; rules without it get all
+    edges.
+
+    :param priority: function mapping an edge to a sortable value, the
+        edges with the lowest value are processed first, e.g.
+        ``span_priority``, ``head_first_priority`` or the score of a
+        learned model.  Without it the agenda is a stack.
+    :param verifier: function mapping the tokens to a predicate on the
+        parse trees, e.g. ``wordPresenceVerifier``.  Only the trees the
+        predicate accepts are parses.
+    :param max_parses: stop parsing as soon as the chart contains this
+        many parses.
+    """
+
+    def __init__(self, grammar, strategy=TD_FEATURE_STRATEGY, priority=None, verifier=None,
+                 max_parses=None, **parser_args):
+        FeatureChartParser.__init__(self, grammar, strategy, **parser_args)
+        if not self._use_agenda:
+            raise ValueError('The strategy of an agenda parser consists of rules for none or one edge')
+        self._priority = priority
+        self._verifier = verifier
+        self._max_parses = max_parses
+        self._rules = dict((edge_type, [rule for rule in self._inference_rules
+                                        if edge_type in getattr(rule, 'EDGE_TYPES', (COMPLETE, INCOMPLETE))])
+                           for edge_type in (COMPLETE, INCOMPLETE))
+
+    def chart_parse(self, tokens, trace=None):
+        if trace is None: trace = self._trace
+        trace_new_edges = self._trace_new_edges
+
+        tokens = list(tokens)
+        self._grammar.check_coverage(tokens)
+        chart = self._chart_class(tokens)
+        grammar = self._grammar
+
+        # Width, for printing trace edges.
+        trace_edge_width = self._trace_chart_width // (chart.num_leaves() + 1)
+        if trace: print(chart.pretty_format_leaves(trace_edge_width))
+
+        for axiom in self._axioms:
+            new_edges = list(axiom.apply(chart, grammar))
+            trace_new_edges(chart, axiom, new_edges, trace, trace_edge_width)
+
+        agenda = EdgeAgenda(self._priority)
+        # Push the initial edges in reverse, so that a stack returns
+        # them in the order of the chart.
+        for edge in reversed(chart.edges()):
+            agenda.push(edge)
+
+        start = self._grammar.start()
+        parse_span = (0, chart.num_leaves())
+        verifier = self._verifier(tokens) if self._verifier else None
+        # the derivations of the root edges, whose trees were counted
+        counted = set()
+        num_parses = 0
+        while agenda:
+            edge = agenda.pop()
+            new_roots = []
+            for rule in self._rules[COMPLETE if edge.is_complete() else INCOMPLETE]:
+                new_edges = list(rule.apply(chart, grammar, edge))
+                trace_new_edges(chart, rule, new_edges, trace, trace_edge_width)
+                for new_edge in new_edges:
+                    agenda.push(new_edge)
+                    if (self._max_parses and new_edge.is_complete() and new_edge.span() == parse_span and
+                            is_nonterminal(new_edge.lhs()) and new_edge.lhs().get(TYPE) == start.get(TYPE)):
+                        new_roots.append(new_edge)
+            if new_roots:
+                num_parses += self._count_parses(chart, new_roots, verifier, counted,
+                                                 self._max_parses - num_parses)
+                if num_parses >= self._max_parses:
+                    break
+
+        # Return the final chart.
+        return chart
+
+    def _parses(self, chart, verifier, tree_class=Tree):
+        parses = chart.parses(self._grammar.start(), tree_class=tree_class)
+        if verifier:
+            parses = (tree for tree in parses if verifier(tree))
+        if self._max_parses:
+            parses = itertools.islice(parses, self._max_parses)
+        return parses
+
+    def _count_parses(self, chart, root_edges, verifier, counted, limit):
+        """
+        Count the parses of the derivations of the root edges, which are
+        not in ``counted`` yet, but at most ``limit``.  The trees of a
+        derivation are counted once, when it is found, so every tree is
+        verified once; trees its children gain later are not counted,
+        which lets the parser go on longer rather than stop early.
+        """
+        start = self._grammar.start()
+        forest = chart.forest()
+        count = 0
+        for edge in root_edges:
+            if not unify(edge.lhs(), start, rename_vars=True):
+                continue
+            for cpl in chart.child_pointer_lists(edge):
+                if (edge, cpl) in counted:
+                    continue
+                counted.add((edge, cpl))
+                trees = forest.cpl_trees(edge, cpl)
+                if verifier:
+                    trees = (tree for tree in trees if verifier(tree))
+                count += sum(1 for tree in itertools.islice(trees, limit - count))
+                if count >= limit:
+                    return count
+        return count
+
+    def parse(self, tokens, tree_class=Tree):
+        tokens = list(tokens)
+        chart = self.chart_parse(tokens)
+        verifier = self._verifier(tokens) if self._verifier else None
+        return iter(self._parses(chart, verifier, tree_class=tree_class))
+
+
 #////////////////////////////////////////////////////////////
 # Instantiate Variable Chart
 #////////////////////////////////////////////////////////////
@@ -898,6 +1229,72 @@ def demo(print_times=True, print_grammar=True,
         print("Nr trees:", len(trees))
 
 
+def benchmark(sizes=(1000, 10000, 50000), categories=20, repeat=3):
+    """
+    Show the trade-off of the category indexes of ``FeatureChart``:
+    inserting edges with and without them, and looking up the edges the
+    fundamental rule combines with a complete edge through ``select``
+    and through ``select_incomplete``.
+    """
+    from timeit import default_timer
+
+    class UncategorizedChart(FeatureChart):
+        def _register_with_category_indexes(self, edge):
+            pass
+
+    def nonterminal(category):
+        fstruct = FeatStructNonterminal()
+        fstruct[TYPE] = 'cat{}'.format(category)
+        return fstruct
+
+    nonterminals = [nonterminal(category) for category in range(categories)]
+
+    def edges(size):
+        positions = max(1, size // categories)
+        return [FeatureTreeEdge((i % positions, i % positions), nonterminals[i % categories],
+                                (nonterminals[(i // 7) % categories], nonterminals[(i // 3) % categories]))
+                for i in range(size)], positions
+
+    def insert(chart_class, chart_edges, positions):
+        chart = chart_class(['w'] * positions)
+        # the index the fundamental rule would create with the first lookup
+        chart.select(end=0, is_complete=False, nextsym=nonterminals[0])
+        for edge in chart_edges:
+            chart.insert(edge, ())
+        return chart
+
+    def lookup(chart, positions, select):
+        for end in range(positions):
+            for category in nonterminals:
+                for edge in select(chart, end, category):
+                    pass
+
+    def select(chart, end, category):
+        return chart.select(end=end, is_complete=False, nextsym=category)
+
+    def select_incomplete(chart, end, category):
+        return chart.select_incomplete(end, category)
+
+    def best(workload, *args):
+        timings = []
+        for i in range(repeat):
+            start = default_timer()
+            workload(*args)
+            timings.append(default_timer() - start)
+        return min(timings)
+
+    print("{:<10}{:>8}{:>18}{:>18}".format('workload', 'size', 'with indexes', 'without indexes'))
+    for size in sizes:
+        chart_edges, positions = edges(size)
+        print("{:<10}{:>8}{:>17.4f}s{:>17.4f}s".format('insert', size,
+                                                        best(insert, FeatureChart, chart_edges, positions),
+                                                        best(insert, UncategorizedChart, chart_edges, positions)))
+        chart = insert(FeatureChart, chart_edges, positions)
+        print("{:<10}{:>8}{:>17.4f}s{:>17.4f}s".format('lookup', size,
+                                                        best(lookup, chart, positions, select_incomplete),
+                                                        best(lookup, chart, positions, select)))
+
+
 def run_profile():
     import profile
 
@@ -1031,12 +1428,10 @@ def pg_demo():
     #print(productions)
     cp = FeatureTopDownChartParser(productions, trace=1)
     tokens = sentence.split()
-    trees = list(cp.parse(tokens))
-
     verifier = wordPresenceVerifier(tokens)
     dominance_structures = []
     count_trees = 0
-    for tree in trees:
+    for tree in cp.parse(tokens):
         count_trees += 1
         ver_result = verifier(tree)
         if ver_result:
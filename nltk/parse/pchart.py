@@ -38,6 +38,9 @@ from __future__ import print_function, unicode_literals
 # [XX] This might not be implemented quite right -- it would be better
 # to associate probabilities with child pointer lists.
 
+import heapq
+import itertools
+import warnings
 from functools import reduce
 from nltk.tree import Tree, ProbabilisticTree
 from nltk.grammar import Nonterminal, PCFG
@@ -132,6 +135,115 @@ class SingleEdgeProbabilisticFundamentalRule(AbstractChartRule):
     def __str__(self):
         return 'Fundamental Rule'
 
+class _Reversed(object):
+    """
+    A key of the ``EdgeQueue`` heap with the reversed ordering, so that
+    keys without negation, e.g. tuples, can be tried highest first.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+class EdgeQueue(object):
+    """
+    A priority queue of edges.  ``pop`` returns the edge with the
+    highest key, and of the edges with equal keys the one pushed last.
+
+    With a beam size, the queue is bounded: whenever it grows beyond
+    the beam, the edge with the lowest key is discarded, and of the
+    edges with equal keys the one pushed first.  The queue keeps the
+    edges in a heap for each end; an edge taken from one heap is
+    marked, and only removed from the other heap when it gets to its
+    top.
+    """
+
+    def __init__(self, key, beam_size=0, keep_discarded=False):
+        """
+        :param key: function mapping an edge to its key, which is
+            computed once when the edge is pushed; the keys must be
+            orderable, but need not be numeric
+        :param beam_size: the maximum length of the queue, or 0 for an
+            unbounded queue
+        :param keep_discarded: keep the discarded edges until they are
+            taken by ``discarded``
+        """
+        self._key = key
+        self._beam_size = beam_size
+        self._counter = itertools.count()
+        self._discarded = [] if keep_discarded else None
+        # entries [edge, live], ordered by (reversed key, -counter) ...
+        self._best = []
+        # ... and by (key, counter), only with a beam
+        self._worst = []
+        self._len = 0
+
+    def push(self, edge):
+        """
+        Add ``edge`` to the queue, and return the edge that was
+        discarded to keep the queue within the beam, if any.
+        """
+        key, counter = self._key(edge), next(self._counter)
+        entry = [edge, True]
+        heapq.heappush(self._best, (_Reversed(key), -counter, entry))
+        self._len += 1
+        if not self._beam_size:
+            return None
+        heapq.heappush(self._worst, (key, counter, entry))
+        discarded = None
+        if self._len > self._beam_size:
+            item = self._take(self._worst)
+            discarded = item[-1][0]
+            if self._discarded is not None:
+                self._discarded.append(item)
+        # drop the entries taken from the other heap, when they outnumber the live ones
+        if len(self._best) > 2 * self._len + 1:
+            self._best = self._live(self._best)
+        if len(self._worst) > 2 * self._len + 1:
+            self._worst = self._live(self._worst)
+        return discarded
+
+    def pop(self):
+        """
+        Remove and return the edge with the highest key.
+        """
+        return self._take(self._best)[-1][0]
+
+    def discarded(self):
+        """
+        Return the edges discarded since the last call, when the queue
+        keeps them, in the order a sorted queue would discard them: the
+        lowest key first, and of equal keys the one pushed first.
+        """
+        discarded = sorted(self._discarded, key=lambda item: item[:2])
+        del self._discarded[:]
+        return [item[-1][0] for item in discarded]
+
+    def _take(self, heap):
+        while True:
+            item = heapq.heappop(heap)
+            entry = item[-1]
+            if entry[1]:
+                entry[1] = False
+                self._len -= 1
+                return item
+
+    @staticmethod
+    def _live(heap):
+        heap = [item for item in heap if item[-1][1]]
+        heapq.heapify(heap)
+        return heap
+
+    def __len__(self):
+        return self._len
+
+
 class BottomUpProbabilisticChartParser(ParserI):
     """
     An abstract bottom-up parser for ``PCFG`` grammars that uses a ``Chart`` to
@@ -149,8 +261,9 @@ class BottomUpProbabilisticChartParser(ParserI):
     The sorting order for the queue is not specified by
     ``BottomUpProbabilisticChartParser``.  Different sorting orders will
     result in different search strategies.  The sorting order for the
-    queue is defined by the method ``sort_queue``; subclasses are required
-    to provide a definition for this method.
+    queue is defined by the method ``sort_key``; subclasses are required
+    to provide a definition for this method.  The queue is an
+    ``EdgeQueue``, which tries the edges with the highest keys first.
 
     :type _grammar: PCFG
     :ivar _grammar: The grammar used to parse sentences.
@@ -175,6 +288,9 @@ class BottomUpProbabilisticChartParser(ParserI):
         """
         if not isinstance(grammar, PCFG):
             raise ValueError("The grammar must be probabilistic PCFG")
+        if getattr(type(self), 'sort_queue', None) is not None:
+            warnings.warn("{}.sort_queue is no longer called, the queue is ordered by "
+                          "sort_key".format(type(self).__name__), DeprecationWarning, stacklevel=2)
         self._grammar = grammar
         self.beam_size = beam_size
         self._trace = trace
@@ -206,23 +322,21 @@ class BottomUpProbabilisticChartParser(ParserI):
         bu = ProbabilisticBottomUpPredictRule()
         fr = SingleEdgeProbabilisticFundamentalRule()
 
-        # Our queue
-        queue = []
+        # Our queue, pruned to the correct size if a beam was defined
+        queue = EdgeQueue(self.sort_key, self.beam_size, keep_discarded=self._trace > 2)
 
         # Initialize the chart.
         for edge in bu_init.apply(chart, grammar):
             if self._trace > 1:
                 print('  %-50s [%s]' % (chart.pretty_format_edge(edge,width=2),
                                         edge.prob()))
-            queue.append(edge)
+            queue.push(edge)
 
         while len(queue) > 0:
-            # Re-sort the queue.
-            self.sort_queue(queue, chart)
-
-            # Prune the queue to the correct size if a beam was defined
-            if self.beam_size:
-                self._prune(queue, chart)
+            # Report the edges pruned to keep the queue within the beam.
+            if self._trace > 2:
+                for discarded in queue.discarded():
+                    print('  %-50s [DISCARDED]' % chart.pretty_format_edge(discarded,2))
 
             # Get the best edge.
             edge = queue.pop()
@@ -231,8 +345,9 @@ class BottomUpProbabilisticChartParser(ParserI):
                                         edge.prob()))
 
             # Apply BU & FR to it.
-            queue.extend(bu.apply(chart, grammar, edge))
-            queue.extend(fr.apply(chart, grammar, edge))
+            for new_edge in itertools.chain(bu.apply(chart, grammar, edge),
+                                            fr.apply(chart, grammar, edge)):
+                queue.push(new_edge)
 
         # Get a list of complete parses.
         parses = list(chart.parses(grammar.start(), ProbabilisticTree))
@@ -270,33 +385,18 @@ class BottomUpProbabilisticChartParser(ParserI):
 
         tree.set_prob(prob)
 
-    def sort_queue(self, queue, chart):
+    def sort_key(self, edge):
         """
-        Sort the given queue of ``Edge`` objects, placing the edge that should
-        be tried first at the beginning of the queue.  This method
-        will be called after each ``Edge`` is added to the queue.
+        Return the key of an ``Edge`` in the queue.  The edges with the
+        highest keys are tried first.  This method will be called once
+        for each ``Edge`` that is added to the queue.
 
-        :param queue: The queue of ``Edge`` objects to sort.  Each edge in
-            this queue is an edge that could be added to the chart by
+        :param edge: An edge that could be added to the chart by
             the fundamental rule; but that has not yet been added.
-        :type queue: list(Edge)
-        :param chart: The chart being used to parse the text.  This
-            chart can be used to provide extra information for sorting
-            the queue.
-        :type chart: Chart
-        :rtype: None
+        :type edge: Edge
         """
         raise NotImplementedError()
 
-    def _prune(self, queue, chart):
-        """ Discard items in the queue if the queue is longer than the beam."""
-        if len(queue) > self.beam_size:
-            split = len(queue)-self.beam_size
-            if self._trace > 2:
-                for edge in queue[:split]:
-                    print('  %-50s [DISCARDED]' % chart.pretty_format_edge(edge,2))
-            del queue[:split]
-
 class InsideChartParser(BottomUpProbabilisticChartParser):
     """
     A bottom-up parser for ``PCFG`` grammars that tries edges in descending
@@ -313,22 +413,16 @@ class InsideChartParser(BottomUpProbabilisticChartParser):
     strategy.
     """
     # Inherit constructor.
-    def sort_queue(self, queue, chart):
+    def sort_key(self, edge):
         """
-        Sort the given queue of edges, in descending order of the
-        inside probabilities of the edges' trees.
+        Return the inside probability of the edge's trees, so that the
+        queue is tried in descending order of it.
 
-        :param queue: The queue of ``Edge`` objects to sort.  Each edge in
-            this queue is an edge that could be added to the chart by
+        :param edge: An edge that could be added to the chart by
             the fundamental rule; but that has not yet been added.
-        :type queue: list(Edge)
-        :param chart: The chart being used to parse the text.  This
-            chart can be used to provide extra information for sorting
-            the queue.
-        :type chart: Chart
-        :rtype: None
+        :type edge: Edge
         """
-        queue.sort(key=lambda edge: edge.prob())
+        return edge.prob()
 
 # Eventually, this will become some sort of inside-outside parser:
 # class InsideOutsideParser(BottomUpProbabilisticChartParser):
@@ -354,8 +448,8 @@ class InsideChartParser(BottomUpProbabilisticChartParser):
 #     def _sortkey(self, edge):
 #         return edge.structure()[PROB] * self._bestp[edge.lhs()]
 #
-#     def sort_queue(self, queue, chart):
-#         queue.sort(key=self._sortkey)
+#     def sort_key(self, edge):
+#         return self._sortkey(edge)
 
 import random
 class RandomChartParser(BottomUpProbabilisticChartParser):
@@ -364,16 +458,15 @@ class RandomChartParser(BottomUpProbabilisticChartParser):
     This sorting order results in a random search strategy.
     """
     # Inherit constructor
-    def sort_queue(self, queue, chart):
-        i = random.randint(0, len(queue)-1)
-        (queue[-1], queue[i]) = (queue[i], queue[-1])
+    def sort_key(self, edge):
+        return random.random()
 
 class UnsortedChartParser(BottomUpProbabilisticChartParser):
     """
     A bottom-up parser for ``PCFG`` grammars that tries edges in whatever order.
     """
     # Inherit constructor
-    def sort_queue(self, queue, chart): return
+    def sort_key(self, edge): return 0
 
 class LongestChartParser(BottomUpProbabilisticChartParser):
     """
@@ -382,8 +475,8 @@ class LongestChartParser(BottomUpProbabilisticChartParser):
     search strategy.
     """
     # Inherit constructor
-    def sort_queue(self, queue, chart):
-        queue.sort(key=lambda edge: edge.length())
+    def sort_key(self, edge):
+        return edge.length()
 
 ##//////////////////////////////////////////////////////
 ##  Test Code
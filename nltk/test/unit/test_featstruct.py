@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the unification of feature structures with disjunctive expressions,
+the memo of their simplified expressions and the compatibility check of nonterminals.
+"""
+from __future__ import absolute_import, unicode_literals
+import copy
+import unittest
+
+from nltk.featstruct import unify, EXPRESSION, TYPE, UnificationCache
+from nltk.grammar import FeatStructNonterminal, SIGNATURE_VALUES, _value_bits
+from nltk.sem.logic import Variable
+from nltk.topology.FeatTree import OP, SimplifiedExpressions
+
+
+def nonterminal(features, *cases):
+    fstruct = FeatStructNonterminal()
+    fstruct[TYPE] = 'np'
+    fstruct.update(features)
+    if cases:
+        fstruct[EXPRESSION] = (OP.OR, cases)
+    return fstruct
+
+
+class TestExpressionUnify(unittest.TestCase):
+
+    def test_single_case(self):
+        fstruct1 = nonterminal({'num': 'sg'}, {'case': 'nom'}, {'case': 'acc'})
+        fstruct2 = nonterminal({'case': 'acc'})
+        result = unify(fstruct1, fstruct2)
+        self.assertEqual(result, nonterminal({'num': 'sg', 'case': 'acc'}))
+
+    def test_several_cases(self):
+        fstruct1 = nonterminal({}, {'case': 'nom', 'num': 'sg'}, {'case': 'acc', 'num': 'pl'},
+                               {'case': 'dat', 'num': 'sg'})
+        fstruct2 = nonterminal({'num': 'sg'})
+        result = unify(fstruct1, fstruct2)
+        self.assertEqual(len(result[EXPRESSION][1]), 2)
+
+    def test_no_case(self):
+        fstruct1 = nonterminal({}, {'case': 'nom'}, {'case': 'acc'})
+        fstruct2 = nonterminal({}, {'case': 'dat'}, {'case': 'gen'})
+        self.assertIsNone(unify(fstruct1, fstruct2))
+
+    def test_variables(self):
+        # ?n is bound by the first feature and clashes in the second one
+        fstruct1 = nonterminal({'num': Variable('?n'), 'agr': Variable('?n')})
+        fstruct2 = nonterminal({}, {'num': 'sg', 'agr': 'pl'}, {'num': 'pl', 'agr': 'pl'})
+        bindings = {}
+        result = unify(fstruct1, fstruct2, bindings=bindings, rename_vars=False)
+        self.assertEqual(result, nonterminal({'num': 'pl', 'agr': 'pl'}))
+        self.assertEqual(bindings, {Variable('?n'): 'pl'})
+
+        bindings = {Variable('?n'): 'sg'}
+        self.assertIsNone(unify(fstruct1, fstruct2, bindings=bindings, rename_vars=False))
+        # failed cases leave the bindings untouched
+        self.assertEqual(bindings, {Variable('?n'): 'sg'})
+
+    def test_treat_bool(self):
+        fstruct1 = nonterminal({}, {'refl': True}, {'case': 'nom'})
+        fstruct2 = nonterminal({'case': 'nom'})
+        self.assertEqual(unify(fstruct2, fstruct1, treatBool=True), nonterminal({'case': 'nom'}))
+        self.assertEqual(len(unify(fstruct2, fstruct1)[EXPRESSION][1]), 2)
+
+    def test_fail(self):
+        # the fail function resolves the clash on num, so no case is rejected
+        fstruct1 = nonterminal({'num': 'sg'})
+        fstruct2 = nonterminal({}, {'num': 'pl'}, {'num': 'du'})
+        self.assertIsNone(unify(fstruct1, fstruct2))
+        result = unify(fstruct1, fstruct2, fail=lambda fval1, fval2, path: fval1)
+        self.assertEqual(result, nonterminal({'num': 'sg'}))
+
+
+class TestSimplifiedExpressions(unittest.TestCase):
+
+    def test_nonterminal_cases(self):
+        expressions = SimplifiedExpressions()
+        fstruct = nonterminal({}, {'case': 'nom'}, {'case': 'acc'})
+        cases = expressions.nonterminal_cases(fstruct)
+        self.assertEqual(cases, ({'case': 'nom'}, {'case': 'acc'}))
+        self.assertIs(expressions.nonterminal_cases(fstruct), cases)
+        self.assertRaises(TypeError, cases[0].update, {'num': 'sg'})
+
+        # an equal expression of another nonterminal is simplified once
+        other = nonterminal({}, {'case': 'nom'}, {'case': 'acc'})
+        self.assertIs(expressions.nonterminal_cases(other), cases)
+        third = nonterminal({}, {'case': 'acc'}, {'case': 'dat'})
+        self.assertEqual(expressions.nonterminal_cases(third)[0], cases[1])
+        self.assertEqual((expressions.hits(), expressions.misses()), (2, 2))
+        self.assertEqual(expressions.hit_rate(), 0.5)
+
+        # a replaced expression is simplified again
+        fstruct[EXPRESSION] = (OP.OR, ({'case': 'dat'},))
+        self.assertEqual(expressions.nonterminal_cases(fstruct), ({'case': 'dat'},))
+        # and so is an expression modified in place
+        fstruct[EXPRESSION][1][0]['case'] = 'gen'
+        self.assertEqual(expressions.nonterminal_cases(fstruct), ({'case': 'gen'},))
+        self.assertIsNone(expressions.nonterminal_cases(nonterminal({'case': 'nom'})))
+
+    def test_frozen_nonterminal_cases(self):
+        expressions = SimplifiedExpressions()
+        fstruct = nonterminal({}, {'case': 'nom'}, {'case': 'acc'})
+        fstruct.freeze()
+        cases = expressions.nonterminal_cases(fstruct)
+        self.assertIs(expressions.nonterminal_cases(fstruct), cases)
+        # the second lookup is answered by the nonterminal without freezing its expression again
+        self.assertEqual((expressions.nonterminal_hits, expressions.hits(), expressions.misses()), (1, 1, 1))
+
+        # a copy that is modified and frozen again is simplified again
+        other = copy.deepcopy(fstruct)
+        other[EXPRESSION] = (OP.OR, ({'case': 'dat'},))
+        other.freeze()
+        self.assertEqual(expressions.nonterminal_cases(other), ({'case': 'dat'},))
+        self.assertIs(expressions.nonterminal_cases(fstruct), cases)
+
+
+class TestCompatible(unittest.TestCase):
+
+    def assertCompatible(self, fstruct1, fstruct2, expected):
+        self.assertEqual(fstruct1.compatible(fstruct2), expected)
+        self.assertEqual(fstruct2.compatible(fstruct1), expected)
+        # a rejected pair never unifies
+        if not expected:
+            self.assertIsNone(unify(fstruct1, fstruct2))
+
+    def test_atomic_values(self):
+        self.assertCompatible(nonterminal({'num': 'sg'}), nonterminal({'num': 'sg', 'case': 'nom'}), True)
+        self.assertCompatible(nonterminal({'num': 'sg'}), nonterminal({'num': 'pl'}), False)
+        self.assertCompatible(nonterminal({'num': ('sg', 'pl')}), nonterminal({'num': 'pl'}), True)
+        # unify intersects value sets
+        self.assertCompatible(nonterminal({'num': ('sg', 'du')}), nonterminal({'num': ('du', 'pl')}), True)
+        self.assertCompatible(nonterminal({'num': ('sg', 'du')}), nonterminal({'num': 'pl'}), False)
+
+    def test_unconstrained_values(self):
+        self.assertCompatible(nonterminal({'num': Variable('?n')}), nonterminal({'num': 'pl'}), True)
+        self.assertCompatible(nonterminal({}, {'num': 'sg'}, {'case': 'nom'}), nonterminal({'num': 'pl'}), True)
+
+    def test_expressions(self):
+        fstruct = nonterminal({'num': 'sg'}, {'case': 'nom'}, {'case': 'acc', 'num': 'pl'})
+        self.assertCompatible(fstruct, nonterminal({'num': 'pl'}), True)
+        self.assertCompatible(fstruct, nonterminal({'case': 'dat'}), False)
+        self.assertCompatible(fstruct, nonterminal({'num': 'du'}), False)
+
+    def test_ignore(self):
+        fstruct1 = nonterminal({'num': 'sg', 'branch': 'obligatory'})
+        fstruct2 = nonterminal({'num': 'sg', 'branch': 'facultative'})
+        self.assertFalse(fstruct1.compatible(fstruct2))
+        self.assertTrue(fstruct1.compatible(fstruct2, ignore=('branch',)))
+
+    def test_frozen(self):
+        fstruct = nonterminal({'num': 'sg'})
+        fstruct.freeze()
+        self.assertIs(fstruct.signature(), fstruct.signature())
+        # a nonterminal modified after unfreezing gets a new signature
+        fstruct._frozen = False
+        fstruct['num'] = 'pl'
+        fstruct.freeze()
+        self.assertFalse(fstruct.compatible(nonterminal({'num': 'sg'})))
+
+    def test_open_class_values(self):
+        # the bits are numbered per feature name and the values beyond the limit are not encoded
+        lemmas = ['lemma{}'.format(index) for index in range(SIGNATURE_VALUES + 2)]
+        for lemma in lemmas:
+            nonterminal({'lemma': lemma, 'num': 'sg'}).signature()
+        self.assertEqual(len(_value_bits['lemma']), SIGNATURE_VALUES)
+        self.assertTrue(len(_value_bits['num']) < SIGNATURE_VALUES)
+        self.assertNotIn('lemma', nonterminal({'lemma': lemmas[-1]}).signature())
+        # values that are not encoded are left to the unification
+        self.assertCompatible(nonterminal({'lemma': lemmas[-1]}), nonterminal({'lemma': lemmas[-2]}), True)
+        self.assertCompatible(nonterminal({'lemma': lemmas[-1], 'num': 'sg'}), nonterminal({'num': 'pl'}), False)
+
+
+class TestUnificationCache(unittest.TestCase):
+
+    def test_unfrozen_bindings(self):
+        cache = UnificationCache(maxsize=16)
+        fstruct1 = nonterminal({'agr': Variable('?a')})
+        fstruct2 = nonterminal({'agr': Variable('?a')})
+        fstruct1.freeze()
+        fstruct2.freeze()
+        value = FeatStructNonterminal("[num='sg']")
+        bindings = {Variable('?a'): value}
+        result = cache.unify(fstruct1, fstruct2, bindings)
+        self.assertIsNotNone(result)
+        # the caller's binding is neither hashed nor frozen
+        self.assertFalse(value.frozen())
+        value['num'] = 'pl'
+        self.assertEqual(len(cache), 0)
+
+    def test_frozen_results(self):
+        cache = UnificationCache(maxsize=16)
+        fstruct1 = nonterminal({'num': 'sg'})
+        fstruct2 = nonterminal({'case': 'nom'})
+        fstruct1.freeze()
+        fstruct2.freeze()
+        self.assertTrue(cache.unify(fstruct1, fstruct2).frozen())
+        self.assertIs(cache.unify(fstruct1, fstruct2), cache.unify(fstruct1, fstruct2))
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the lazy reconstruction of trees from feature charts.
+"""
+from __future__ import absolute_import, unicode_literals
+import gc
+import unittest
+import weakref
+
+from nltk.grammar import FeatureGrammar
+from nltk.parse.chart import Chart
+from nltk.parse.earleychart import FeatureIncrementalChartParser, wordPresenceVerifier
+from nltk.parse.featurechart import (demo_grammar, EdgeAgenda, FeatureAgendaChartParser, FeatureChartParser,
+                                     span_priority, head_first_priority, LookaheadFilter, PGFeatureTopDownPredictRule,
+                                     SENTENCE_LOOKAHEAD, TD_FEATURE_STRATEGY, WORDS_LOOKAHEAD)
+
+SENTENCE = 'I saw John with a dog with my cookie under the dog'.split()
+
+
+class TestChartForest(unittest.TestCase):
+
+    def setUp(self):
+        self.grammar = demo_grammar()
+        self.chart = FeatureIncrementalChartParser(self.grammar, trace=0).chart_parse(SENTENCE)
+
+    def eager_parses(self):
+        return [tree for edge in self.chart.parse_edges(self.grammar.start())
+                for tree in Chart.trees(self.chart, edge, complete=True)]
+
+    def test_parses(self):
+        parses = list(self.chart.parses(self.grammar.start()))
+        self.assertEqual(len(parses), 14)
+        self.assertEqual(parses, self.eager_parses())
+        self.assertEqual(self.chart.count_parses(self.grammar.start()), 14)
+
+    def test_shared_subtrees(self):
+        first, second = list(self.chart.parses(self.grammar.start()))[:2]
+        # both parses attach the prepositional phrases below the same subject
+        self.assertIs(first[0], second[0])
+
+    def test_lazy(self):
+        forest = self.chart.forest()
+        edge = next(self.chart.parse_edges(self.grammar.start()))
+        next(forest.trees(edge))
+        self.assertEqual(len(forest._trees[edge]), 1)
+        self.assertEqual(forest.count(edge), len(list(forest.trees(edge))))
+
+    def test_verifier(self):
+        verifier = wordPresenceVerifier(SENTENCE)
+        parses = self.chart.parses(self.grammar.start())
+        self.assertTrue(verifier(next(tree for tree in parses if verifier(tree))))
+
+    def test_cycle(self):
+        grammar = FeatureGrammar.fromstring('''
+        S -> NP VP
+        NP -> N
+        N -> NP
+        NP -> "John"
+        VP -> "sleeps"
+        ''')
+        chart = FeatureIncrementalChartParser(grammar, trace=0).chart_parse(['John', 'sleeps'])
+        # the derivations through the edge NP -> N * end, when they reach it again
+        parses = list(chart.parses(grammar.start()))
+        self.assertEqual([str(tree) for tree in parses],
+                         ['(S[] (NP[] John) (VP[] sleeps))', '(S[] (NP[] (N[] (NP[] John))) (VP[] sleeps))'])
+        self.assertEqual(chart.count_parses(grammar.start()), 2)
+
+class TestCategoryIndexes(unittest.TestCase):
+
+    def test_select(self):
+        chart = FeatureIncrementalChartParser(demo_grammar(), trace=0).chart_parse(SENTENCE)
+        category = chart._get_type_if_possible
+        for edge in chart.edges():
+            if edge.is_complete():
+                expected = [left for left in chart.edges() if left.end() == edge.start() and
+                            left.is_incomplete() and category(left.nextsym()) == category(edge.lhs())]
+                found = chart.select_incomplete(edge.start(), edge.lhs())
+            else:
+                expected = [right for right in chart.edges() if right.start() == edge.end() and
+                            right.is_complete() and category(right.lhs()) == category(edge.nextsym())]
+                found = chart.select_complete(edge.end(), edge.nextsym())
+            self.assertEqual(set(found), set(expected))
+
+class TestFeatureAgendaChartParser(unittest.TestCase):
+
+    def setUp(self):
+        self.grammar = demo_grammar()
+        self.tokens = 'I saw John with a dog'.split()
+
+    def parses(self, parser):
+        return sorted(str(tree) for tree in parser.parse(self.tokens))
+
+    def test_parses(self):
+        expected = self.parses(FeatureChartParser(self.grammar))
+        # the leaves are inserted in all orders of the tokens
+        self.assertEqual(len(expected), 78)
+        for priority in (None, span_priority, head_first_priority):
+            parser = FeatureAgendaChartParser(self.grammar, priority=priority)
+            self.assertEqual(self.parses(parser), expected)
+
+    def test_max_parses(self):
+        verifier = wordPresenceVerifier(self.tokens)
+        parser = FeatureAgendaChartParser(self.grammar, verifier=wordPresenceVerifier)
+        verified = self.parses(parser)
+        self.assertEqual(len(verified), 18)
+        self.assertTrue(all(verifier(tree) for tree in parser.parse(self.tokens)))
+
+        parser = FeatureAgendaChartParser(self.grammar, verifier=wordPresenceVerifier, max_parses=2)
+        parses = self.parses(parser)
+        self.assertEqual(len(parses), 2)
+        self.assertTrue(set(parses) <= set(verified))
+        self.assertLess(parser.chart_parse(self.tokens).num_edges(),
+                        FeatureChartParser(self.grammar).chart_parse(self.tokens).num_edges())
+
+    def test_agenda(self):
+        agenda = EdgeAgenda(priority=len)
+        self.assertTrue(agenda.push('abc'))
+        self.assertTrue(agenda.push('a'))
+        self.assertFalse(agenda.push('abc'))
+        self.assertTrue(agenda.push('b'))
+        self.assertEqual([agenda.pop() for i in range(len(agenda))], ['b', 'a', 'abc'])
+        self.assertTrue(agenda.push('abc'))
+
+LOOKAHEAD_GRAMMAR = FeatureGrammar.fromstring('''
+S -> ADV[branch='facultative'] NP VP
+ADV -> "heute"
+NP -> DET N
+DET ->
+DET -> "der"
+N -> "Hund"
+VP -> "bellt"
+VP -> "schläft"
+''')
+
+
+class TestLookahead(unittest.TestCase):
+
+    def test_leftcorners(self):
+        grammar = LOOKAHEAD_GRAMMAR
+        start = grammar.start()
+        self.assertEqual(sorted(str(cat) for cat in grammar.leftcorners(start)),
+                         ['<ADV>', '<DET>', '<N>', '<NP>', '<S>'])
+        self.assertEqual(grammar.leftcorner_words(start), {'heute', 'der', 'Hund'})
+        self.assertEqual(grammar.leftcorner_words(grammar.productions()[1].lhs()), {'heute'})
+        self.assertTrue(grammar.is_leftcorner(start, 'Hund'))
+        self.assertFalse(grammar.is_leftcorner(start, 'bellt'))
+        self.assertTrue(grammar.is_nullable(grammar.productions()[0].rhs()[0]))
+        self.assertFalse(grammar.is_nullable(start))
+
+    def test_filter(self):
+        grammar = LOOKAHEAD_GRAMMAR
+        productions = dict((str(prod), prod) for prod in grammar.productions())
+        tokens = 'Hund bellt'.split()
+        words = LookaheadFilter(grammar, tokens, WORDS_LOOKAHEAD)
+        sentence = LookaheadFilter(grammar, tokens, SENTENCE_LOOKAHEAD)
+        self.assertTrue(words(productions['VP[] -> \'bellt\''], 0))
+        self.assertFalse(sentence(productions['VP[] -> \'bellt\''], 0))
+        self.assertTrue(sentence(productions['VP[] -> \'bellt\''], 1))
+        self.assertFalse(words(productions['VP[] -> \'schläft\''], 1))
+        # the empty determiner lets the noun start a noun phrase, and is predicted at the end
+        self.assertTrue(sentence(productions['NP[] -> DET[] N[]'], 0))
+        self.assertTrue(words(productions['DET[] -> '], 2))
+        self.assertFalse(words(productions['N[] -> \'Hund\''], 2))
+
+    def test_parses(self):
+        tokens = 'Hund bellt'.split()
+        parses = [sorted(str(tree) for tree in FeatureChartParser(LOOKAHEAD_GRAMMAR, strategy=strategy).parse(tokens))
+                  for strategy in (TD_FEATURE_STRATEGY, TD_FEATURE_STRATEGY[:2] +
+                                   [PGFeatureTopDownPredictRule(lookahead=None)] + TD_FEATURE_STRATEGY[3:])]
+        self.assertEqual(len(parses[0]), 1)
+        self.assertEqual(parses[0], parses[1])
+
+        parser = FeatureChartParser(demo_grammar())
+        unfiltered = FeatureChartParser(demo_grammar(), strategy=TD_FEATURE_STRATEGY[:2] +
+                                        [PGFeatureTopDownPredictRule(lookahead=None)] + TD_FEATURE_STRATEGY[3:])
+        tokens = 'I saw John with a dog'.split()
+        self.assertEqual(sorted(str(tree) for tree in parser.parse(tokens)),
+                         sorted(str(tree) for tree in unfiltered.parse(tokens)))
+        self.assertLess(parser.chart_parse(tokens).num_edges(), unfiltered.chart_parse(tokens).num_edges())
+
+    def test_filter_on_chart(self):
+        # the rules of a strategy are shared, so the filter of a sentence is kept by its chart
+        parser = FeatureChartParser(LOOKAHEAD_GRAMMAR)
+        chart = parser.chart_parse('Hund bellt'.split())
+        self.assertEqual(len(chart._lookahead_filters), 1)
+        chart_ref = weakref.ref(chart)
+        del chart
+        gc.collect()
+        self.assertIsNone(chart_ref())
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the ordered sets of the yaep charts.
+"""
+from __future__ import absolute_import, unicode_literals
+import unittest
+
+from nltk.topology.orderedSet import OrderedSet, LinkedOrderedSet
+
+
+class TestOrderedSet(unittest.TestCase):
+
+    def test_discard_while_iterating(self):
+        ordered_set = OrderedSet('abcde')
+        visited = []
+        for item in ordered_set:
+            visited.append(item)
+            if item == 'a':
+                ordered_set.discard('c')
+                ordered_set.add('f')
+                # positional access compacts the set under the iteration
+                self.assertEqual(ordered_set[2], 'd')
+                self.assertEqual(ordered_set[-1], 'f')
+                self.assertEqual(ordered_set[-5], 'a')
+                self.assertIsNone(ordered_set[5])
+                self.assertIsNone(ordered_set[-6])
+        self.assertEqual(visited, ['a', 'b', 'd', 'e', 'f'])
+        self.assertEqual(list(ordered_set), ['a', 'b', 'd', 'e', 'f'])
+
+    def test_compaction_while_iterating(self):
+        ordered_set = OrderedSet('abcdef')
+        visited = []
+        for item in ordered_set:
+            visited.append(item)
+            if item == 'c' and len(visited) == 3:
+                # several compactions between two steps, which drop the last visited item and add it again
+                ordered_set.discard('a')
+                self.assertEqual(ordered_set[0], 'b')
+                ordered_set.discard('c')
+                ordered_set.discard('d')
+                self.assertEqual(ordered_set[1], 'e')
+                ordered_set.add('c')
+                ordered_set.add('g')
+        self.assertEqual(visited, ['a', 'b', 'c', 'e', 'f', 'c', 'g'])
+        self.assertEqual(list(ordered_set), ['b', 'e', 'f', 'c', 'g'])
+
+    def test_suspended_iteration(self):
+        ordered_set = OrderedSet('abc')
+        iterator = iter(ordered_set)
+        self.assertEqual(next(iterator), 'a')
+        # a suspended or abandoned iteration does not keep the tombstones
+        ordered_set.discard('b')
+        self.assertEqual(ordered_set[1], 'c')
+        self.assertEqual(ordered_set._items, ['a', 'c'])
+        self.assertEqual(list(iterator), ['c'])
+
+    def test_compaction(self):
+        ordered_set = OrderedSet(range(10))
+        for item in range(0, 10, 2):
+            ordered_set.discard(item)
+        self.assertEqual(ordered_set._removed, 5)
+        # positional access outside of an iteration drops the tombstones
+        self.assertEqual(ordered_set[1], 3)
+        self.assertEqual(ordered_set[-1], 9)
+        self.assertEqual(ordered_set._removed, 0)
+        self.assertEqual(ordered_set._items, [1, 3, 5, 7, 9])
+        self.assertEqual(ordered_set._index[7], 3)
+
+        # a discarded item can be added again, at the end
+        ordered_set.discard(3)
+        ordered_set.add(3)
+        self.assertEqual(list(ordered_set), [1, 5, 7, 9, 3])
+        self.assertEqual(ordered_set[-1], 3)
+        self.assertEqual(ordered_set.pop(), 3)
+        self.assertEqual(ordered_set.pop(last=False), 1)
+        self.assertEqual(ordered_set, LinkedOrderedSet([5, 7, 9]))
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
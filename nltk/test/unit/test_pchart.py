@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the edge queue of the probabilistic chart parsers.
+"""
+from __future__ import absolute_import, unicode_literals
+import unittest
+import warnings
+
+from nltk.grammar import PCFG
+from nltk.parse.pchart import EdgeQueue, InsideChartParser, LongestChartParser, UnsortedChartParser
+
+GRAMMAR = PCFG.fromstring("""
+S -> NP VP [1.0]
+NP -> Det N [0.5] | NP PP [0.25] | 'John' [0.1] | 'I' [0.15]
+Det -> 'the' [0.8] | 'my' [0.2]
+N -> 'man' [0.5] | 'telescope' [0.5]
+VP -> VP PP [0.1] | V NP [0.7] | V [0.2]
+V -> 'ate' [0.35] | 'saw' [0.65]
+PP -> P NP [1.0]
+P -> 'with' [0.61] | 'under' [0.39]
+""")
+
+TOKENS = 'I saw John with my telescope'.split()
+
+
+class TestEdgeQueue(unittest.TestCase):
+
+    def test_order(self):
+        queue = EdgeQueue(len)
+        for edge in ('bb', 'a', 'cc', 'ddd'):
+            queue.push(edge)
+        # the highest key first, of equal keys the one pushed last
+        self.assertEqual([queue.pop() for i in range(len(queue))], ['ddd', 'cc', 'bb', 'a'])
+
+    def test_beam(self):
+        queue = EdgeQueue(len, beam_size=2)
+        self.assertIsNone(queue.push('bb'))
+        self.assertIsNone(queue.push('cc'))
+        # of equal keys the one pushed first is discarded
+        self.assertEqual(queue.push('ddd'), 'bb')
+        self.assertEqual(queue.push('a'), 'a')
+        self.assertEqual(queue.pop(), 'ddd')
+        self.assertIsNone(queue.push('e'))
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.push('fff'), 'e')
+        self.assertEqual([queue.pop() for i in range(len(queue))], ['fff', 'cc'])
+
+    def test_discarded(self):
+        queue = EdgeQueue(len, beam_size=2, keep_discarded=True)
+        for edge in ('bbb', 'ccc', 'dd', 'a', 'e', 'ffff'):
+            queue.push(edge)
+        # in the order a sorted queue discards them
+        self.assertEqual(queue.discarded(), ['a', 'e', 'dd', 'bbb'])
+        self.assertEqual(queue.discarded(), [])
+
+    def test_tuple_keys(self):
+        queue = EdgeQueue(lambda edge: (len(edge), edge))
+        for edge in ('b', 'aa', 'a', 'ab'):
+            queue.push(edge)
+        self.assertEqual([queue.pop() for i in range(len(queue))], ['ab', 'aa', 'b', 'a'])
+
+    def test_many_edges(self):
+        queue = EdgeQueue(lambda edge: edge % 10, beam_size=5)
+        for edge in range(1000):
+            queue.push(edge)
+            if edge % 3 == 0:
+                queue.pop()
+        # the last edge was popped again
+        self.assertEqual(len(queue), 4)
+        self.assertLessEqual(len(queue._best), 11)
+        self.assertLessEqual(len(queue._worst), 11)
+
+
+class TestProbabilisticChartParsers(unittest.TestCase):
+
+    def test_sort_queue_deprecated(self):
+        class SortQueueParser(InsideChartParser):
+            def sort_queue(self, queue, chart):
+                queue.sort()
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            SortQueueParser(GRAMMAR)
+            InsideChartParser(GRAMMAR)
+        self.assertEqual([warning.category for warning in caught], [DeprecationWarning])
+
+    def test_parses(self):
+        for parser_class in (InsideChartParser, LongestChartParser, UnsortedChartParser):
+            parses = list(parser_class(GRAMMAR).parse(TOKENS))
+            self.assertEqual(len(parses), 2)
+            self.assertGreater(parses[0].prob(), parses[1].prob())
+
+    def test_beam(self):
+        self.assertEqual(len(list(InsideChartParser(GRAMMAR, beam_size=30).parse(TOKENS))), 2)
+        self.assertEqual(list(InsideChartParser(GRAMMAR, beam_size=len(TOKENS)).parse(TOKENS)), [])
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
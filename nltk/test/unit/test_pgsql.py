@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the lexicon access of nltk.topology.pgsql, which run against
+a local SQLite production cache instead of the lexicon database.
+"""
+from __future__ import absolute_import, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from nltk.featstruct import CelexFeatStructReader
+from nltk.grammar import FeatStructNonterminal, Production
+from nltk.topology.pgsql import ProductionCache, Lexicon, build_rules, DATABASE_VERSION_QUERY, WORDFORMS_QUERY, \
+    FRAME_SEGMENTS_QUERY, UNIFICATION_FEATURES_QUERY
+
+
+class FakeCursor(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.connection.queries.append(query)
+        if query == DATABASE_VERSION_QUERY:
+            self.rows = [(self.connection.version,)]
+        elif query.startswith(WORDFORMS_QUERY[:30]):
+            self.rows = [row for row in self.connection.wordforms if row[-1] in params]
+        elif query.startswith(FRAME_SEGMENTS_QUERY[:30]):
+            self.rows = [row for row in self.connection.segments if row[0] in params]
+        elif query.startswith(UNIFICATION_FEATURES_QUERY[:30]):
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    """
+    Lexicon database with the frame of a single verb, which records the executed queries.
+    """
+
+    def __init__(self, version='1'):
+        self.version = version
+        self.queries = []
+        self.wordforms = [('v', None, None, 'singen', 1, 'singe'), ('v', None, None, 'singen', 1, 'singt')]
+        self.segments = [(1, 10, 'VP', 'hd', 'v', None, 0)]
+
+    def cursor(self, buffered=False):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+    def count(self, query):
+        return sum(1 for executed in self.queries if executed.startswith(query[:30]))
+
+
+class TestLexicon(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.directory, 'lexicon.sqlite')
+        self.fstruct_reader = CelexFeatStructReader(fdict_class=FeatStructNonterminal)
+        cache = ProductionCache(self.cache_path)
+        cache.set_version('1')
+        cache.put('ich', (Production(FeatStructNonterminal("pron[person='1']"), ('ich',)),))
+        cache.put('singe', (Production(FeatStructNonterminal("v[person='1']"), ('singe',)),))
+        cache.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_productions(self):
+        lexicon = Lexicon(self.cache_path, connection_factory=lambda: None)
+        grammar = build_rules('singe ich'.split(), self.fstruct_reader, dump=False, lexicon=lexicon)
+        self.assertEqual([production.rhs() for production in grammar.productions()], [('singe',), ('ich',)])
+        lexicon.close()
+
+    def test_unknown_word(self):
+        lexicon = Lexicon(self.cache_path, connection_factory=lambda: None)
+        self.assertRaises(ValueError, lexicon.productions, 'singe du'.split(), self.fstruct_reader)
+        lexicon.close()
+
+    def test_version(self):
+        cache = ProductionCache(self.cache_path)
+        cache.set_version('1')
+        self.assertTrue(cache.get('ich'))
+        cache.set_version('2')
+        self.assertEqual(cache.get('ich'), None)
+        cache.close()
+
+    def test_batch_queries(self):
+        connection = FakeConnection()
+        lexicon = Lexicon(connection_factory=lambda: connection)
+        productions = lexicon.productions('singe singt'.split(), self.fstruct_reader)
+        self.assertEqual(set(production.rhs() for production in productions if production.is_lexical()),
+                         {('singe',), ('singt',)})
+        # the frame segments and unification features of both words are fetched at once
+        self.assertEqual([connection.count(query) for query in
+                          (WORDFORMS_QUERY, FRAME_SEGMENTS_QUERY, UNIFICATION_FEATURES_QUERY)], [1, 1, 1])
+
+    def test_unknown_word_cached(self):
+        connection = FakeConnection()
+        lexicon = Lexicon(self.cache_path, connection_factory=lambda: connection)
+        for i in range(2):
+            self.assertRaises(ValueError, lexicon.productions, 'singe du'.split(), self.fstruct_reader)
+        self.assertEqual(connection.count(WORDFORMS_QUERY), 1)
+        lexicon.close()
+
+    def test_version_per_batch(self):
+        connection = FakeConnection()
+        lexicon = Lexicon(self.cache_path, connection_factory=lambda: connection)
+        self.assertTrue(lexicon.productions(['ich'], self.fstruct_reader))
+        self.assertEqual(connection.count(WORDFORMS_QUERY), 0)
+        # the update of the database drops the cached productions of the next batch
+        connection.version = '2'
+        self.assertRaises(ValueError, lexicon.productions, ['ich'], self.fstruct_reader)
+        self.assertEqual(connection.count(DATABASE_VERSION_QUERY), 2)
+        lexicon.close()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the assignment of topologies to dominance structures.
+"""
+from __future__ import absolute_import, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from nltk.featstruct import TYPE
+from nltk.grammar import FeatStructNonterminal
+from nltk.topology.FeatTree import FeatTree, FT, GF, PH, TAG
+from nltk.topology.dominance import dump_dominance_structures, iter_dominance_structures, linearize_dumps, \
+    TopologyService
+from nltk.topology.topology import build_topologies, process_dominance, TopologyRules
+
+
+def node(gf, ph, children, **features):
+    label = FeatStructNonterminal()
+    label[TYPE] = ph
+    label.update(features)
+    tree = FeatTree(label, children=children, gf=gf, ph=PH[ph])
+    tree.topologies = []
+    for child in children:
+        if isinstance(child, FeatTree):
+            child.parent = tree
+    return tree
+
+
+def sentence(*children):
+    tree = node(None, 'S', list(children), status='Fin', mood='indicative')
+    tree.numerate()
+    return tree
+
+
+def subj():
+    return node(GF.subj, 'NP', [node(GF.hd, 'pers_pro', ['ich'])], wh=False)
+
+
+def verb():
+    return node(GF.hd, 'v', ['sehe'])
+
+
+def dobj(ph='n', word='Kaffee'):
+    return node(GF.dobj, 'NP', [node(GF.hd, ph, [word])], wh=False)
+
+
+def filled(topologies):
+    return [{ft: gorns for ft, gorns in topology.items() if gorns} for topology in topologies]
+
+
+class TestProcessDominance(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = build_topologies()
+
+    def assign(self, tree):
+        tree.topologies.extend(process_dominance(tree, self.rules))
+        return tree
+
+    def test_topologies(self):
+        tree = self.assign(sentence(subj(), verb(), dobj()))
+        self.assertEqual(filled(tree.topologies),
+                         [{FT.F1: (1, 3), FT.M1: (2,), FT.M2a: (1,), FT.M4b: (3,)}])
+        self.assertEqual(filled(tree[2].topologies), [{FT.NP3: (31,)}])
+        self.assertEqual(tree[1].topologies, [])
+
+    def test_dependent_fields(self):
+        mod = node(GF.mod, 'ADVP', [node(GF.hd, 'adv', ['heute'])])
+        tree = self.assign(sentence(mod, verb(), subj(), dobj('dem_pro', 'das')))
+        self.assertEqual(filled(tree.topologies),
+                         [{FT.F1: (1, 3, 4), FT.M1: (2,), FT.M2a: (3,), FT.M2b: (4,), FT.M4c: (1,)}])
+
+    def test_memo(self):
+        self.assertIsInstance(self.rules, TopologyRules)
+        first = self.assign(sentence(subj(), verb(), dobj()))
+        self.assertEqual(self.rules.hit_rate(), 0.0)
+        # the same constituents in another order share their subtrees
+        second = self.assign(sentence(dobj(), verb(), subj()))
+        self.assertGreater(self.rules.hit_rate(), 0.0)
+        self.assertEqual(second.topologies[0][FT.M1], (2,))
+        self.assertEqual(filled(second[0].topologies), [{FT.NP3: (11,)}])
+
+        # an equal dominance structure gets equal topologies, which can be modified independently
+        third = self.assign(sentence(subj(), verb(), dobj()))
+        self.assertEqual(third.topologies, first.topologies)
+        self.assertIsNot(third.topologies[0], first.topologies[0])
+        self.assertEqual(third[2].topologies, first[2].topologies)
+        third.topologies[0].field_map[FT.F1].shared_to = FT.M1
+        self.assertIsNone(first.topologies[0].field_map[FT.F1].shared_to)
+
+    def test_index(self):
+        self.assertEqual([rule.tag for rule in self.rules.by_ph(PH.NP)], [TAG.np])
+        self.assertEqual([rule.ph for rule in self.rules.by_tag(TAG.cp)], [PH.CP])
+        self.assertEqual([rule.tag for rule in self.rules.by_field(FT.M1)],
+                         [TAG.main, TAG.imperative, TAG.sub, TAG.subv2])
+        self.assertEqual(self.rules.by_ph(PH.n), ())
+        self.assertEqual([rule.tag for rule in self.rules.candidates(PH.S, (GF.cmp, PH.S))],
+                         [TAG.sub, TAG.subv2, TAG.inf])
+
+    def test_plain_rules(self):
+        tree = sentence(subj(), verb(), dobj())
+        tree.topologies.extend(process_dominance(tree, tuple(self.rules)))
+        self.assertEqual(len(tree.topologies), 1)
+        self.assertEqual(len(tree[0].topologies), 1)
+
+class TestLinearizeDumps(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_linearize_dumps(self):
+        dump_path = os.path.join(self.directory, 'dominance_structures.dump')
+        dump_dominance_structures([sentence(subj(), verb(), dobj())], dump_path, append=False)
+        dump_dominance_structures([sentence(dobj(), verb(), subj()), sentence(subj(), verb())], dump_path)
+        self.assertEqual(len(list(iter_dominance_structures(dump_path, dump_path))), 6)
+
+        output_path = os.path.join(self.directory, 'linearizations.txt')
+        self.assertEqual(linearize_dumps([dump_path], output_path, processes=2, chunksize=1), 3)
+        with open(output_path, encoding='utf8') as f:
+            lines = sorted(line.rstrip('\n').split('\t') for line in f)
+        self.assertEqual(lines, [['0', 'Kaffee sehe ich'], ['0', 'ich sehe Kaffee'], ['0', 'sehe ich Kaffee'],
+                                 ['1', 'Kaffee sehe ich'], ['1', 'ich sehe Kaffee'], ['1', 'sehe ich Kaffee'],
+                                 ['2', 'ich sehe'], ['2', 'sehe ich']])
+
+    def test_iter_dominance_structures(self):
+        dump_path = os.path.join(self.directory, 'dominance_structures.dump')
+        words = ('Kaffee', 'Tee', 'Wasser', 'Saft')
+        dump_dominance_structures([sentence(subj(), verb(), dobj(word=words[0]))], dump_path, append=False)
+        dump_dominance_structures([sentence(subj(), verb(), dobj(word=word)) for word in words[1:3]], dump_path)
+        dump_dominance_structures([sentence(subj(), verb(), dobj(word=words[3]))], dump_path)
+        # the structures of all chunks are read in the order they were dumped
+        self.assertEqual([tree[2][0][0] for tree in iter_dominance_structures(dump_path)], list(words))
+
+        with TopologyService(processes=2, chunksize=1) as service:
+            linearizations = dict(service.linearize(iter_dominance_structures(dump_path)))
+        self.assertEqual(sorted(linearizations), [0, 1, 2, 3])
+        for index, word in enumerate(words):
+            self.assertIn('ich sehe ' + word, linearizations[index])
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
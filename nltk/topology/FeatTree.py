@@ -2,6 +2,7 @@ import itertools
 
 from nltk.compat import unicode_repr
 from nltk.topology.orderedSet import OrderedSet
+from nltk.util import LRUCache
 from yaep.tools.permutations import values_combinations
 
 __author__ = 'Denis Krusko: kruskod@gmail.com'
@@ -932,6 +933,140 @@ def simplify_expression(feat):
 
 
 
+# maximal number of distinct expressions kept by SimplifiedExpressions
+EXPRESSION_CACHE_SIZE = 8192
+
+class FrozenFeatures(dict):
+    """
+    Immutable and hashable map of the features of one case of a simplified expression.
+
+    >>> case = FrozenFeatures({'case': 'nom', 'num': 'sg'})
+    >>> case == {'num': 'sg', 'case': 'nom'}, hash(case) == hash(FrozenFeatures(case))
+    (True, True)
+    >>> case['num'] = 'pl'
+    Traceback (most recent call last):
+      ...
+    TypeError: FrozenFeatures can not be modified
+    """
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(frozenset(self.items()))
+            return self._hash
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('FrozenFeatures can not be modified')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+def freeze_expression(feat):
+    """
+    :return: a hashable copy of the expression, usable as a key of simplified expressions
+    """
+    if isinstance(feat, dict):
+        return FrozenFeatures(feat)
+    elif isinstance(feat, (tuple, list)) and feat and isinstance(feat[0], OP):
+        return (feat[0], tuple(freeze_expression(f) for f in feat[1]))
+    else:
+        raise ValueError("wrong type of argument:", feat)
+
+class SimplifiedExpressions(object):
+    """
+    Memo of ``simplify_expression`` for the expressions of a grammar, which do not change after loading.
+    An expression is simplified once into a disjunctive normal form, a tuple of ``FrozenFeatures`` cases.
+    The cases of a frozen nonterminal are additionally cached on the nonterminal itself, like its signature;
+    the expression of an unfrozen nonterminal is looked up again on each call, as it may have been modified.
+    The cases are immutable, so callers that modify them must use ``simplify_expression``.
+    """
+
+    def __init__(self, maxsize=EXPRESSION_CACHE_SIZE):
+        self._cache = LRUCache(maxsize)
+        self.nonterminal_hits = 0
+
+    def cases(self, expression):
+        """
+        :return: the simplified expression as a tuple of ``FrozenFeatures``
+        """
+        key = freeze_expression(expression)
+        return self._cases(expression, key)
+
+    def _cases(self, expression, key):
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable feature values can not be cached
+            return self._simplify(expression)
+        cases = self._cache.get(key)
+        if cases is None:
+            cases = self._simplify(expression)
+            self._cache[key] = cases
+        return cases
+
+    def nonterminal_cases(self, nonterminal):
+        """
+        :return: the cases of the expression of the nonterminal or None, if it has no expression
+        """
+        expression = nonterminal.get(EXPRESSION)
+        if expression is None:
+            return None
+        if not nonterminal.frozen():
+            return self.cases(expression)
+        try:
+            cases = nonterminal._expression_cases
+        except AttributeError:
+            cases = nonterminal._expression_cases = self.cases(expression)
+        else:
+            self.nonterminal_hits += 1
+        return cases
+
+    def _simplify(self, expression):
+        simplified = simplify_expression(expression)
+        if isinstance(simplified, dict):
+            simplified = (simplified,)
+        return tuple(FrozenFeatures(case) for case in simplified)
+
+    def hits(self):
+        return self.nonterminal_hits + self._cache.hits
+
+    def misses(self):
+        return self._cache.misses
+
+    def hit_rate(self):
+        """
+        :return: share of the lookups answered without simplifying an expression
+        """
+        lookups = self.hits() + self.misses()
+        return float(self.hits()) / lookups if lookups else 0.0
+
+    def clear(self):
+        self._cache.clear()
+        self.nonterminal_hits = 0
+
+    def __repr__(self):
+        return '<SimplifiedExpressions with {} expressions, hit rate {:.2%}>'.format(
+            len(self._cache), self.hit_rate())
+
+_simplified_expressions = SimplifiedExpressions()
+
+def simplified_expressions():
+    """
+    :return: the ``SimplifiedExpressions`` shared by the unification of feature structures
+    """
+    return _simplified_expressions
+
+def expression_cases(fstruct):
+    """
+    :return: the cases of the simplified ``EXPRESSION`` of ``fstruct``, memoized by ``simplified_expressions()``
+    """
+    if isinstance(fstruct, FeatStructNonterminal):
+        return _simplified_expressions.nonterminal_cases(fstruct)
+    return _simplified_expressions.cases(fstruct[EXPRESSION])
+
         # #Add subject-verb agreement
         # if NUMBER_FEATURE in lhs or PERSON_FEATURE in lhs:
         #     for nt in rhs:
@@ -1076,8 +1211,7 @@ def combine_expression(feat_list):
 def get_feature(featStructNonTerm, feature):
     result = set()
     if EXPRESSION in featStructNonTerm:
-        simp_expressions = simplify_expression(featStructNonTerm[EXPRESSION])
-        for exp in simp_expressions:
+        for exp in expression_cases(featStructNonTerm):
             if feature in exp:
                 result.add(exp[feature])
     else:
@@ -1,4 +1,6 @@
+import multiprocessing
 import pickle
+import sys
 
 from nltk.draw.tree import Graphview, TreeTabView
 from nltk.topology.FeatTree import FeatTree
@@ -6,8 +8,11 @@ from nltk.topology.orderedSet import OrderedSet
 from nltk.topology.topology import process_dominance, build_topologies
 from yaep.parse.parse_tree_generator import Node
 
+# number of dominance structures sent to a TopologyService worker at once
+CHUNKSIZE = 16
 
-def wordorder_alternatives(feat_tree, topologies):
+
+def wordorder_alternatives(feat_tree, topologies, trace=1):
     feat_tree.topologies.extend(process_dominance(feat_tree, topologies))
     # print(feat_tree.topologies)
     feat_tree.alternatives()
@@ -20,10 +25,12 @@ def wordorder_alternatives(feat_tree, topologies):
         alternative.share()
         shared_alternatives.extend(alternative.split_shared_topologies())
 
-    print("\nAlternatives validaton:")
+    if trace:
+        print("\nAlternatives validaton:")
     for index, alternative in enumerate(sorted(shared_alternatives, key=FeatTree.leaves)):
         isvalid = validate_alternative(alternative)
-        print("{}\t{}\t{}:\t{}".format(index, " ".join(alternative.leaves()), repr(alternative.topologies), isvalid ))
+        if trace:
+            print("{}\t{}\t{}:\t{}".format(index, " ".join(alternative.leaves()), repr(alternative.topologies), isvalid ))
         if isvalid:
 
             yield alternative
@@ -40,10 +47,7 @@ def demo(dump_path='../../fsa/dominance_structures.dump'):
     alternatives = []
     for tree in dumped_trees[-2:]:
         # print(tree.pretty_print(0))
-        if isinstance(tree, Node):
-            feat_tree = FeatTree.from_node(tree)
-        else:
-            feat_tree = FeatTree(tree)
+        feat_tree = as_feat_tree(tree)
         print(feat_tree.pretty_print(0))
         alternatives.extend(wordorder_alternatives(feat_tree, topologies))
 
@@ -57,6 +61,128 @@ def demo(dump_path='../../fsa/dominance_structures.dump'):
     # ps2pdf -dEPSCrop Monopole_tree.ps
 
 
+def as_feat_tree(tree):
+    if isinstance(tree, FeatTree):
+        return tree
+    elif isinstance(tree, Node):
+        return FeatTree.from_node(tree)
+    else:
+        return FeatTree(tree)
+
+
+def dump_dominance_structures(dominance_structures, dump_path, append=True):
+    """
+    Append the dominance structures as one chunk to a dump, so that a dump can be extended sentence by sentence.
+    """
+    with open(dump_path, 'ab' if append else 'wb') as f:
+        pickle.dump(list(dominance_structures), f, pickle.HIGHEST_PROTOCOL)
+
+
+def iter_dominance_structures(*dump_paths):
+    """
+    Read the dominance structures from dumps chunk by chunk.
+    A dump is a sequence of pickled lists of trees, e.g. written by ``dump_dominance_structures``;
+    the dump of ``bindings_earley.print_trees`` is a dump with one chunk.
+    """
+    for dump_path in dump_paths:
+        with open(dump_path, 'rb') as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    break
+                yield from chunk
+
+
+# topology rules of a TopologyService worker process, set once by init_topology_worker
+_worker_topologies = None
+
+
+def init_topology_worker(topologies=None):
+    global _worker_topologies
+    # the rules contain lambdas, so the workers of a spawned pool have to build them themselves
+    _worker_topologies = topologies if topologies is not None else build_topologies()
+
+
+def linearize(task):
+    index, tree = task
+    alternatives = wordorder_alternatives(as_feat_tree(tree), _worker_topologies, trace=0)
+    return index, tuple(sorted(set(" ".join(alternative.leaves()) for alternative in alternatives)))
+
+
+class TopologyService(object):
+    """
+    Pool of worker processes, which are initialised once with the topology rules and linearize dominance structures.
+
+        with TopologyService() as service:
+            for index, sentences in service.linearize(iter_dominance_structures(dump_path)):
+                ...
+    """
+
+    def __init__(self, topologies=None, processes=None, chunksize=CHUNKSIZE):
+        """
+        :param topologies: topology rules, by default ``build_topologies()``
+        """
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # forked workers inherit the rules instead of unpickling them
+            context = multiprocessing.get_context('fork')
+            if topologies is None:
+                topologies = build_topologies()
+        else:
+            context = multiprocessing.get_context()
+            topologies = None
+        self._chunksize = chunksize
+        self._pool = context.Pool(processes or multiprocessing.cpu_count(), initializer=init_topology_worker,
+                                  initargs=(topologies,))
+
+    def linearize(self, dominance_structures):
+        """
+        :param dominance_structures: iterable of dominance structures, which is sent to the workers in chunks
+        :return: iterator over pairs of the index of a dominance structure and its sorted linearizations
+            in the order they are finished
+        """
+        return self._pool.imap_unordered(linearize, enumerate(dominance_structures), self._chunksize)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """
+        Stop the workers without waiting for the queued dominance structures.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+def linearize_dumps(dump_paths, output_path, processes=None, chunksize=CHUNKSIZE):
+    """
+    Linearize the dominance structures of the dumps in a TopologyService and write every linearization
+    as a line "index<TAB>sentence" as soon as its dominance structure is processed.
+    The index is the position of the dominance structure in the dumps.
+
+    :return: number of the processed dominance structures
+    """
+    number_structures = 0
+    with TopologyService(processes=processes, chunksize=chunksize) as service, \
+            open(output_path, 'w', encoding='utf8') as out:
+        for index, sentences in service.linearize(iter_dominance_structures(*dump_paths)):
+            number_structures += 1
+            for sentence in sentences:
+                out.write("{}\t{}\n".format(index, sentence))
+            out.flush()
+    return number_structures
+
+
 def validate_alternative(alternative):
     if not alternative.topologies:
         return False
@@ -68,4 +194,8 @@ def validate_alternative(alternative):
     return True
 
 if __name__ == "__main__":
-    demo()
+    # python dominance.py <output path> <dump path>... linearizes the dumps, without arguments the demo runs
+    if len(sys.argv) > 2:
+        linearize_dumps(sys.argv[2:], sys.argv[1])
+    else:
+        demo()
@@ -1,9 +1,124 @@
 import collections
+from bisect import bisect_right
+from timeit import default_timer
+
+# placeholder for a discarded item in OrderedSet._items
+_REMOVED = object()
 
 class OrderedSet(collections.MutableSet):
+    """
+    Insertion ordered set backed by an append-only list and a dict from the items to their positions.
+    Discarded items leave a tombstone in the list, which is dropped by the next compaction.
+    Iteration visits the items added while iterating, as the yaep charts require. Every item gets an
+    increasing serial number, so an iteration continues after its last item when a compaction moved the positions.
+
+    >>> s = OrderedSet('abracadabra')
+    >>> s
+    OrderedSet(['a', 'b', 'r', 'c', 'd'])
+    >>> s[2]
+    'r'
+    >>> s.discard('b')
+    >>> s[2]
+    'c'
+    >>> for item in s:
+    ...     if item == 'a':
+    ...         s.add('e')
+    >>> list(s)
+    ['a', 'r', 'c', 'd', 'e']
+    """
 
     def __init__(self, iterable=None):
-        self.end = end = [] 
+        self._items = []
+        self._serials = []              # serial numbers of self._items, in increasing order
+        self._index = {}                # key --> position in self._items
+        self._removed = 0               # number of tombstones in self._items
+        self._serial = 0                # serial number of the next added item
+        self._epoch = 0                 # number of compactions, an iteration relocates itself when it changes
+        if iterable is not None:
+            self |= iterable
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def add(self, key):
+        if key not in self._index:
+            self._index[key] = len(self._items)
+            self._items.append(key)
+            self._serials.append(self._serial)
+            self._serial += 1
+
+    def discard(self, key):
+        if key in self._index:
+            self._items[self._index.pop(key)] = _REMOVED
+            self._removed += 1
+
+    def _compact(self):
+        kept = [position for position, item in enumerate(self._items) if item is not _REMOVED]
+        self._items = [self._items[position] for position in kept]
+        self._serials = [self._serials[position] for position in kept]
+        self._index = {item: position for position, item in enumerate(self._items)}
+        self._removed = 0
+        self._epoch += 1
+
+    def __iter__(self):
+        epoch = self._epoch
+        items, serials = self._items, self._serials
+        position = 0
+        serial = -1
+        while True:
+            if epoch != self._epoch:
+                # the positions moved, continue after the last visited item
+                epoch = self._epoch
+                items, serials = self._items, self._serials
+                position = bisect_right(serials, serial)
+            if position >= len(items):
+                return
+            item = items[position]
+            serial = serials[position]
+            position += 1
+            if item is not _REMOVED:
+                yield item
+
+    def __reversed__(self):
+        for item in reversed(self._items):
+            if item is not _REMOVED:
+                yield item
+
+    def __getitem__(self, index):
+        if self._removed:
+            self._compact()
+        if -len(self._items) <= index < len(self._items):
+            return self._items[index]
+
+    def pop(self, last=True):
+        if not self:
+            raise KeyError('set is empty')
+        items = reversed(self._items) if last else self._items
+        key = next(item for item in items if item is not _REMOVED)
+        self.discard(key)
+        return key
+
+    def __repr__(self):
+        if not self:
+            return '%s()' % (self.__class__.__name__,)
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (OrderedSet, LinkedOrderedSet)):
+            return len(self) == len(other) and list(self) == list(other)
+        return set(self) == set(other)
+
+
+class LinkedOrderedSet(collections.MutableSet):
+    """
+    Insertion ordered set backed by a doubly linked list. Positional access walks the list from the head.
+    """
+
+    def __init__(self, iterable=None):
+        self.end = end = []
         end += [None, end, end]         # sentinel node for doubly linked list
         self.map = {}                   # key --> [key, prev, next]
         if iterable is not None:
@@ -22,7 +137,7 @@ class OrderedSet(collections.MutableSet):
             curr[2] = end[1] = self.map[key] = [key, curr, end]
 
     def discard(self, key):
-        if key in self.map:        
+        if key in self.map:
             key, prev, next = self.map.pop(key)
             prev[2] = next
             next[1] = prev
@@ -62,11 +177,49 @@ class OrderedSet(collections.MutableSet):
         return '%s(%r)' % (self.__class__.__name__, list(self))
 
     def __eq__(self, other):
-        if isinstance(other, OrderedSet):
+        if isinstance(other, (OrderedSet, LinkedOrderedSet)):
             return len(self) == len(other) and list(self) == list(other)
         return set(self) == set(other)
 
-            
+
+def benchmark(sizes=(1000, 10000, 50000), repeat=3):
+    """
+    Compare OrderedSet with LinkedOrderedSet on chart sized workloads: adding states with duplicates,
+    iterating while appending (like AbstractEarley.parse) and positional access (like Chart.get_state).
+    """
+    def fill(set_class, size):
+        ordered_set = set_class()
+        for i in range(size):
+            ordered_set.add((i, i % 7))
+            ordered_set.add((i // 2, (i // 2) % 7))
+        return ordered_set
+
+    def iterate_appending(set_class, size):
+        ordered_set = set_class(((0, 0),))
+        for i, item in enumerate(ordered_set):
+            if i < size:
+                ordered_set.add((i + 1, 0))
+
+    def index(set_class, size):
+        ordered_set = fill(set_class, size)
+        for i in range(0, size, max(1, size // 1000)):
+            ordered_set[i]
+
+    print("{:<20}{:>8}{:>18}{:>18}".format('workload', 'size', 'OrderedSet', 'LinkedOrderedSet'))
+    for workload in (fill, iterate_appending, index):
+        for size in sizes:
+            timings = []
+            for set_class in (OrderedSet, LinkedOrderedSet):
+                best = None
+                for i in range(repeat):
+                    start = default_timer()
+                    workload(set_class, size)
+                    elapsed = default_timer() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append(best)
+            print("{:<20}{:>8}{:>17.4f}s{:>17.4f}s".format(workload.__name__, size, *timings))
+
+
 if __name__ == '__main__':
     s = OrderedSet('abracadaba')
     t = OrderedSet('simsalabim')
@@ -76,3 +229,4 @@ if __name__ == '__main__':
     for temp in s:
         s.discard('a')
     print(s)
+    benchmark()
@@ -1,4 +1,6 @@
 import copy
+import pickle
+import sqlite3
 from operator import itemgetter
 
 import itertools
@@ -6,19 +8,57 @@ import itertools
 from nltk.featstruct import CelexFeatStructReader, unify, TYPE, EXPRESSION, _unify_feature_values
 from nltk.grammar import FeatStructNonterminal, Production, FeatureGrammar
 from nltk.topology.FeatTree import minimize_nonterm, open_disjunction, simplify_expression, GF, STATUS
+from nltk.util import unique_list
 from nltk.topology.compassFeat import GRAM_FUNC_FEATURE, LEMMA_FEATURE, PRODUCTION_ID_FEATURE, BRANCH_FEATURE, \
     INHERITED_FEATURE, SLOT_FEATURE, PERSONAL_FEATURE, INFLECTED_FEATURE, STATUS_FEATURE
 
 __author__ = 'Denis Krusko: kruskod@gmail.com'
 
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
 
+# CONNECTION_ARGS = dict(host="localhost", port=3306, user='root', password='total', database='pgc', use_unicode = True, charset='utf8', collation='utf8_bin')
+CONNECTION_ARGS = dict(unix_socket="/var/run/mysqld/mysqld.sock", database='pgc', password='total', user='root', use_unicode = True, charset='utf8', collation='utf8_bin')
+POOL_SIZE = 4
 
-def connect():
+_connection_pool = None
+_default_lexicon = None
+
+WORDFORMS_QUERY = (
+    ' select pos, i.feature as formFeature, c.feature as categoryFeature, l.lemma, f.lexFrameKey, w.word from WordForm w' +
+    ' inner join InflectionalForm i on i.inflFormKey = w.inflFormKey' +
+    ' inner join Lemma l on l.lemmaId = w.lemmaId' +
+    ' inner join WordFrame f on f.lemmaId = w.lemmaId' +
+    ' inner join WordCategory c on c.lexFrameKey = f.lexFrameKey' +
+    ' where w.word in ({});')
+
+FRAME_SEGMENTS_QUERY = (
+    'select w.lexFrameKey, w.position, pos1,pos2,pos3,feature, w.facultative from WordCategorySegment w' +
+    ' inner join Segment s on s.position = w.position' +
+    ' left join PartOfSpeech p on p.pos = s.pos3' +
+    ' where w.lexFrameKey in ({})' +
+    ' order by w.lexFrameKey, w.facultative, w.position;')
+
+UNIFICATION_FEATURES_QUERY = 'select u.position, cond, feature from UnificationFeatures u where u.position in ({});'
+
+LEMMAS_QUERY = 'select l.lemma from Lemma l where l.lemma in ({});'
+
+DATABASE_VERSION_QUERY = (
+    'select max(coalesce(update_time, create_time)) from information_schema.tables where table_schema = database();')
+
+
+def connect(pooled=False):
+    """
+    :param pooled: take the connection from the connection pool, closing it returns it to the pool
+    """
+    global _connection_pool
     try:
-        # cnx = mysql.connector.connect(host="localhost", port=3306, user='root', password='total', database='pgc', use_unicode = True, charset='utf8', collation='utf8_bin')
-        cnx = mysql.connector.connect(unix_socket="/var/run/mysqld/mysqld.sock", database='pgc', password='total', user='root', use_unicode = True, charset='utf8', collation='utf8_bin')
+        if pooled:
+            if _connection_pool is None:
+                _connection_pool = pooling.MySQLConnectionPool(pool_name='pgc', pool_size=POOL_SIZE, **CONNECTION_ARGS)
+            cnx = _connection_pool.get_connection()
+        else:
+            cnx = mysql.connector.connect(**CONNECTION_ARGS)
     except mysql.connector.Error as err:
         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
             print("Something is wrong with your user name or password")
@@ -30,48 +70,231 @@ def connect():
         return cnx
 
 
-def build_rules(tokens, fstruct_reader, dump=True):
-    cnx = connect()
-    productions = []
-    if cnx:
-        cursor = cnx.cursor(buffered = True)
+def build_rules(tokens, fstruct_reader, dump=True, lexicon=None):
+    """
+    Build the grammar of the lexical frames of the tokens.
+    :param lexicon: ``Lexicon`` to look the tokens up, defaults to a shared lexicon without a persistent cache
+    :raise ValueError: if a token is not in the lexicon
+    """
+    if lexicon is None:
+        lexicon = default_lexicon()
+    productions = lexicon.productions(tokens, fstruct_reader)
+
+    # productions.append(Production(FeatStructNonterminal("S[]"), (
+    #     FeatStructNonterminal("S[]"), FeatStructNonterminal("XP[]"), FeatStructNonterminal("S[]"),)))
+
+    if dump:
+        sorted_productions = sorted(productions, key=lambda production: (get_production_id_feature(production), production.lhs().get(TYPE)))
+        # f.write('\n'.join(rules))
+        with open('../../fsa/query.fcfg', "w") as f:
+            # f.write('\n'.join(repr(rule) for rule in sorted_productions))
+            last_prod_id = None
+            for rule in sorted_productions:
+                prod_id = get_production_id_feature(rule)
+                if prod_id != last_prod_id:
+                    f.write('\n')
+                    last_prod_id = prod_id
+                f.write(repr(rule) + '\n')
+    return FeatureGrammar(FeatStructNonterminal("S[status='Fin']"),  productions)
 
-        query = (
-        ' select pos, i.feature as formFeature, c.feature as categoryFeature, l.lemma, f.lexFrameKey, w.word from WordForm w' +
-        ' inner join InflectionalForm i on i.inflFormKey = w.inflFormKey' +
-        ' inner join Lemma l on l.lemmaId = w.lemmaId' +
-        ' inner join WordFrame f on f.lemmaId = w.lemmaId' +
-        ' inner join WordCategory c on c.lexFrameKey = f.lexFrameKey' +
-        ' where w.word=%s;')
 
+class ProductionCache(object):
+    """
+    Persistent SQLite store of the productions of each wordform, an unknown wordform has no productions.
+    The store is emptied when the version of the lexicon database changes.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute('create table if not exists productions (word text primary key, productions blob)')
+        self._db.execute('create table if not exists version (version text)')
+        self._db.commit()
+
+    def version(self):
+        row = self._db.execute('select version from version').fetchone()
+        return row[0] if row else None
+
+    def set_version(self, version):
+        if version != self.version():
+            self._db.execute('delete from productions')
+            self._db.execute('delete from version')
+            self._db.execute('insert into version values (?)', (version,))
+            self._db.commit()
+
+    def get(self, word):
+        row = self._db.execute('select productions from productions where word = ?', (word,)).fetchone()
+        if row:
+            return pickle.loads(row[0])
+
+    def put(self, word, productions):
+        self._db.execute('insert or replace into productions values (?, ?)',
+                         (word, pickle.dumps(tuple(productions), pickle.HIGHEST_PROTOCOL)))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class Lexicon(object):
+    """
+    Lookup of the productions of wordforms. The wordforms which are not cached yet are fetched
+    from the lexicon database over a pooled connection, with a single query for the wordforms, their
+    frame segments and unification features each. Unknown wordforms are cached as well.
+    """
+
+    def __init__(self, cache_path=None, connection_factory=None):
+        """
+        :param cache_path: file of the persistent ``ProductionCache``, without it the productions are
+        cached for the lifetime of the lexicon
+        :param connection_factory: function returning a database connection or None, defaults to a pooled ``connect``
+        """
+        self._connection_factory = connection_factory or (lambda: connect(pooled=True))
+        self._cache = ProductionCache(cache_path) if cache_path else None
+        self._productions = {}
+        self._lemmas = {}               # lemma --> True if it is in the lexicon
+        self._version = None
+
+    def cached_productions(self, word):
+        productions = self._productions.get(word)
+        if productions is None and self._cache:
+            productions = self._cache.get(word)
+            if productions is not None:
+                self._productions[word] = productions
+        return productions
+
+    def productions(self, tokens, fstruct_reader):
+        """
+        :return: list of the productions of the tokens, in the order of the tokens
+        :raise ValueError: if a token is not in the lexicon
+        """
+        cnx = self._connection_factory()
+        if cnx:
+            # the version is checked for each batch, so the lexicon follows updates of the database
+            self.check_version(database_version(cnx))
+            missing = [word for word in unique_list(tokens) if self.cached_productions(word) is None]
+            if missing:
+                rows = query_wordforms(cnx, missing)
+                all_rows = list(itertools.chain.from_iterable(rows.values()))
+                frame_segments = query_frame_segments(cnx, unique_list(row[4] for row in all_rows))
+                unification_features = query_unification_features(
+                    cnx, unique_list(segment[0] for segments in frame_segments.values() for segment in segments))
+                for word in missing:
+                    productions = tuple(productions_extractor(cnx, rows.get(word, ()), fstruct_reader,
+                                                              frame_segments, unification_features))
+                    self._productions[word] = productions
+                    if self._cache:
+                        self._cache.put(word, productions)
+            cnx.close()
+
+        unknown = [word for word in unique_list(tokens) if not self.cached_productions(word)]
+        if unknown:
+            raise ValueError("No wordforms found: {}".format(", ".join(unknown)))
+
+        productions = []
         for token in tokens:
-            try:
-                cursor.execute(query, (token,))
-                productions.extend(productions_extractor(cnx, cursor, fstruct_reader))
-            except Exception as e:
-                print("No wordforms found: '{}', {}!".format(token), e)
-                import sys
-                sys.exit(1)
-
+            productions.extend(self._productions[token])
+        return productions
+
+    def check_version(self, version):
+        """
+        Drop the cached productions and lemmas, if the version of the lexicon database has changed.
+        """
+        if version != self._version:
+            if self._version is not None:
+                self._productions.clear()
+                self._lemmas.clear()
+            if self._cache:
+                self._cache.set_version(version)
+            self._version = version
+
+    def known_lemmas(self, lemmas):
+        """
+        :return: set of the lemmas which are in the lexicon. The lemmas which were not checked
+        before are looked up with a single query, and the answers are cached for both known and unknown lemmas.
+        """
+        unchecked = [lemma for lemma in unique_list(lemmas) if lemma not in self._lemmas]
+        if unchecked:
+            cnx = self._connection_factory()
+            if cnx:
+                found = query_lemmas(cnx, unchecked)
+                for lemma in unchecked:
+                    self._lemmas[lemma] = lemma in found
+                cnx.close()
+        return set(lemma for lemma in lemmas if self._lemmas.get(lemma))
+
+    def close(self):
+        if self._cache:
+            self._cache.close()
+
+
+def default_lexicon():
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = Lexicon()
+    return _default_lexicon
+
+
+def query_wordforms(cnx, words):
+    """
+    :return: dict from the word to the rows of its wordforms
+    """
+    cursor = cnx.cursor(buffered=True)
+    cursor.execute(WORDFORMS_QUERY.format(', '.join(('%s',) * len(words))), tuple(words))
+    rows = {}
+    for row in cursor:
+        word = row[-1]
+        if not isinstance(word, str):
+            word = word.decode('utf8')
+        rows.setdefault(word, []).append(row)
+    cursor.close()
+    return rows
+
+
+def query_lemmas(cnx, lemmas):
+    """
+    :return: set of the given lemmas which are in the Lemma table
+    """
+    cursor = cnx.cursor()
+    cursor.execute(LEMMAS_QUERY.format(', '.join(('%s',) * len(lemmas))), tuple(lemmas))
+    found = set(lemma if isinstance(lemma, str) else lemma.decode('utf8') for (lemma,) in cursor)
+    cursor.close()
+    return found
+
+
+def query_frame_segments(cnx, lexFrameKeys):
+    """
+    :return: dict from the lexFrameKey to the rows of its segments, ordered by facultative and position
+    """
+    segments = {}
+    if lexFrameKeys:
+        cursor = cnx.cursor(buffered=True)
+        cursor.execute(FRAME_SEGMENTS_QUERY.format(', '.join(('%s',) * len(lexFrameKeys))), tuple(lexFrameKeys))
+        for row in cursor:
+            segments.setdefault(row[0], []).append(row[1:])
+        cursor.close()
+    return segments
+
+
+def query_unification_features(cnx, positions):
+    """
+    :return: dict from the segment position to its (cond, feature) rows
+    """
+    features = {}
+    if positions:
+        cursor = cnx.cursor(buffered=True)
+        cursor.execute(UNIFICATION_FEATURES_QUERY.format(', '.join(('%s',) * len(positions))), tuple(positions))
+        for row in cursor:
+            features.setdefault(row[0], []).append(row[1:])
+        cursor.close()
+    return features
 
-        # productions.append(Production(FeatStructNonterminal("S[]"), (
-        #     FeatStructNonterminal("S[]"), FeatStructNonterminal("XP[]"), FeatStructNonterminal("S[]"),)))
 
-        if dump:
-            sorted_productions = sorted(productions, key=lambda production: (get_production_id_feature(production), production.lhs().get(TYPE)))
-            # f.write('\n'.join(rules))
-            with open('../../fsa/query.fcfg', "w") as f:
-                # f.write('\n'.join(repr(rule) for rule in sorted_productions))
-                last_prod_id = None
-                for rule in sorted_productions:
-                    prod_id = get_production_id_feature(rule)
-                    if prod_id != last_prod_id:
-                        f.write('\n')
-                        last_prod_id = prod_id
-                    f.write(repr(rule) + '\n')
-        cursor.close()
-        cnx.close()
-    return FeatureGrammar(FeatStructNonterminal("S[status='Fin']"),  productions)
+def database_version(cnx):
+    cursor = cnx.cursor()
+    cursor.execute(DATABASE_VERSION_QUERY)
+    row = cursor.fetchone()
+    cursor.close()
+    return str(row[0]) if row else None
 
 def get_production_id_feature(production):
     lhs = production.lhs()
@@ -82,22 +305,25 @@ def get_production_id_feature(production):
             if nt.get(TYPE) == 'hd':
                 return nt.get(PRODUCTION_ID_FEATURE)
 
-def productions_extractor(cnx, cursor, fstruct_reader):
+def productions_extractor(cnx, cursor, fstruct_reader, frame_segments=None, unification_features=None):
+    """
+    :param cursor: rows of ``WORDFORMS_QUERY``
+    :param frame_segments: result of ``query_frame_segments`` for the lexFrameKeys of the rows,
+        queried if not given
+    :param unification_features: result of ``query_unification_features`` for the positions of the
+        frame segments, queried if not given
+    """
     productions = set()
-
-    frameCursor = cnx.cursor(buffered=True)
-    unificationCursor = cnx.cursor(buffered=True)
-
-    frameQuery = ('select w.position, pos1,pos2,pos3,feature, w.facultative from WordCategorySegment w' +
-                  ' inner join Segment s on s.position = w.position' +
-                  ' left join PartOfSpeech p on p.pos = s.pos3' +
-                  ' where w.lexFrameKey = %s  ' + # and pos2 !="mod"
-                  ' order by w.facultative, w.position;')
-
-    unificationQuery = ('select cond, feature from UnificationFeatures u where u.position = %s;')
-
-    for (pos, formFeature, categoryFeature, lemma, lexFrameKey, word) in cursor:
-        word = word.decode('utf8')
+    rows = list(cursor)
+    if frame_segments is None:
+        frame_segments = query_frame_segments(cnx, unique_list(row[4] for row in rows))
+    if unification_features is None:
+        unification_features = query_unification_features(
+            cnx, unique_list(segment[0] for segments in frame_segments.values() for segment in segments))
+
+    for (pos, formFeature, categoryFeature, lemma, lexFrameKey, word) in rows:
+        if not isinstance(word, str):
+            word = word.decode('utf8')
         nt = formNT = catNT = None
         if formFeature:
             formNT = fstruct_reader.fromstring(formFeature)
@@ -133,7 +359,6 @@ def productions_extractor(cnx, cursor, fstruct_reader):
             nt = fstruct_reader.fromstring(pos)
 
         # nt = minimize_nonterm(nt)
-        frameCursor.execute(frameQuery, (lexFrameKey,))
         gf = set()
         rhs = []
         # hd = (None, None)
@@ -149,7 +374,7 @@ def productions_extractor(cnx, cursor, fstruct_reader):
         #         if STATUS.Infin.name in status:
         #             personal = False
 
-        for (position, pos1, pos2, pos3, feature, facultative) in frameCursor:
+        for (position, pos1, pos2, pos3, feature, facultative) in frame_segments.get(lexFrameKey, ()):
             pos2NT = FeatStructNonterminal(pos2)
 
             pos2NT.add_feature({PRODUCTION_ID_FEATURE: lexFrameKey})
@@ -157,8 +382,7 @@ def productions_extractor(cnx, cursor, fstruct_reader):
             pos3NT = FeatStructNonterminal(pos3)
 
             # After this point inherited features will be added
-            unificationCursor.execute(unificationQuery, (position,))
-            for (cond, un_feature) in unificationCursor:
+            for (cond, un_feature) in unification_features.get(position, ()):
                 if cond:
                     condNT = fstruct_reader.fromstring('[' + cond + ']')
                     if not unify(nt, condNT):
@@ -217,8 +441,6 @@ def productions_extractor(cnx, cursor, fstruct_reader):
         productions.update(
             map(lambda production: production.process_inherited_features(), open_disjunction(Production(lhs, rhs))))
 
-    unificationCursor.close()
-    frameCursor.close()
     for production in productions:
         lhs = production.lhs().filter_feature(SLOT_FEATURE, "ref", "POS", "perf_aux",
                                    "personal",  "sepPrefix", "defdet", "inheritedFeature", "refperson",
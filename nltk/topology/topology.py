@@ -12,6 +12,7 @@ from nltk.grammar import FeatStructNonterminal, FeatureGrammar
 from nltk.parse.featurechart import FeatureTopDownChartParser, celex_preprocessing
 from nltk.topology.FeatTree import FeatTree, FT, PH, TAG, GF
 from nltk.topology.pgsql import build_rules
+from nltk.util import LRUCache
 
 __author__ = 'Denis Krusko: kruskod@gmail.com'
 
@@ -143,17 +144,24 @@ class GramFunc:
         self.ph = ph
         self.expression = expression
         self.tag = tag
+        # the accepted phrases as a tuple, which is tested by identity of the PH members
+        if not ph:
+            self._phs = None
+        elif isinstance(ph, Iterable):
+            self._phs = tuple(ph)
+        else:
+            self._phs = (ph,)
 
-    def fit(self, edge):
+    def fit(self, edge, field=None):
+        """
+        :param field: the field passed to the expression instead of ``self.field``
+        """
         assert isinstance(edge, FeatTree)
-        if self.gf == edge.gf:
+        if self.gf is edge.gf:
             if self.expression:
-                return self.expression(edge, self.field)
-            elif self.ph:
-                if isinstance(self.ph, Iterable):
-                    return edge.ph in self.ph
-                else:
-                    return edge.ph == self.ph
+                return self.expression(edge, field if field is not None else self.field)
+            elif self._phs:
+                return edge.ph in self._phs
             else:   # this idea reflects matching for "! category = none"
                 return True
         return False
@@ -164,7 +172,7 @@ class GramFunc:
 
 def build_topologies():
 
-    return (
+    return TopologyRules((
         # TOPOLOGY S[(status=Fin|status=Infin/Fin/PInfin),mood!=imperative] // Main order: SVO, OVS, VSO
         #  TAG main
         Topology(PH.S, tag=TAG.main, features={'status': ('Fin', 'Infin', 'PInfin'), 'mood':('indicative', 'subjunctive')}, parent_restriction=((None, None),))
@@ -568,84 +576,247 @@ def build_topologies():
         Topology(PH.CP, tag=TAG.cp)
             .add_field(Field(FT.CP1, grammatical_funcs=(
             GramFunc(GF.hd), ))),
-    )
+    ))
 
 
-def process_dominance(tree, topology_rules, parent_tree=None):
+# maximal number of (dominance structure, parent) pairs, whose topologies are kept by TopologyRules
+TOPOLOGY_CACHE_SIZE = 65536
+
+class FieldView(object):
     """
-    build all possible topologies in consistence to topology_rules for tree
+    A field of a topology rule seen together with the gorns, which are filled for one node so far.
+    The expressions of grammatical functions read the other fields through ``field.topology``.
+    """
+
+    def __init__(self, field, topology):
+        self._field = field
+        self.topology = topology
+
+    def __getattr__(self, name):
+        return getattr(self._field, name)
+
+
+class CompiledRule(object):
+    """
+    The tables of a topology rule used to fill its fields: the grammatical functions of every field
+    grouped by the grammatical function they accept, so that a child is tested only against the functions
+    of its own grammatical function, and the features of the rule as a nonterminal.
+    """
+
+    def __init__(self, rule):
+        self.features = FeatStructNonterminal(rule.features) if rule.features else None
+        # gf -> ((field, funcs), ...) for the fields without dependencies in the order of the rule
+        self.fields = dict()
+        # ((field, {gf: funcs}), ...) for the fields with dependencies, which are filled afterwards
+        dependent_fields = []
+        for field in rule.field_map.values():
+            gf_funcs = dict()
+            for func in field.grammatical_funcs:
+                gf_funcs.setdefault(func.gf, []).append(func)
+            if field.dependencies:
+                dependent_fields.append((field, {gf: tuple(funcs) for gf, funcs in gf_funcs.items()}))
+            else:
+                for gf, funcs in gf_funcs.items():
+                    self.fields.setdefault(gf, []).append((field, tuple(funcs)))
+        self.dependent_fields = tuple(dependent_fields)
+
+
+class TopologyRules(tuple):
+    """
+    The topology rules indexed by the phrase of a node and by the grammatical function and the phrase
+    of its parent, as well as by tag and field. The topologies of a dominance structure are memoized per equal subtree and parent,
+    so that the subtrees shared by many dominance structures are assigned only once.
+    A rule is copied only for a topology, which is completely filled.
     """
-    from nltk import Tree
 
-    node = tree.hclabel()
-    for temp_topol in topology_rules:
-        # chose a topology for the dominance structure item
-        if tree.ph == temp_topol.ph:
-            if temp_topol.parent_restriction:
+    def __new__(cls, rules=(), maxsize=TOPOLOGY_CACHE_SIZE):
+        return tuple.__new__(cls, rules)
+
+    def __init__(self, rules=(), maxsize=TOPOLOGY_CACHE_SIZE):
+        self._by_ph = dict()
+        self._by_tag = dict()
+        self._by_field = dict()
+        for rule in self:
+            self._by_ph.setdefault(rule.ph, []).append(rule)
+            self._by_tag.setdefault(rule.tag, []).append(rule)
+            for ft in rule:
+                self._by_field.setdefault(ft, []).append(rule)
+        self._compiled = {id(rule): CompiledRule(rule) for rule in self}
+        self._candidates = dict()
+        self._assignments = LRUCache(maxsize)
+
+    def by_ph(self, ph):
+        """
+        :return: the rules for the phrase ``ph`` in their order
+        """
+        return tuple(self._by_ph.get(ph, ()))
+
+    def by_tag(self, tag):
+        """
+        :return: the rules with the tag ``tag`` in their order
+        """
+        return tuple(self._by_tag.get(tag, ()))
 
-                if not parent_tree or not isinstance(parent_tree, FeatTree):
-                    parent_gf_ph = (None, None)
-                else :
-                    parent_gf_ph = (parent_tree.gf, parent_tree.ph)
-                if parent_gf_ph not in temp_topol.parent_restriction:
-                    continue
+    def by_field(self, ft):
+        """
+        :return: the rules having a field of the type ``ft`` in their order
+        """
+        return tuple(self._by_field.get(ft, ()))
 
+    def candidates(self, ph, parent_gf_ph):
+        """
+        :return: the rules for a node of the phrase ``ph``, which are allowed under the parent ``parent_gf_ph``
+        """
+        try:
+            return self._candidates[ph, parent_gf_ph]
+        except KeyError:
+            rules = tuple(rule for rule in self._by_ph.get(ph, ())
+                          if not rule.parent_restriction or parent_gf_ph in rule.parent_restriction)
+            self._candidates[ph, parent_gf_ph] = rules
+            return rules
+
+    def assign(self, tree, parent_tree=None, keys=None):
+        """
+        Fill the topologies of the descendants of the tree.
+
+        :return: the list of topologies for the tree
+        """
+        if not parent_tree or not isinstance(parent_tree, FeatTree):
+            parent_gf_ph = (None, None)
+        else:
+            parent_gf_ph = (parent_tree.gf, parent_tree.ph)
+        if keys is None:
+            keys = dict()
+        key = (dominance_key(tree, keys), parent_gf_ph)
+        assignment = self._assignments.get(key)
+        if assignment is None:
+            assignment = self._assign(tree, parent_gf_ph, keys)
+            self._assignments[key] = assignment
+        filled, processed = assignment
+        # repeat the assignment of the children for an equal subtree
+        for index in processed:
+            child = tree[index]
+            if not child.topologies:
+                child.topologies.extend(self.assign(child, tree, keys))
+
+        topologies = []
+        for rule, fields in filled:
+            topology = copy.deepcopy(rule)
+            for ft, indices in fields:
+                topology[ft] = tuple(tree[index].gorn for index in indices)
+            topologies.append(topology)
+        return topologies
+
+    def _assign(self, tree, parent_gf_ph, keys):
+        """
+        :return: the filled fields of the valid topologies as child indices and the indices of the children,
+            whose topologies are assigned
+        """
+        from nltk import Tree
+
+        filled = []
+        processed = set()
+        indices = {child.gorn: index for index, child in enumerate(tree) if isinstance(child, Tree)}
+        node = tree.hclabel()
+        for temp_topol in self.candidates(tree.ph, parent_gf_ph):
+            compiled = self._compiled[id(temp_topol)]
             # unify works correct only with structures of the same type
-            # create FeatStructNonterminal from topology features
-            if temp_topol.features and len(node) > 1:
-                top_fstruct = FeatStructNonterminal(temp_topol.features)
-                unif = featstruct.unify(node, top_fstruct)
+            if compiled.features is not None and len(node) > 1:
+                unif = featstruct.unify(node, compiled.features)
             else:
                 unif = True
             if unif:
-                topology = copy.deepcopy(temp_topol)
                 # fill topology fields
-                dependent_fields = dict()
-                child_usages = dict()
-                for child in tree:
-                    child_usages[child] = 0
+                topology = OrderedDict((ft, ()) for ft in temp_topol)
+                child_usages = [0] * len(tree)
+                for index, child in enumerate(tree):
                     if isinstance(child, Tree):
-                        for field in topology.field_map.values():
-                            if field.dependencies:
-                                dependent_fields[field.ft] = field
-                                continue
-                            for func in field.grammatical_funcs:
+                        for field, funcs in compiled.fields.get(child.gf, ()):
+                            for func in funcs:
                                 if func.fit(child):
-                                    child_usages[child] += 1
+                                    child_usages[index] += 1
                                     # add edge to topology
                                     topology[field.ft] += (child.gorn,)
                                     break
 
                 # fill fields, that should be processed afterwards because the have dependencies
-                while dependent_fields:
-                    for ft, field in list(dependent_fields.items()):
-                        if field.dependencies in dependent_fields:
-                            continue
-                        del dependent_fields[ft]
-                        for child in tree:
-                            if isinstance(child, Tree):
-                                for func in field.grammatical_funcs:
-                                    if func.fit(child):
-                                        child_usages[child] += 1
-                                        # add edge to topology
-                                        topology[ft] += (child.gorn,)
-                                        break
+                for field, gf_funcs in compiled.dependent_fields:
+                    field_view = FieldView(field, topology)
+                    for index, child in enumerate(tree):
+                        if isinstance(child, Tree):
+                            for func in gf_funcs.get(child.gf, ()):
+                                if func.fit(child, field_view):
+                                    child_usages[index] += 1
+                                    # add edge to topology
+                                    topology[field.ft] += (child.gorn,)
+                                    break
 
                 unused_fields = False
                 children_without_topologies = False
-                for child, usage_number in child_usages.items():
+                for index, usage_number in enumerate(child_usages):
+                    child = tree[index]
                     if not usage_number:
                         unused_fields = True
                         print("Warning! Node {} doesn't fit in any field of the topoology {}".format(
-                            child.short_str_with_features(), topology))
-                    elif not child.topologies and not child.ishead():
-                        child.topologies.extend(process_dominance(child, topology_rules, parent_tree=tree))
+                            child.short_str_with_features(), filled_str(temp_topol, topology)))
+                    elif not child.ishead():
+                        processed.add(index)
+                        if not child.topologies:
+                            child.topologies.extend(self.assign(child, tree, keys))
                     if not child.ishead() and not child.topologies:
                         children_without_topologies = True
                         print("Warning! Node {} doesn't have any topoology".format(child.short_str_with_features()))
 
                 if not unused_fields and not children_without_topologies:
-                    yield topology
+                    filled.append((temp_topol, tuple((ft, tuple(indices[gorn] for gorn in gorns))
+                                                     for ft, gorns in topology.items() if gorns)))
+        return tuple(filled), tuple(sorted(processed))
+
+    def hit_rate(self):
+        """
+        :return: share of the nodes, whose topologies are taken from an equal subtree
+        """
+        lookups = self._assignments.hits + self._assignments.misses
+        return float(self._assignments.hits) / lookups if lookups else 0.0
+
+    def clear(self):
+        self._assignments.clear()
+
+    def __reduce__(self):
+        return (self.__class__, (tuple(self), self._assignments.maxsize()))
+
+
+def filled_str(rule, topology):
+    """
+    :return: the string of the rule with the gorns of ``topology``, as a filled Topology prints itself
+    """
+    field_type = '{'
+    for ft, field_gorns in topology.items():
+        if field_gorns:
+            field_type += rule.field_map[ft].short_str() + str(field_gorns) + '|'
+    return rule.short_str() + field_type[:-1] + '}'
+
+
+def dominance_key(tree, keys):
+    """
+    :return: a hashable key, which is equal for equal subtrees independently of their position
+    """
+    try:
+        return keys[id(tree)]
+    except KeyError:
+        children = tuple(dominance_key(child, keys) if isinstance(child, FeatTree) else repr(child)
+                         for child in tree)
+        key = keys[id(tree)] = (tree.gf, tree.ph, repr(tree.label()), children)
+        return key
+
+
+def process_dominance(tree, topology_rules, parent_tree=None):
+    """
+    build all possible topologies in consistence to topology_rules for tree
+    """
+    if not isinstance(topology_rules, TopologyRules):
+        topology_rules = TopologyRules(topology_rules)
+    yield from topology_rules.assign(tree, parent_tree)
 
 
 def demo(print_times=True, print_grammar=False,
@@ -13,6 +13,7 @@ import textwrap
 import pydoc
 import bisect
 import os
+import collections
 
 from itertools import islice, chain, combinations
 from pprint import pprint
@@ -605,6 +606,84 @@ class OrderedDict(dict):
         # returns iterator under python 3
         return map(self.get, self._keys)
 
+##########################################################################
+# Least Recently Used Cache
+##########################################################################
+
+class LRUCache(object):
+    """
+    A bounded mapping that evicts the least recently used entry
+    once more than ``maxsize`` entries are stored.  Lookups are
+    counted, so that the size of the cache can be tuned.
+
+        >>> from nltk.util import LRUCache
+        >>> cache = LRUCache(2)
+        >>> cache['a'] = 1
+        >>> cache['b'] = 2
+        >>> cache.get('a')
+        1
+        >>> cache['c'] = 3
+        >>> 'b' in cache, 'a' in cache
+        (False, True)
+        >>> cache.get('b') is None
+        True
+        >>> cache.hits, cache.misses
+        (1, 1)
+
+    :param maxsize: the maximal number of entries, or None for an
+        unbounded cache.
+    """
+    def __init__(self, maxsize=1024):
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Return the value stored for ``key`` and mark it as recently
+        used, or return ``default`` if ``key`` is not cached.
+        """
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        if self._maxsize is not None and len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def maxsize(self):
+        return self._maxsize
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        """
+        Return the fraction of lookups that were answered by the cache.
+        """
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return '<LRUCache with %d/%s entries, %d hits, %d misses>' % (
+            len(self._entries), self._maxsize, self.hits, self.misses)
+
 ######################################################################
 # Lazy Sequences
 ######################################################################
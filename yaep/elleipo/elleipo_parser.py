@@ -10,7 +10,7 @@ from nltk.featstruct import CelexFeatStructReader
 from nltk.grammar import FeatStructNonterminal, Production, FeatureGrammar
 from nltk.parse.featurechart import celex_preprocessing
 from yaep.parse.earley import EarleyParser, Grammar, Rule, feat_struct_nonterminal_to_term,  FeatStructNonTerm
-from yaep.parse.parse_tree_generator import Node, LeafNode, EllipsisEarleyParser
+from yaep.parse.parse_tree_generator import Node, LeafNode, EllipsisEarleyParser, SiblingConjunct
 
 COORDINATIONS = ('und', 'oder')
 
@@ -295,6 +295,9 @@ def load_grammar(path, filename):
 
 
 def parse_conjunct(grammar, tokens,  sibling_conjunct_chart_manager=None):
+        """
+        :param sibling_conjunct_chart_manager: chart manager of the sibling conjunct or its ``SiblingConjunct``
+        """
         if sibling_conjunct_chart_manager:
             earley_parser = EllipsisEarleyParser(grammar)
             earley_parser.set_sibling_conjunct_chart_manager(sibling_conjunct_chart_manager)
@@ -338,16 +341,25 @@ def parse_ellipses(grammar, tokens):
         if group:
             token_groups.append(group)
 
+    # the finished states of every conjunct are indexed once and shared by all its sibling conjuncts
+    sibling_conjuncts = {}
+
+    def sibling_conjunct(index):
+        if index not in sibling_conjuncts:
+            sibling_conjuncts[index] = SiblingConjunct(parsing_results[index][0])
+        return sibling_conjuncts[index]
+
     parsing_results = []
     for group in token_groups:
-        chart_manager, dominance_structures = parse_conjunct(grammar, group, parsing_results[-1][0] if parsing_results else None)
+        chart_manager, dominance_structures = parse_conjunct(grammar, group, sibling_conjunct(len(parsing_results) - 1) if parsing_results else None)
         print(chart_manager)
         print(chart_manager.out())
         parsing_results.append((chart_manager, dominance_structures))
 
+    last_conjunct = len(parsing_results) - 1
     for index, (manager, dominance_structures) in enumerate(parsing_results):
-        if not dominance_structures and index < (len(parsing_results) - 1):
-            new_manager, new_dominanace_structures = parse_conjunct(grammar, token_groups[index], parsing_results[-1][0] if parsing_results else None)
+        if not dominance_structures and index < last_conjunct:
+            new_manager, new_dominanace_structures = parse_conjunct(grammar, token_groups[index], sibling_conjunct(last_conjunct))
             print(new_manager)
             print(new_manager.out())
             if new_dominanace_structures:
@@ -2,22 +2,28 @@
 import itertools
 import multiprocessing
 import pickle
-from collections import Counter
+from collections import Counter, deque
 
-import pathos as pathos
 from timeit import default_timer
 
 from nltk import Variable
 from nltk.compat import unicode_repr
 from nltk.draw.tree import TreeTabView
-from nltk.featstruct import CelexFeatStructReader, substitute_bindings, TYPE
+from nltk.featstruct import CelexFeatStructReader, substitute_bindings, TYPE, UnificationCache, FeatStruct
 from nltk.grammar import FeatStructNonterminal
 from nltk.topology.pgsql import build_rules
 from yaep.parse.earley import State, Grammar, Rule, EarleyParser, AbstractEarley, Chart, \
-    feat_struct_nonterminal_to_term, is_nonterminal, FeatStructNonTerm
+    is_nonterminal, FeatStructNonTerm, feature_grammar
 from yaep.parse.parse_tree_generator import PermutationParseTreeGenerator, ExtendedState, \
     ChartTraverseParseTreeGenerator, ParseTreeGenerator
 
+# number of token sequences sent to a ParseService worker at once
+CHUNKSIZE = 64
+# number of chunks of a ParseService call, which are queued per worker process
+WINDOW_PER_PROCESS = 2
+# number of stop flags of the ParseService calls, which are reused round robin
+STOP_FLAGS = 1024
+
 class BindingsRule(Rule):
 
     def __init__(self, lhs, rhs):
@@ -67,9 +73,37 @@ class BindingsRule(Rule):
     def __hash__(self):
         return hash((type(self), self._lhs, self._rhs, frozenset(self._bindings.values())))
 
+def frozen_value(value):
+    """
+    :return: the value or, if it contains feature structures, which are not frozen, a copy of it with frozen
+        feature structures; hashing them would freeze the caller's feature structures otherwise
+    """
+    if isinstance(value, FeatStruct):
+        if not value.frozen():
+            value = value.copy(deep=True)
+            value.freeze()
+    elif isinstance(value, (tuple, frozenset)):
+        value = type(value)(frozen_value(element) for element in value)
+    return value
+
 class BindingsGrammar(Grammar):
 
     def find_rule(self, non_terminal, bindings=None):
+        if not bindings:
+            return super().find_rule(non_terminal)
+        try:
+            key = (non_terminal.term(), frozenset((variable, frozen_value(value)) for variable, value in bindings.items()))
+            hash(key)
+        except TypeError:
+            # bindings with unhashable values can not be cached
+            return tuple(self.unify_rules(non_terminal, bindings))
+        predicted = self._predictions.get(key)
+        if predicted is None:
+            predicted = tuple(self.unify_rules(non_terminal, bindings))
+            self._predictions[key] = predicted
+        return predicted
+
+    def unify_rules(self, non_terminal, bindings=None):
         if bindings is None:
             _bindings = {}
         else:
@@ -87,10 +121,10 @@ class BindingsEarleyParser(AbstractEarley):
 
     def init(self, tokens):
         self._tokens = tokens
-        self._charts = tuple(Chart() for i in range(len(tokens) + 1))
+        self._charts = self.new_charts(len(tokens) + 1)
 
     def build_tree_generator(self):
-        return BindingsParseTreeGenerator()
+        return BindingsParseTreeGenerator(Counter(self._tokens))
 
     def predictor_non_terminal(self, lhs, token_index, bindings=None):
         for rule in self._grammar.find_rule(lhs, bindings):
@@ -110,27 +144,26 @@ class BindingsEarleyParser(AbstractEarley):
         origin_rule = origin_state.rule()
         lhs = origin_rule.lhs()
         current_chart = self._charts[token_index]
-        for temp_state in self._charts[origin_state.from_index()].states():
-            if (not temp_state.is_finished()) and is_nonterminal(temp_state.next_symbol()):
-                common_bindings = dict_intersection(temp_state.rule().bindings(), origin_rule.bindings())
-                if common_bindings is None:
-                    continue
-                result = lhs.unify(temp_state.next_symbol(), common_bindings)
-                if result:
-                    extracted_bindings = extract_bindings(temp_state.next_symbol().term(), result)
-                    rule_bindings = dict_intersection(temp_state.rule().bindings(), extracted_bindings)
-                    if rule_bindings is None:
-                        raise ValueError(rule_bindings)
+        for temp_state in self._charts[origin_state.from_index()].expecting(lhs.key()):
+            common_bindings = dict_intersection(temp_state.rule().bindings(), origin_rule.bindings())
+            if common_bindings is None:
+                continue
+            result = lhs.unify(temp_state.next_symbol(), common_bindings, self._unification_cache)
+            if result:
+                extracted_bindings = extract_bindings(temp_state.next_symbol().term(), result)
+                rule_bindings = dict_intersection(temp_state.rule().bindings(), extracted_bindings)
+                if rule_bindings is None:
+                    raise ValueError(rule_bindings)
 
-                    # extracted_bindings = merge_bindings(temp_state.rule().bindings(), extract_bindings(lhs.term(), result))
-                    current_chart.add_state(State(BindingsRule.from_Rule(temp_state.rule(),rule_bindings), temp_state.from_index(), temp_state.dot() + 1))
+                # extracted_bindings = merge_bindings(temp_state.rule().bindings(), extract_bindings(lhs.term(), result))
+                current_chart.add_state(State(BindingsRule.from_Rule(temp_state.rule(),rule_bindings), temp_state.from_index(), temp_state.dot() + 1))
 
 class BindingsPermutationEarleyParser(AbstractEarley):
 
     def init(self, tokens):
         self._tokens = tokens
         self._words_map = Counter(tokens)
-        self._charts = tuple(Chart() for i in range(len(tokens) + 1))
+        self._charts = self.new_charts(len(tokens) + 1)
 
     def build_tree_generator(self):
         return BindingsPermutationParseTreeGenerator(self._words_map)
@@ -154,20 +187,19 @@ class BindingsPermutationEarleyParser(AbstractEarley):
         origin_rule = origin_state.rule()
         lhs = origin_rule.lhs()
         current_chart = self._charts[token_index]
-        for temp_state in self._charts[origin_state.from_index()].states():
-            if (not temp_state.is_finished()) and is_nonterminal(temp_state.next_symbol()):
-                common_bindings = dict_intersection(temp_state.rule().bindings(), origin_rule.bindings())
-                if common_bindings is None:
-                    continue
-                result = lhs.unify(temp_state.next_symbol(), common_bindings)
-                if result:
-                    extracted_bindings = extract_bindings(temp_state.next_symbol().term(), result)
-                    rule_bindings = dict_intersection(temp_state.rule().bindings(), extracted_bindings)
-                    if rule_bindings is None:
-                        raise ValueError(rule_bindings)
+        for temp_state in self._charts[origin_state.from_index()].expecting(lhs.key()):
+            common_bindings = dict_intersection(temp_state.rule().bindings(), origin_rule.bindings())
+            if common_bindings is None:
+                continue
+            result = lhs.unify(temp_state.next_symbol(), common_bindings, self._unification_cache)
+            if result:
+                extracted_bindings = extract_bindings(temp_state.next_symbol().term(), result)
+                rule_bindings = dict_intersection(temp_state.rule().bindings(), extracted_bindings)
+                if rule_bindings is None:
+                    raise ValueError(rule_bindings)
 
-                    # extracted_bindings = merge_bindings(temp_state.rule().bindings(), extract_bindings(lhs.term(), result))
-                    current_chart.add_state(State(BindingsRule.from_Rule(temp_state.rule(),rule_bindings), temp_state.from_index(), temp_state.dot() + 1))
+                # extracted_bindings = merge_bindings(temp_state.rule().bindings(), extract_bindings(lhs.term(), result))
+                current_chart.add_state(State(BindingsRule.from_Rule(temp_state.rule(),rule_bindings), temp_state.from_index(), temp_state.dot() + 1))
 
     def words_map(self):
         return self._words_map
@@ -275,10 +307,11 @@ class BindingsPermutationTraverseParseTreeGenerator(ChartTraverseParseTreeGenera
             for state in chart.states():
                 if state.is_finished():
                     filtered_chart.add_state(ExtendedState(State(substitute_rule(state.rule()), state.from_index(), state.dot()), i))
+        self._forest = None
         j = len(chart_manager.tokens())
-        result = tuple(itertools.chain.from_iterable(
-            self.countDown(ExtendedState(State(substitute_rule(st.rule()), st.from_index(), st.dot()), j), set(), j) for st in chart_manager.final_states()))
-        return result
+        forest = self.forest()
+        return itertools.chain.from_iterable(
+            forest.trees(ExtendedState(State(substitute_rule(st.rule()), st.from_index(), st.dot()), j)) for st in chart_manager.final_states())
 
 
 class TreeGenerator(object):
@@ -299,15 +332,9 @@ def substitute_rule(rule):
     return Rule(lhs, rhs)
 
 
-def bindings_performance_grammar(tokens):
+def bindings_performance_grammar(tokens, lexicon=None, compiled_path=None):
     fstruct_reader = CelexFeatStructReader(fdict_class=FeatStructNonterminal)
-    grammar = build_rules(tokens, fstruct_reader)
-    productions = grammar.productions()
-    start_nonterminal = feat_struct_nonterminal_to_term(grammar.start())
-
-    return BindingsGrammar((Rule(feat_struct_nonterminal_to_term(production.lhs()),
-                  (feat_struct_nonterminal_to_term(fs) for fs in production.rhs())) for production in productions),
-            None, start_nonterminal)
+    return feature_grammar(build_rules(tokens, fstruct_reader, lexicon=lexicon), BindingsGrammar, compiled_path)
 
 
 def print_trees(tokens, grammar, permutations=False):
@@ -346,9 +373,12 @@ def print_trees(tokens, grammar, permutations=False):
 
 def parse_tokens(tokens, grammar, parser, verifier):
     chart_manager = parser.parse(tokens, grammar.start())
+    return dominance_structures_of(chart_manager, parser, verifier)
 
+
+def dominance_structures_of(chart_manager, parser, verifier):
     if next(chart_manager.final_states(), None):
-        print("Successful recognition: " + " ".join(tokens))
+        print("Successful recognition: " + " ".join(chart_manager.tokens()))
         # print()
         # print(chart_manager)
         # # print(chart_manager.pretty_print_filtered(" ".join(tokens)))
@@ -359,16 +389,131 @@ def parse_tokens(tokens, grammar, parser, verifier):
     return tuple()
 
 
-def permutation_parse_trees_builder(tokens, grammar, parser):
+def prefix_permutation_parse_trees_builder(tokens, grammar, parser):
+    """
+    Parse the distinct permutations of the tokens in one process, sharing the charts of common prefixes.
+    """
     verifier = Counter(tokens)
-    pool = pathos.multiprocessing.Pool(multiprocessing.cpu_count())
-    return itertools.chain(*pool.map(lambda t: parse_tokens(t, grammar, parser, verifier), itertools.permutations(tokens)))
+    for chart_manager in parser.parse_permutations(tokens, grammar.start()):
+        yield from dominance_structures_of(chart_manager, parser, verifier)
+
+
+# grammar and parser of a ParseService worker process, set once by init_parse_worker
+_worker_grammar = None
+_worker_parser = None
+_worker_stopped = None
 
 
-def print_trees_parallel(tokens, grammar, permutations=False):
+def init_parse_worker(grammar, parser_class, stopped, unification_cache_size=None):
+    global _worker_grammar, _worker_parser, _worker_stopped
+    _worker_grammar = grammar
+    unification_cache = UnificationCache(unification_cache_size, treatBool=False) if unification_cache_size else None
+    _worker_parser = parser_class(grammar, unification_cache=unification_cache)
+    _worker_stopped = stopped
+
+
+def parse_permutations_chunk(flag, token_sequences):
+    """
+    Parse a chunk of token sequences, unless the call the chunk belongs to was stopped.
+    :param flag: index of the stop flag of the call
+    """
+    dominance_structures = []
+    for tokens in token_sequences:
+        if _worker_stopped[flag]:
+            break
+        dominance_structures.extend(parse_tokens(tokens, _worker_grammar, _worker_parser, Counter(tokens)))
+    return dominance_structures
+
+
+class ParseService(object):
+    """
+    Pool of worker processes, which are initialised once with a grammar and parse token sequences with it.
+
+    The service can be reused for several sentences and should be closed after use, e.g.:
+
+        with ParseService(grammar) as service:
+            dominance_structures = tuple(service.parse_permutations(tokens))
+    """
+
+    def __init__(self, grammar, parser_class=None, processes=None, chunksize=CHUNKSIZE, unification_cache_size=None):
+        """
+        :param unification_cache_size: size of the ``UnificationCache`` of each worker, which is kept across
+            sentences; None disables the cache
+        """
+        if parser_class is None:
+            parser_class = BindingsEarleyParser
+        # forked workers inherit the grammar instead of unpickling it
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() \
+            else multiprocessing.get_context()
+        processes = processes or multiprocessing.cpu_count()
+        # one stop flag per call, so stopping a call does not skip the sequences of concurrent calls
+        self._stopped = context.RawArray('b', STOP_FLAGS)
+        self._calls = itertools.count()
+        self._chunksize = chunksize
+        self._window = processes * WINDOW_PER_PROCESS
+        self._pool = context.Pool(processes, initializer=init_parse_worker,
+                                  initargs=(grammar, parser_class, self._stopped, unification_cache_size))
+
+    def parse(self, token_sequences, budget=None):
+        """
+        Parse the token sequences in the worker processes. Only a bounded window of chunks is queued at a
+        time, so nothing more is submitted once the budget is reached.
+        :param token_sequences: iterable of token sequences, which is sent to the workers in chunks
+        :param budget: stop after this number of dominance structures was found
+        :return: iterator over the dominance structures in the order of the token sequences
+        """
+        flag = next(self._calls) % STOP_FLAGS
+        self._stopped[flag] = 0
+        token_sequences = iter(token_sequences)
+        pending = deque()
+
+        def submit():
+            chunk = list(itertools.islice(token_sequences, self._chunksize))
+            if chunk:
+                pending.append(self._pool.apply_async(parse_permutations_chunk, (flag, chunk)))
+
+        for i in range(self._window):
+            submit()
+        found = 0
+        try:
+            while pending:
+                dominance_structures = pending.popleft().get()
+                submit()
+                for tree in dominance_structures:
+                    yield tree
+                    found += 1
+                    if budget is not None and found >= budget:
+                        return
+        finally:
+            # the queued chunks of this call skip their sequences
+            self._stopped[flag] = 1
+
+    def parse_permutations(self, tokens, budget=None):
+        return self.parse(itertools.permutations(tokens), budget)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def permutation_parse_trees_builder(tokens, grammar, parser, budget=None):
+    with ParseService(grammar, type(parser)) as service:
+        return tuple(service.parse_permutations(tokens, budget))
+
+
+def print_trees_parallel(tokens, grammar, permutations=False, shared_prefixes=False):
     parser = BindingsEarleyParser(grammar) if permutations else EarleyParser(grammar)
     start_time = default_timer()
-    dominance_structures = tuple(permutation_parse_trees_builder(tokens, grammar, parser))
+    if shared_prefixes:
+        dominance_structures = tuple(prefix_permutation_parse_trees_builder(tokens, grammar, parser))
+    else:
+        dominance_structures = tuple(permutation_parse_trees_builder(tokens, grammar, parser))
     end_time = default_timer()
     number_trees = 0
     tree_output = ''
@@ -1,4 +1,9 @@
+import hashlib
+import json
+import os
+import pickle
 import sys
+from array import array
 from collections import Counter
 from timeit import default_timer as timer
 
@@ -10,6 +15,12 @@ from nltk.grammar import FeatStructNonterminal, Nonterminal
 from nltk.topology.compassFeat import PRODUCTION_ID_FEATURE, BRANCH_FEATURE
 from nltk.topology.orderedSet import OrderedSet
 from nltk.topology.pgsql import build_rules
+from nltk.util import LRUCache
+
+# maximal number of nonterminals whose predicted rules are kept by a Grammar
+PREDICTION_CACHE_SIZE = 4096
+# format of the files written by save_grammar, increase it when Grammar, Rule or Term change their attributes
+COMPILED_GRAMMAR_VERSION = 2
 
 class Term:
 
@@ -61,7 +72,7 @@ class Term:
 
 class NonTerm(Term):
 
-    def unify(self, other):
+    def unify(self, other, bindings=None, cache=None):
         return self == other
 
     def key(self):
@@ -69,11 +80,19 @@ class NonTerm(Term):
 
 class FeatStructNonTerm(Term):
 
-    def unify(self, other, bindings=None):
+    def unify(self, other, bindings=None, cache=None):
+        """
+        :param cache: optional ``UnificationCache`` created with ``treatBool=False``
+        """
         # return featstruct.unify(self._term, other._term, bindings=bindings, treatBool=False)
         prodId = other._term.get_feature(PRODUCTION_ID_FEATURE)
-        return ((not prodId or (prodId == self._term.get_feature(PRODUCTION_ID_FEATURE)))
-                and featstruct.unify(self._term, other._term, bindings=bindings, treatBool=False))
+        if prodId and prodId != self._term.get_feature(PRODUCTION_ID_FEATURE):
+            return False
+        if not self._term.compatible(other._term):
+            return False
+        if cache is not None:
+            return cache.unify(self._term, other._term, bindings)
+        return featstruct.unify(self._term, other._term, bindings=bindings, treatBool=False)
 
     def test_unify(self, other, bindings=None):
         return test_unify(self._term, other._term)
@@ -182,6 +201,16 @@ class Rule:
     def __hash__(self):
         return self._hash
 
+    def __getstate__(self):
+        # string hashes differ between processes, so the hash is recalculated on unpickling
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._hash = hash((type(self), self._lhs, self._rhs))
+
 
 class State:
 
@@ -235,13 +264,40 @@ class Chart:
 
     def __init__(self):
         self._states = OrderedSet()
+        # unfinished states indexed by the key (TYPE) of their next nonterminal
+        self._expecting = {}
+        # number of states, which were added again
+        self.duplicates = 0
 
     def add_state(self, state):
-        # if state not in self._states:
-        self._states.add(state)
+        if state not in self._states:
+            self._states.add(state)
+            if not state.is_finished():
+                next_symbol = state.next_symbol()
+                if is_nonterminal(next_symbol):
+                    self._expecting.setdefault(next_symbol.key(), []).append(state)
+        else:
+            self.duplicates += 1
 
     def remove_state_if_present(self, state):
-        self.states().discard(state)
+        if state in self._states:
+            self._states.discard(state)
+            if not state.is_finished():
+                next_symbol = state.next_symbol()
+                if is_nonterminal(next_symbol):
+                    self._expecting[next_symbol.key()].remove(state)
+
+    def expecting(self, key):
+        """
+        Iterate over the unfinished states whose next symbol is a nonterminal with the given key.
+        States without a key can be unified with any nonterminal, so they are returned as well.
+        States added to the chart during the iteration are also visited.
+        """
+        for states in (self._expecting.get(key, ()), () if key is None else self._expecting.get(None, ())):
+            index = 0
+            while index < len(states):
+                yield states[index]
+                index += 1
 
     def get_state(self, i):
         return self._states[i]
@@ -268,12 +324,274 @@ class Chart:
         return out
 
 
+class RuleTable:
+    """
+    Interns rules to integer ids, so that states can refer to their rules by a number.
+    """
+
+    def __init__(self):
+        self._rules = []
+        self._ids = {}
+
+    def intern(self, rule):
+        rule_id = self._ids.get(rule)
+        if rule_id is None:
+            rule_id = len(self._rules)
+            self._ids[rule] = rule_id
+            self._rules.append(rule)
+        return rule_id
+
+    def lookup(self, rule):
+        """
+        :return: the id of the rule without interning it, None if the rule is unknown
+        """
+        return self._ids.get(rule)
+
+    def rule(self, rule_id):
+        return self._rules[rule_id]
+
+    def __len__(self):
+        return len(self._rules)
+
+
+class CompactChart(Chart):
+    """
+    Memory efficient chart. A state is stored as a (rule id, origin, dot) triple in three flat
+    integer columns and deduplicated by an open-addressing hash table over the row numbers.
+    ``State`` objects are only created on access, so the chart can hold plain ``State`` instances only.
+    """
+
+    EMPTY = -1
+    REMOVED = -2
+
+    def __init__(self, rule_table):
+        self._rule_table = rule_table
+        self._rule_ids = array('i')
+        self._origins = array('i')
+        self._dots = array('i')
+        # slots hold row numbers of the states, the size is always a power of two
+        self._slots = array('i', (self.EMPTY,)) * 8
+        self._removed = 0
+        self._expecting = {}
+        self.duplicates = 0
+
+    def _find_slot(self, rule_id, origin, dot):
+        """
+        :return: the slot of the state if present, otherwise the first free slot of its probe sequence
+        """
+        mask = len(self._slots) - 1
+        slot = hash((rule_id, origin, dot)) & mask
+        free_slot = None
+        while True:
+            row = self._slots[slot]
+            if row == self.EMPTY:
+                return slot if free_slot is None else free_slot
+            elif row == self.REMOVED:
+                if free_slot is None:
+                    free_slot = slot
+            elif self._rule_ids[row] == rule_id and self._origins[row] == origin and self._dots[row] == dot:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _resize(self):
+        self._slots = array('i', (self.EMPTY,)) * (len(self._slots) * 2)
+        mask = len(self._slots) - 1
+        for row, rule_id in enumerate(self._rule_ids):
+            if rule_id != self.REMOVED:
+                slot = hash((rule_id, self._origins[row], self._dots[row])) & mask
+                while self._slots[slot] != self.EMPTY:
+                    slot = (slot + 1) & mask
+                self._slots[slot] = row
+
+    def _state(self, row):
+        return State(self._rule_table.rule(self._rule_ids[row]), self._origins[row], self._dots[row])
+
+    def add_state(self, state):
+        if type(state) is not State:
+            raise TypeError("CompactChart can not store {}".format(type(state).__name__))
+        rule_id = self._rule_table.intern(state.rule())
+        origin = state.from_index()
+        dot = state.dot()
+        slot = self._find_slot(rule_id, origin, dot)
+        if self._slots[slot] < 0:
+            row = len(self._rule_ids)
+            self._rule_ids.append(rule_id)
+            self._origins.append(origin)
+            self._dots.append(dot)
+            self._slots[slot] = row
+            if not state.is_finished():
+                next_symbol = state.next_symbol()
+                if is_nonterminal(next_symbol):
+                    self._expecting.setdefault(next_symbol.key(), array('i')).append(row)
+            if len(self._rule_ids) * 2 > len(self._slots):
+                self._resize()
+        else:
+            self.duplicates += 1
+
+    def remove_state_if_present(self, state):
+        if type(state) is not State:
+            return
+        rule_id = self._rule_table.lookup(state.rule())
+        if rule_id is None:
+            return
+        slot = self._find_slot(rule_id, state.from_index(), state.dot())
+        row = self._slots[slot]
+        if row >= 0:
+            self._slots[slot] = self.REMOVED
+            self._rule_ids[row] = self.REMOVED
+            self._removed += 1
+            if not state.is_finished():
+                next_symbol = state.next_symbol()
+                if is_nonterminal(next_symbol):
+                    self._expecting[next_symbol.key()].remove(row)
+
+    def expecting(self, key):
+        for rows in (self._expecting.get(key, ()), () if key is None else self._expecting.get(None, ())):
+            index = 0
+            while index < len(rows):
+                yield self._state(rows[index])
+                index += 1
+
+    def get_state(self, i):
+        """
+        :return: the i-th state of the chart; once a state was removed, this walks the chart in O(n)
+        """
+        if not self._removed:
+            return self._state(i)
+        for index, state in enumerate(self.states()):
+            if index == i:
+                return state
+
+    def states(self):
+        row = 0
+        while row < len(self._rule_ids):
+            if self._rule_ids[row] != self.REMOVED:
+                yield self._state(row)
+            row += 1
+
+    def finished_states(self):
+        return (state for state in self.states() if state.is_finished())
+
+    def __contains__(self, state):
+        if type(state) is not State:
+            return False
+        rule_id = self._rule_table.lookup(state.rule())
+        if rule_id is None:
+            return False
+        return self._slots[self._find_slot(rule_id, state.from_index(), state.dot())] >= 0
+
+    def __len__(self):
+        return len(self._rule_ids) - self._removed
+
+    def str(self, j, filtered=False):
+        out = ""
+        for state in self.states():
+            if filtered:
+                if not state.is_finished():
+                    continue
+            out += state.str(j) + '\n'
+        return out
+
+
+class ParseStats(object):
+    """
+    Counters of a parse. The states and duplicate states per chart are always counted by the charts.
+    The calls and the time of the phases and the unifications are counted by a parser created with
+    ``stats=True`` or a ``trace_sink``; unifications rejected by ``FeatStructNonterminal.compatible``
+    or the production id are not counted.
+    """
+
+    PHASES = ('predictor', 'scanner', 'completer')
+
+    def __init__(self, charts=()):
+        self._charts = charts
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.unifications = 0
+        self.unification_failures = 0
+
+    def for_charts(self, charts):
+        """
+        :return: copy of the counters for the charts of one chart manager
+        """
+        stats = ParseStats(charts)
+        stats.calls = dict(self.calls)
+        stats.times = dict(self.times)
+        stats.unifications = self.unifications
+        stats.unification_failures = self.unification_failures
+        return stats
+
+    def states(self):
+        """
+        :return: list of the number of states per chart
+        """
+        return [len(chart) for chart in self._charts]
+
+    def duplicates(self):
+        """
+        :return: list of the number of states per chart, which were added again
+        """
+        return [chart.duplicates for chart in self._charts]
+
+    def categories(self, chart=None):
+        """
+        :return: Counter of the states by the category (key) of their lhs in one or all charts
+        """
+        charts = self._charts if chart is None else (self._charts[chart],)
+        return Counter(state.rule().lhs().key() for chart in charts for state in chart.states())
+
+    def as_dict(self):
+        return {'states': self.states(), 'duplicates': self.duplicates(), 'calls': dict(self.calls),
+                'times': dict(self.times), 'unifications': self.unifications,
+                'unification_failures': self.unification_failures}
+
+    def __str__(self):
+        return "states: {} duplicates: {} calls: {} times: {} unifications: {} failed: {}".format(
+            sum(self.states()), sum(self.duplicates()),
+            ", ".join("{} {}".format(phase, self.calls[phase]) for phase in self.PHASES),
+            ", ".join("{} {:.3f}s".format(phase, self.times[phase]) for phase in self.PHASES),
+            self.unifications, self.unification_failures)
+
+
+class CountingUnifier(object):
+    """
+    Stand-in for the ``UnificationCache`` of a profiled parser, which counts the unifications
+    in the current ``ParseStats`` of the parser.
+    """
+
+    def __init__(self, parser, cache=None):
+        self._parser = parser
+        self._cache = cache
+
+    def unify(self, fstruct1, fstruct2, bindings=None):
+        if self._cache is not None:
+            result = self._cache.unify(fstruct1, fstruct2, bindings)
+        else:
+            result = featstruct.unify(fstruct1, fstruct2, bindings=bindings, treatBool=False)
+        stats = self._parser._stats
+        stats.unifications += 1
+        if result is None:
+            stats.unification_failures += 1
+        return result
+
+
 class ChartManager:
 
-    def __init__(self, charts, start_symbol, tokens):
+    def __init__(self, charts, start_symbol, tokens, stats=None):
+        """
+        :param stats: ``ParseStats`` collected by the parser
+        """
         self._charts = tuple(charts)
         self._start_symbol = start_symbol
         self._tokens = tokens
+        self._stats = stats
+
+    def stats(self):
+        """
+        :return: ``ParseStats`` of the parse up to now, with the counters of the charts only if the parser
+            did not collect them
+        """
+        return (self._stats or ParseStats()).for_charts(self._charts)
 
     def initial_states(self):
         if self._charts and self._start_symbol:
@@ -331,8 +649,12 @@ class ChartManager:
 
 class Grammar:
 
-    def __init__(self, rules, terminals, start = None):
+    def __init__(self, rules, terminals, start = None, prediction_cache_size=PREDICTION_CACHE_SIZE):
         self._start = start
+        # rules predicted for a nonterminal, keyed by its frozen feature structure
+        self._predictions = LRUCache(prediction_cache_size)
+        # predictions of compile(), which are never evicted
+        self._compiled = {}
         rules_dict = {}
         for rule in rules:
             lhs = rule.lhs()
@@ -346,19 +668,99 @@ class Grammar:
         self._terminals = terminals
 
     def find_rule(self, non_terminal):
+        key = non_terminal.term()
+        predicted = self._compiled.get(key)
+        if predicted is None:
+            predicted = self._predictions.get(key)
+            if predicted is None:
+                predicted = tuple(self.unify_rules(non_terminal))
+                self._predictions[key] = predicted
+        return predicted
+
+    def unify_rules(self, non_terminal):
         rules = self._rules.get(non_terminal.key())
         if rules:
             for rule in rules:
                 if non_terminal.unify(rule.lhs()):
                     yield rule
 
+    def compile(self):
+        """
+        Precompute the rules for every nonterminal the predictor can be asked for,
+        i.e. the start symbol and all nonterminals on the right-hand sides of the rules.
+        The compiled predictions are kept apart from the bounded prediction cache, so a large
+        grammar does not evict them.
+        :return: number of the compiled predictions
+        """
+        non_terminals = set(symbol for rules in self._rules.values() for rule in rules
+                            for symbol in rule.rhs() if is_nonterminal(symbol))
+        if self._start:
+            non_terminals.add(self._start)
+        for non_terminal in non_terminals:
+            self._compiled[non_terminal.term()] = tuple(self.unify_rules(non_terminal))
+        return len(non_terminals)
+
+    def prediction_cache(self):
+        return self._predictions
+
     def start(self):
         return self._start
 
 class AbstractEarley:
 
-    def __init__(self, grammar):
+    def __init__(self, grammar, compact=False, unification_cache=None, stats=False, trace_sink=None):
+        """
+        :param compact: store the states in ``CompactChart``s, which trades speed for memory on long inputs
+        :param unification_cache: ``UnificationCache`` used by the completer, it can be shared by parsers
+            of the same grammar to reuse unifications across sentences
+        :param stats: count the calls and the time of the phases and the unifications in the ``ParseStats``
+            of the chart managers
+        :param trace_sink: file-like object, which receives the counters of every chart and of every parse
+            as JSON lines; it implies ``stats``
+        """
         self._grammar = grammar
+        self._rule_table = RuleTable() if compact else None
+        self._unification_cache = unification_cache
+        self._trace_sink = trace_sink
+        self._stats = None
+        if stats or trace_sink is not None:
+            self._stats = ParseStats()
+            # the profiled phases shadow the methods of the instance, so an unprofiled parser pays nothing
+            for phase in ParseStats.PHASES:
+                setattr(self, phase, self._profiled(phase, getattr(self, phase)))
+            self._unification_cache = CountingUnifier(self, unification_cache)
+
+    def _profiled(self, phase, method):
+        def profiled_phase(state, token_index):
+            start = timer()
+            method(state, token_index)
+            stats = self._stats
+            stats.times[phase] += timer() - start
+            stats.calls[phase] += 1
+        return profiled_phase
+
+    def _new_stats(self):
+        if self._stats is not None:
+            self._stats = ParseStats()
+        return self._stats
+
+    def _trace(self, record):
+        self._trace_sink.write(json.dumps(record, default=str) + '\n')
+
+    def _trace_chart(self, token_index, chart):
+        self._trace({'chart': token_index, 'token': self._tokens[token_index - 1] if token_index else None,
+                     'states': len(chart), 'duplicates': chart.duplicates,
+                     'categories': Counter(str(state.rule().lhs().key()) for state in chart.states())})
+
+    def _trace_parse(self, chart_manager):
+        record = {'tokens': list(chart_manager.tokens()), 'recognized': chart_manager.is_recognized()}
+        record.update(chart_manager.stats().as_dict())
+        self._trace(record)
+
+    def new_charts(self, number):
+        if self._rule_table is not None:
+            return tuple(CompactChart(self._rule_table) for i in range(number))
+        return tuple(Chart() for i in range(number))
 
     def parse(self, input):
         if not input:
@@ -370,6 +772,7 @@ class AbstractEarley:
             raise ValueError("Empty argument tokens:{} start:{}".format(tokens,start_symbol))
 
         self.init(tokens)
+        stats = self._new_stats()
         self.predictor_non_terminal(start_symbol, 0)
 
         for i, current_chart in enumerate(self._charts, 0):
@@ -381,6 +784,8 @@ class AbstractEarley:
                 # do not call scanner for the last chart
                 elif i < len(tokens):
                     self.scanner(state, i)
+            if self._trace_sink is not None:
+                self._trace_chart(i, current_chart)
             # j = 0
             # while j < len(current_chart):
             #     state = current_chart.get_state(j)
@@ -392,7 +797,62 @@ class AbstractEarley:
             #     elif i < len(tokens):
             #         self.scanner(state, i)
             #     j += 1
-        return ChartManager(self._charts, start_symbol, tokens)
+        chart_manager = ChartManager(self._charts, start_symbol, tokens, stats)
+        if self._trace_sink is not None:
+            self._trace_parse(chart_manager)
+        return chart_manager
+
+    def parse_permutations(self, tokens, start_symbol=None):
+        """
+        Parse every distinct permutation of the tokens by walking the permutations as a prefix trie.
+        The charts of a prefix are computed once and shared by all permutations starting with it,
+        repeated tokens are expanded only once per position, and a prefix which can not be scanned is dropped.
+        The scanner must match ``self._tokens``, as ``EarleyParser`` does.
+        The chart managers share one ``ParseStats``, which counts the whole walk.
+        :return: iterator over the ``ChartManager`` of each permutation that was not dropped
+        """
+        if not tokens or not start_symbol:
+            raise ValueError("Empty argument tokens:{} start:{}".format(tokens, start_symbol))
+
+        self.init(tokens)
+        self._new_stats()
+        self._charts = [self.new_charts(1)[0]]
+        self.predictor_non_terminal(start_symbol, 0)
+        yield from self.parse_prefix([], Counter(tokens), start_symbol)
+
+    def parse_prefix(self, prefix, remaining, start_symbol):
+        token_index = len(prefix)
+        charts = self._charts
+        scanned_states = []
+        for state in charts[token_index].states():
+            if state.is_finished():
+                self.completer(state, token_index)
+            elif state.is_next_symbol_nonterminal():
+                self.predictor(state, token_index)
+            else:
+                scanned_states.append(state)
+        if self._trace_sink is not None:
+            self._trace_chart(token_index, charts[token_index])
+
+        if not remaining:
+            chart_manager = ChartManager(charts, start_symbol, tuple(prefix), self._stats)
+            if self._trace_sink is not None:
+                self._trace_parse(chart_manager)
+            yield chart_manager
+            return
+
+        for token in tuple(remaining):
+            # fork the charts: the charts of the prefix are finished and shared by the new branch
+            self._charts = charts + [self.new_charts(1)[0]]
+            self._tokens = prefix + [token]
+            for state in scanned_states:
+                self.scanner(state, token_index)
+            if len(self._charts[-1]):
+                rest = remaining.copy()
+                rest[token] -= 1
+                if not rest[token]:
+                    del rest[token]
+                yield from self.parse_prefix(self._tokens, rest, start_symbol)
 
     def init(self, tokens):
         raise NotImplementedError
@@ -412,8 +872,8 @@ class AbstractEarley:
         current_chart = self._charts[token_index]
         # if isinstance(origin_state, EllipsisState):
             # print(state)
-        for temp_state in self._charts[origin_state.from_index()].states():
-            if (not temp_state.is_finished()) and is_nonterminal(temp_state.next_symbol()) and lhs.unify(temp_state.next_symbol()):
+        for temp_state in self._charts[origin_state.from_index()].expecting(lhs.key()):
+            if lhs.unify(temp_state.next_symbol(), cache=self._unification_cache):
                 current_chart.add_state(State(temp_state.rule(), temp_state.from_index(), temp_state.dot() + 1))
 
     def scanner (self, state, token_index):
@@ -424,7 +884,7 @@ class EarleyParser(AbstractEarley):
 
     def init(self, tokens):
         self._tokens = tokens
-        self._charts = tuple(Chart() for i in range(len(tokens) + 1))
+        self._charts = self.new_charts(len(tokens) + 1)
 
     def build_tree_generator(self, chart_manager):
         # return ParseTreeGenerator()
@@ -440,7 +900,7 @@ class PermutationEarleyParser(AbstractEarley):
     def init(self, tokens):
         self._tokens = tokens
         self._words_map = Counter(tokens)
-        self._charts = tuple(Chart() for i in range(len(tokens) + 1))
+        self._charts = self.new_charts(len(tokens) + 1)
 
     def build_tree_generator(self, chart_manager):
         from yaep.parse.parse_tree_generator import PermutationParseTreeGenerator
@@ -493,15 +953,69 @@ def grammar_from_file(grammar_file_path) :
                                        (nonterminal_to_term(fs) for fs in production.rhs())) for production
                                   in grammar.productions()), None, start_nonterminal)
 
-def performance_grammar(tokens):
-    fstruct_reader = CelexFeatStructReader(fdict_class=FeatStructNonterminal)
-    grammar = build_rules(tokens, fstruct_reader)
+def feature_grammar(grammar, grammar_class=Grammar, compiled_path=None):
+    """
+    Convert a ``FeatureGrammar`` into a grammar of the Earley parser.
+
+    :param grammar_class: ``Grammar`` or one of its subclasses
+    :param compiled_path: file of the compiled grammar. It is loaded if it was compiled from the same productions,
+        otherwise the grammar is converted, compiled and saved there.
+    """
     productions = grammar.productions()
-    start_nonterminal = feat_struct_nonterminal_to_term(grammar.start())
+    if compiled_path:
+        digest = productions_digest(productions)
+        compiled = load_grammar(compiled_path, digest)
+        if type(compiled) is grammar_class:
+            return compiled
 
-    return Grammar((Rule(feat_struct_nonterminal_to_term(production.lhs()),
+    start_nonterminal = feat_struct_nonterminal_to_term(grammar.start())
+    earley_grammar = grammar_class((Rule(feat_struct_nonterminal_to_term(production.lhs()),
                   (feat_struct_nonterminal_to_term(fs) for fs in production.rhs())) for production in productions),
             None, start_nonterminal)
+    if compiled_path:
+        save_grammar(earley_grammar, compiled_path, digest)
+    return earley_grammar
+
+def productions_digest(productions):
+    """
+    :return: hex digest of the productions, independent of their order
+    """
+    digest = hashlib.sha1()
+    for production in sorted(unicode_repr(production) for production in productions):
+        digest.update(production.encode('utf8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def save_grammar(grammar, path, digest):
+    """
+    Compile the grammar and pickle it together with its rule index, nullable flags and predictions.
+    The file is replaced atomically, so concurrent readers never see a partial grammar.
+
+    :param digest: ``productions_digest`` of the productions the grammar was built from
+    """
+    grammar.compile()
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        pickle.dump((COMPILED_GRAMMAR_VERSION, digest), f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(grammar, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def load_grammar(path, digest):
+    """
+    :return: the grammar saved in ``path`` or None, if the file is missing, has an older format,
+        was compiled from other productions or refers to classes that changed since it was saved
+    """
+    try:
+        with open(path, 'rb') as f:
+            if pickle.load(f) != (COMPILED_GRAMMAR_VERSION, digest):
+                return None
+            return pickle.load(f)
+    except (IOError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+        return None
+
+def performance_grammar(tokens, lexicon=None, compiled_path=None):
+    fstruct_reader = CelexFeatStructReader(fdict_class=FeatStructNonterminal)
+    return feature_grammar(build_rules(tokens, fstruct_reader, lexicon=lexicon), Grammar, compiled_path)
 
 if __name__ == "__main__":
     # docTEST this
@@ -92,7 +92,7 @@ class Node(LeafNode):
         if isinstance(node, Node):
             self._wordsmap.update(node._wordsmap)
         else:
-            self._wordsmap[node._symbol] = 1
+            self._wordsmap[node._symbol] += 1
         self._children.append(node)
 
     def children(self):
@@ -196,19 +196,74 @@ class EllipsisState(ExtendedState):
     # def __hash__(self):
     #     return hash((type(self), self._i, self._j, self._dot, self._rule, self._requested_state))
 
-class EllipsisEarleyParser(EarleyParser):
+class SiblingConjunct(object):
+    """
+    The finished states of a parsed conjunct without its own ellipses, indexed by category.
+    They are the antecedents of the ellipses of a sibling conjunct. A SiblingConjunct is built once per
+    chart manager and can be shared by the parsers of all sibling conjuncts.
+    """
 
-    def build_tree_generator(self, chart_manager):
-        return EllipsisParseTreeGenerator(chart_manager)
-
-    def set_sibling_conjunct_chart_manager(self, sibling_conjunct_chart_manager):
-        charts = sibling_conjunct_chart_manager.charts()
+    def __init__(self, chart_manager):
+        charts = chart_manager.charts()
         non_ellipses_charts = tuple(Chart() for i in range(len(charts)))
         for index, chart in enumerate(charts):
             for state in chart.states():
                 if not isinstance(state, EllipsisState):
                     non_ellipses_charts[index].add_state(state)
-        self._tree_generator = self.build_tree_generator(ChartManager(non_ellipses_charts, sibling_conjunct_chart_manager.start_symbol(), sibling_conjunct_chart_manager.tokens()))
+        self._chart_manager = chart_manager
+        self._tree_generator = EllipsisParseTreeGenerator(ChartManager(non_ellipses_charts, chart_manager.start_symbol(), chart_manager.tokens()))
+        # category -> ((finished state, lhs without the features, which may differ in gapping), ...)
+        self._by_category = {}
+        for finished_state in self._tree_generator.finished_states():
+            finished_state_lhs = finished_state.rule().lhs()
+            # gapping need lemma identity (and to be precise contrastiveness too) =>
+            finished_state_lhs_gapping = FeatStructNonTerm(finished_state_lhs.term().filter_feature('number', 'person'))
+            self._by_category.setdefault(finished_state_lhs.key(), []).append((finished_state, finished_state_lhs_gapping))
+        self._antecedents = {}
+
+    def chart_manager(self):
+        return self._chart_manager
+
+    def tree_generator(self):
+        return self._tree_generator
+
+    def finished_states(self, category):
+        """
+        :return: the finished states of the category
+        """
+        return tuple(finished_state for finished_state, gapping in self._by_category.get(category, ()))
+
+    def antecedents(self, nonterminal):
+        """
+        :return: the finished states, which may be elided in place of the nonterminal
+        """
+        try:
+            return self._antecedents[nonterminal]
+        except KeyError:
+            antecedents = tuple(finished_state for finished_state, gapping in self._by_category.get(nonterminal.key(), ())
+                                if nonterminal.test_unify(gapping))
+            self._antecedents[nonterminal] = antecedents
+            return antecedents
+
+
+class EllipsisEarleyParser(EarleyParser):
+
+    def __init__(self, grammar, compact=False, **kwargs):
+        if compact:
+            raise ValueError("EllipsisEarleyParser adds EllipsisStates, which a CompactChart can not store")
+        super().__init__(grammar, **kwargs)
+
+    def build_tree_generator(self, chart_manager):
+        return EllipsisParseTreeGenerator(chart_manager)
+
+    def set_sibling_conjunct_chart_manager(self, sibling_conjunct_chart_manager):
+        """
+        :param sibling_conjunct_chart_manager: chart manager of the sibling conjunct or its ``SiblingConjunct``
+        """
+        if not isinstance(sibling_conjunct_chart_manager, SiblingConjunct):
+            sibling_conjunct_chart_manager = SiblingConjunct(sibling_conjunct_chart_manager)
+        self._sibling_conjunct = sibling_conjunct_chart_manager
+        self._tree_generator = sibling_conjunct_chart_manager.tree_generator()
 
     def predictor(self, state, token_index):
         lhs = state.next_symbol()
@@ -221,15 +276,10 @@ class EllipsisEarleyParser(EarleyParser):
         # completed rule to the current chart
         state_lhs = state.rule().lhs()
         if 'S' != lhs.key() and 'S' == state_lhs.key():
-            for finished_state in self._tree_generator.finished_states():
-                finished_state_lhs = finished_state.rule().lhs()
-                # gapping need lemma identity (and to be precise contrastiveness too) =>
-                if lhs.key() == finished_state_lhs.key():
-                    finished_state_lhs_gapping = finished_state_lhs.term().filter_feature('number', 'person')
-                    if lhs.test_unify(FeatStructNonTerm(finished_state_lhs_gapping)):
-                        ellipsis_state = EllipsisState(finished_state, self._tree_generator, token_index=token_index)
-                        chart.remove_state_if_present(ellipsis_state)
-                        chart.add_state(ellipsis_state)
+            for finished_state in self._sibling_conjunct.antecedents(lhs):
+                ellipsis_state = EllipsisState(finished_state, self._tree_generator, token_index=token_index)
+                chart.remove_state_if_present(ellipsis_state)
+                chart.add_state(ellipsis_state)
 
     # def scanner(self, state, token_index):
     #     if self._tokens[token_index] == state.next_symbol():
@@ -249,8 +299,13 @@ class EllipsisEarleyParser(EarleyParser):
 
 class AbstractParseTreeGenerator:
 
-    def __init__(self):
+    def __init__(self, words_map=None):
+        """
+        :param words_map: Counter of the input words. If given, partial trees which use a word more often
+        than the input are pruned as soon as they are built.
+        """
         self._completed = {}
+        self._words_map = words_map
 
     def parseTrees(self, chart_manager):
         charts = chart_manager.charts()
@@ -267,7 +322,12 @@ class AbstractParseTreeGenerator:
 
 class ParseTreeGenerator(AbstractParseTreeGenerator):
 
-    def buildTrees(self, state, parent_states):
+    def buildTrees(self, state, parent_states, budget=None):
+        """
+        :param budget: Counter of the words the tree may use, defaults to the words map of the generator
+        """
+        if budget is None:
+            budget = self._words_map
         root = Node(state.rule().lhs(), state.from_index(), state.to_index())
         result = [root,]
         new_result = []
@@ -298,14 +358,21 @@ class ParseTreeGenerator(AbstractParseTreeGenerator):
                                    and st not in parent_states
                                    and test_unify(cs.term(), st.rule().lhs().term())) #  cs.unify(st.rule().lhs())
 
-                    for child in itertools.chain.from_iterable(self.buildTrees(st, set(parent_states)) for st in states):
-                        new_result.append(Node.from_Node_and_child(tempRoot, child))
+                    # the child may only use the words left over by its preceding siblings
+                    child_budget = None if budget is None else budget - tempRoot.wordsmap()
+                    for child in itertools.chain.from_iterable(self.buildTrees(st, set(parent_states), child_budget) for st in states):
+                        if budget is None or within_budget(tempRoot.wordsmap(), child.wordsmap(), budget):
+                            new_result.append(Node.from_Node_and_child(tempRoot, child))
                 if not cs.is_nullable():
                     result.clear()
 
             else: # if isinstance Leaf
+                leaf_words = Counter({cs: 1})
                 for tempRoot in result:
-                    new_result.append(Node.from_Node_and_child(tempRoot, LeafNode(cs, state.from_index(), state.to_index())))
+                    # the leaf may only use a word left over by its preceding siblings
+                    if budget is None or within_budget(tempRoot.wordsmap(), leaf_words, budget):
+                        new_result.append(Node.from_Node_and_child(tempRoot, LeafNode(cs, state.from_index(), state.to_index())))
+                # clear result, because we must add new leaves anyway
                 result.clear()
 
             if new_result:
@@ -317,65 +384,224 @@ class ParseTreeGenerator(AbstractParseTreeGenerator):
 
         return (node for node in result if node.has_consistent_children())
 
-class PermutationParseTreeGenerator(AbstractParseTreeGenerator):
+class PermutationParseTreeGenerator(ParseTreeGenerator):
 
     def __init__(self, words_map):
-        super().__init__()
-        self._words_map = words_map
-
-    def buildTrees(self, state, parent_states):
-        root = Node(state.rule().lhs(), state.from_index(), state.to_index())
-        result = [root,]
-        new_result = []
-        parent_states.add(state)
-
-        for i,cs in enumerate(state.rule().rhs(), 0):
-            if isinstance(cs, Term):
-                type = cs.term().get(TYPE)
-                to_index = None
-                from_index = None
-
-                if i == (len(state.rule()) - 1):
-                    to_index = state.to_index()
-
-                if i == 0:
-                    from_index = state.from_index()
-
-                # Generate alternatives
-                for tempRoot in result:
-                    if from_index is None:
-                        local_from_index = tempRoot.last_child_to_index()
-                    else:
-                        local_from_index = from_index
-
-                    states = (st for st in self._completed.get(hash((type, local_from_index)), tuple()) if
-                                    st.from_index() == local_from_index
-                                    and (to_index == st.to_index() or (to_index is None and st.to_index() <= state.to_index()))
-                                    and st not in parent_states
-                                    and test_unify(cs.term(), st.rule().lhs().term())) #cs.unify()
-
-                    for child in itertools.chain.from_iterable(self.buildTrees(st, set(parent_states)) for st in states):
-                        test_node = Node.from_Node_and_child(tempRoot, child)
-                        if test_node.validate_by_input(self._words_map):
-                            new_result.append(test_node)
-                if not cs.is_nullable():
-                    result.clear()
-
-            else: # if isinstance Leaf
-                for tempRoot in result:
-                    new_result.append(Node.from_Node_and_child(tempRoot, LeafNode(cs, state.from_index(), state.to_index())))
-                # clear result, because we must add new leaves anyway
-                result.clear()
-
-            if new_result:
-                # This condition was replaced because of optimization reasons by two result.clear() above
-                # if not isinstance(cs, Term) or not cs.is_nullable():
-                #     result.clear()
-
-                result.extend(new_result)
-                new_result.clear()
-
-        return (node for node in result if node.has_consistent_children())
+        super().__init__(words_map)
+
+
+def within_budget(words_map, added_words_map, budget):
+    """
+    :return: True if the words of both Counters together do not exceed the budget
+    """
+    for word, number in added_words_map.items():
+        if words_map[word] + number > budget[word]:
+            return False
+    return True
+
+
+class PackedForest:
+    """
+    Shared packed parse forest over finished states. There is one node per finished state (the state
+    carries its span), whose derivations are memoized as alternatives of the rightmost child and the
+    span left for the preceding children. Trees are built one at a time from the forest and the number
+    of trees is computed without building them.
+
+    The children of a derivation cover the span of their parent without gaps, a nullable nonterminal
+    may be left out, and a derivation never contains a state inside of itself.
+
+    Which derivations a state has inside of a cycle depends on the states above it, so the memoized
+    values are keyed by the path: the states of its strongly connected component which contain it.
+    Outside of cycles the path is empty and every state is counted once.
+    """
+
+    def __init__(self, charts, find_state):
+        """
+        :param charts: charts with the finished ``ExtendedState``s, indexed by the end of the state
+        :param find_state: function(non_terminal, states), which yields the states matching the non_terminal
+        """
+        self._find_state = find_state
+        self._finished = []
+        for chart in charts:
+            finished = {}
+            for state in chart.states():
+                finished.setdefault(state.rule().lhs().key(), []).append(state)
+            self._finished.append(finished)
+        self._alternatives = {}
+        self._counts = {}
+        self._children_counts = {}
+        self._components = {}
+        # number of the nodes of the trees built so far
+        self._built_nodes = 0
+
+    def count(self, state):
+        """
+        :return: number of trees of the ``ExtendedState``
+        """
+        return self._count(state, frozenset())
+
+    def _count(self, state, path):
+        key = (state, path)
+        count = self._counts.get(key)
+        if count is None:
+            count = self._count_children(state, len(state.rule()), state.to_index(), path | {state})
+            self._counts[key] = count
+        return count
+
+    def _count_children(self, state, position, end, path):
+        if position == 0:
+            return 1 if end == state.from_index() else 0
+        key = (state, position, end, path)
+        count = self._children_counts.get(key)
+        if count is None:
+            count = 0
+            for child, start in self.alternatives(state, position, end, path):
+                children_count = self._count_children(state, position - 1, start, path)
+                if isinstance(child, ExtendedState):
+                    children_count *= self._count(child, self._child_path(state, child, path))
+                count += children_count
+            self._children_counts[key] = count
+        return count
+
+    def alternatives(self, state, position, end, path=None):
+        """
+        Return the alternatives for the child at ``position - 1`` of the state, if that child ends at ``end``.
+        :param path: the state and the states of its component above it, defaults to the state only
+        :return: tuple of (child, start) pairs, where child is an ``ExtendedState``, a terminal or None for
+        an omitted nullable nonterminal, and start is the end of the preceding children
+        """
+        if path is None:
+            path = frozenset((state,))
+        key = (state, position, end, path)
+        alternatives = self._alternatives.get(key)
+        if alternatives is None:
+            alternatives = []
+            from_index = state.from_index()
+            symbol = state.rule().get_symbol(position - 1)
+            if isinstance(symbol, Term):
+                candidates = self._finished[end].get(symbol.key(), ()) if end < len(self._finished) else ()
+                for child in self._find_state(symbol, reversed(candidates)):
+                    start = child.from_index()
+                    if start >= from_index and child not in path and \
+                            self._count(child, self._child_path(state, child, path)) and \
+                            self._count_children(state, position - 1, start, path):
+                        alternatives.append((child, start))
+                if symbol.is_nullable() and self._count_children(state, position - 1, end, path):
+                    alternatives.append((None, end))
+            elif end > from_index and self._count_children(state, position - 1, end - 1, path):
+                alternatives.append((symbol, end - 1))
+            alternatives = tuple(alternatives)
+            self._alternatives[key] = alternatives
+        return alternatives
+
+    def _child_path(self, state, child, path):
+        """
+        :return: the path of the child, which is empty unless the child is in the component of the state
+        """
+        component = self._component(state)
+        if child in component:
+            return path & component
+        return frozenset()
+
+    def _component(self, state):
+        """
+        :return: frozenset of the states of the strongly connected component of the state
+        """
+        component = self._components.get(state)
+        if component is None:
+            self._find_components(state)
+            component = self._components[state]
+        return component
+
+    def _find_components(self, root):
+        """
+        Tarjan's algorithm over the states reachable from root, which are not in a component yet.
+        """
+        index = {root: 0}
+        lowlink = {root: 0}
+        stack = [root]
+        on_stack = {root}
+        work = [(root, iter(self._successors(root)))]
+        while work:
+            state, successors = work[-1]
+            for child in successors:
+                if child in self._components:
+                    continue
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(self._successors(child))))
+                    break
+                if child in on_stack:
+                    lowlink[state] = min(lowlink[state], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[state])
+                if lowlink[state] == index[state]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is state:
+                            break
+                    component = frozenset(component)
+                    for member in component:
+                        self._components[member] = component
+
+    def _successors(self, state):
+        """
+        Yield the finished states, which may be a child of the state.
+        """
+        from_index = state.from_index()
+        last = min(state.to_index(), len(self._finished) - 1)
+        for symbol in set(symbol for symbol in state.rule().rhs() if isinstance(symbol, Term)):
+            for end in range(from_index, last + 1):
+                for child in self._find_state(symbol, self._finished[end].get(symbol.key(), ())):
+                    if child.from_index() >= from_index:
+                        yield child
+
+    def trees(self, state):
+        """
+        Yield the trees of the ``ExtendedState`` one by one.
+        """
+        return self._trees(state, frozenset())
+
+    def _trees(self, state, path):
+        if self._count(state, path):
+            root = Node(state.rule().lhs(), state.from_index(), state.to_index())
+            for children in self._children(state, len(state.rule()), state.to_index(), path | {state}):
+                self._built_nodes += 1
+                yield Node.from_Node_and_children(root, children)
+
+    def stats(self):
+        """
+        :return: dict with the number of the counted forest nodes, of their derivation alternatives
+            and of the tree nodes built so far
+        """
+        return {'nodes': len(self._counts),
+                'alternatives': sum(len(alternatives) for alternatives in self._alternatives.values()),
+                'built_nodes': self._built_nodes}
+
+    def _children(self, state, position, end, path):
+        if position == 0:
+            if end == state.from_index():
+                yield ()
+            return
+        for child, start in self.alternatives(state, position, end, path):
+            if child is None:
+                yield from self._children(state, position - 1, start, path)
+            elif isinstance(child, ExtendedState):
+                for node in self._trees(child, self._child_path(state, child, path)):
+                    for children in self._children(state, position - 1, start, path):
+                        yield children + (node,)
+            else:
+                leaf = LeafNode(child, start, end)
+                for children in self._children(state, position - 1, start, path):
+                    yield children + (leaf,)
 
 
 class ChartTraverseParseTreeGenerator:
@@ -388,9 +614,32 @@ class ChartTraverseParseTreeGenerator:
             for state in chart.states():
                 if state.is_finished():
                     self._charts[i].add_state(ExtendedState(state, i))
+        self._forest = None
+
+    def forest(self):
+        if self._forest is None:
+            self._forest = PackedForest(self._charts, self.find_state)
+        return self._forest
 
     def parseTrees(self, chart_manager):
-        return itertools.chain.from_iterable(self.countdown(ExtendedState(st, self._tokens_number), set(), self._tokens_number) for st in chart_manager.final_states())
+        """
+        :return: iterator, which builds the trees of the final states one at a time
+        """
+        forest = self.forest()
+        return itertools.chain.from_iterable(forest.trees(ExtendedState(st, self._tokens_number)) for st in chart_manager.final_states())
+
+    def count_trees(self, chart_manager):
+        """
+        :return: number of the trees of the final states without building them
+        """
+        forest = self.forest()
+        return sum(forest.count(ExtendedState(st, self._tokens_number)) for st in chart_manager.final_states())
+
+    def stats(self):
+        """
+        :return: the counters of the packed forest, see ``PackedForest.stats``
+        """
+        return self.forest().stats()
 
     def parseState(self, state):
         yield from self.countdown(state, set(), state.to_index())
@@ -454,6 +703,10 @@ class EllipsisParseTreeGenerator(ChartTraverseParseTreeGenerator):
             for state in chart.states():
                 yield ExtendedState(state, index)
 
+    def parseTrees(self, chart_manager):
+        # ellipsis states refer to the charts of the sibling conjunct, so they are not part of the packed forest
+        return itertools.chain.from_iterable(self.countdown(ExtendedState(st, self._tokens_number), set(), self._tokens_number) for st in chart_manager.final_states())
+
 
     def countdown(self, state, parent_states, start_index):
         parent_states.add(state)
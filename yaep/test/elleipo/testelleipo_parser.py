@@ -1,7 +1,24 @@
+import os
 import re
+import shutil
+import tempfile
 import unittest
 
-from yaep.elleipo.elleipo_parser import load_grammar, parse_ellipses
+from yaep.elleipo.elleipo_parser import load_grammar, parse_ellipses, parse_conjunct
+from yaep.parse.parse_tree_generator import SiblingConjunct
+
+GRAMMAR = """
+S[gf='conj'] -> NP[gf='subj'] V[gf='head', number='sg', person='3', stem='eat'] NP[gf='dobj']
+NP[gf='subj'] -> PropN[gf='head', number='sg', person='3', stem='Hans']
+NP[gf='subj'] -> PropN[gf='head', number='sg', person='3', stem='Peter']
+NP[gf='dobj'] -> N[gf='head', number='pl', person='3', stem='apple']
+NP[gf='dobj'] -> N[gf='head', number='pl', person='3', stem='pear']
+PropN[gf='head', number='sg', person='3', stem='Hans'] -> 'Hans'
+PropN[gf='head', number='sg', person='3', stem='Peter'] -> 'Peter'
+V[gf='head', number='sg', person='3', stem='eat'] -> 'ißt'
+N[gf='head', number='pl', person='3', stem='apple'] -> 'Äpfel'
+N[gf='head', number='pl', person='3', stem='pear'] -> 'Birnen'
+"""
 
 
 class TestEllipsisEarleyParser(unittest.TestCase):
@@ -92,6 +109,42 @@ class TestEllipsisEarleyParser(unittest.TestCase):
     #     self.assertEqual(len(self.rule), 2)
 
 
+class TestSiblingConjunct(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'grammar.cf'), 'w', encoding='utf8') as f:
+            f.write(GRAMMAR)
+        self.grammar = load_grammar(self.directory + os.sep, 'grammar.cf')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testantecedents(self):
+        manager, dominance_structures = parse_conjunct(self.grammar, "Hans ißt Äpfel".split())
+        sibling_conjunct = SiblingConjunct(manager)
+        self.assertEqual(sorted((state.from_index(), state.to_index()) for state in sibling_conjunct.finished_states('NP')),
+                         [(0, 1), (2, 3)])
+
+        verb = self.grammar.find_rule(self.grammar.start())[0].rhs()[1]
+        antecedents = sibling_conjunct.antecedents(verb)
+        self.assertEqual([state.rule().lhs().key() for state in antecedents], ['V'])
+        self.assertIs(sibling_conjunct.antecedents(verb), antecedents)
+
+        # a chart manager and its SiblingConjunct are equivalent siblings
+        sibling_manager, ellipses = parse_conjunct(self.grammar, "Peter Birnen".split(), sibling_conjunct)
+        self.assertEqual(len(ellipses), 1)
+        sibling_manager, ellipses = parse_conjunct(self.grammar, "Peter Birnen".split(), manager)
+        self.assertEqual(len(ellipses), 1)
+
+    def testparse_ellipses(self):
+        for tokens, leaves in (("Hans ißt Äpfel und Peter Birnen", ['Peter', 'Birnen']),
+                               ("Hans ißt Äpfel und Peter", ['Peter', 'Äpfel'])):
+            trees = tuple(parse_ellipses(self.grammar, tokens.split()))
+            self.assertEqual(len(trees), 1)
+            self.assertEqual(len(trees[0].children()), 3)
+
+
 # class TestEarleyParser(unittest.TestCase):
 #
 #     def setUp(self):
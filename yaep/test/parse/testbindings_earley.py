@@ -0,0 +1,194 @@
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from nltk import Variable
+from nltk.featstruct import UnificationCache
+from nltk.grammar import FeatureGrammar, FeatStructNonterminal
+from yaep.parse.bindings_earley import BindingsGrammar, BindingsEarleyParser, ParseService, \
+    prefix_permutation_parse_trees_builder, BindingsPermutationEarleyParser
+from yaep.parse.earley import Rule, feat_struct_nonterminal_to_term, feature_grammar, load_grammar, \
+    productions_digest, COMPILED_GRAMMAR_VERSION
+
+GRAMMAR = """
+S -> NP[num=?n] VP[num=?n]
+NP[num=?n] -> N[num=?n]
+VP[num=?n] -> V[num=?n] NP
+N[num='sg'] -> 'Mary' | 'Jan'
+V[num='sg'] -> 'sees'
+"""
+
+
+def bindings_grammar(grammar_str):
+    grammar = FeatureGrammar.fromstring(grammar_str)
+    return BindingsGrammar((Rule(feat_struct_nonterminal_to_term(production.lhs()),
+                                 (feat_struct_nonterminal_to_term(fs) for fs in production.rhs()))
+                            for production in grammar.productions()),
+                           None, feat_struct_nonterminal_to_term(grammar.start()))
+
+
+class TestParseService(unittest.TestCase):
+
+    def setUp(self):
+        self.grammar = bindings_grammar(GRAMMAR)
+        self.tokens = "Mary sees Jan".split()
+
+    def testparse_permutations(self):
+        with ParseService(self.grammar, BindingsEarleyParser, processes=2, chunksize=2) as service:
+            trees = tuple(service.parse_permutations(self.tokens))
+            # Mary sees Jan, Jan sees Mary
+            self.assertEqual(len(trees), 2)
+            for tree in trees:
+                self.assertEqual(tree.wordsmap(), Counter(self.tokens))
+
+            # the service can be reused after an early stop
+            self.assertEqual(len(tuple(service.parse_permutations(self.tokens, budget=1))), 1)
+            self.assertEqual(len(tuple(service.parse_permutations(self.tokens))), 2)
+
+    def testparse_interleaved(self):
+        with ParseService(self.grammar, BindingsEarleyParser, processes=2, chunksize=1) as service:
+            full = service.parse_permutations(self.tokens)
+            trees = [next(full)]
+            # stopping another call does not skip the sequences of this one
+            self.assertEqual(len(tuple(service.parse_permutations(self.tokens, budget=1))), 1)
+            trees.extend(full)
+            self.assertEqual(len(trees), 2)
+
+    def testparse_budget_window(self):
+        consumed = []
+
+        def token_sequences():
+            for tokens in itertools.permutations(self.tokens):
+                consumed.append(tokens)
+                yield tokens
+
+        with ParseService(self.grammar, BindingsEarleyParser, processes=1, chunksize=1) as service:
+            self.assertEqual(len(tuple(service.parse(token_sequences(), budget=1))), 1)
+        # no sequences are submitted once the budget is reached
+        self.assertLess(len(consumed), 6)
+
+class TestPrefixPermutationParsing(unittest.TestCase):
+
+    def testprefix_permutation_parse_trees_builder(self):
+        grammar = bindings_grammar(GRAMMAR)
+        tokens = "Mary sees Jan".split()
+        trees = tuple(prefix_permutation_parse_trees_builder(tokens, grammar, BindingsEarleyParser(grammar)))
+        self.assertEqual(len(trees), 2)
+        for tree in trees:
+            self.assertEqual(tree.wordsmap(), Counter(tokens))
+
+class TestPermutationParseTreeGenerator(unittest.TestCase):
+
+    def testparseTrees(self):
+        grammar = bindings_grammar(GRAMMAR)
+        tokens = "Jan sees Mary".split()
+        parser = BindingsPermutationEarleyParser(grammar)
+        chart_manager = parser.parse(tokens, grammar.start())
+        trees = tuple(parser.build_tree_generator().parseTrees(chart_manager))
+        # partial trees using a word twice are pruned, e.g. Jan sees Jan
+        self.assertEqual(len(trees), 2)
+        for tree in trees:
+            self.assertEqual(tree.wordsmap(), Counter(tokens))
+
+    def testrepeated_terminals(self):
+        grammar = bindings_grammar("""
+        S -> N VP | 'Jan' 'Jan' 'sees'
+        N -> 'Jan' 'Mary' | 'Mary'
+        VP -> 'sees'
+        """)
+        tokens = "Jan Mary sees".split()
+        parser = BindingsPermutationEarleyParser(grammar)
+        chart_manager = parser.parse(tokens, grammar.start())
+        # the second Jan exceeds the words of the input
+        trees = tuple(parser.build_tree_generator().parseTrees(chart_manager))
+        self.assertEqual([tree.wordsmap() for tree in trees], [Counter(tokens)])
+
+class TestBindingsGrammar(unittest.TestCase):
+
+    def testfind_rule(self):
+        grammar = bindings_grammar(GRAMMAR)
+        non_terminal = feat_struct_nonterminal_to_term(FeatStructNonterminal("NP[num=?n]"))
+        value = FeatStructNonterminal("[num='sg']")
+        bindings = {Variable('?n'): value}
+        predicted = grammar.find_rule(non_terminal, bindings)
+        self.assertEqual(len(predicted), 1)
+        # the value of the caller is not frozen by the key of the prediction cache
+        self.assertFalse(value.frozen())
+        hits = grammar.prediction_cache().hits
+        self.assertEqual(grammar.find_rule(non_terminal, {Variable('?n'): value.copy()}), predicted)
+        self.assertEqual(grammar.prediction_cache().hits, hits + 1)
+
+
+class TestUnificationCache(unittest.TestCase):
+
+    def testparse(self):
+        grammar = bindings_grammar(GRAMMAR)
+        cache = UnificationCache(64, treatBool=False)
+        parser = BindingsEarleyParser(grammar)
+        cached_parser = BindingsEarleyParser(grammar, unification_cache=cache)
+        for tokens in ("Mary sees Jan".split(), "Jan sees Mary".split()):
+            chart_manager = parser.parse(tokens, grammar.start())
+            cached_chart_manager = cached_parser.parse(tokens, grammar.start())
+            for chart, cached_chart in zip(chart_manager.charts(), cached_chart_manager.charts()):
+                self.assertEqual(list(chart.states()), list(cached_chart.states()))
+        # the second sentence repeats the unifications of the first one
+        self.assertTrue(cache.hits > 0)
+        self.assertTrue(len(cache) <= cache.maxsize())
+
+    def teststats(self):
+        grammar = bindings_grammar(GRAMMAR)
+        cache = UnificationCache(64, treatBool=False)
+        for unification_cache in (None, cache):
+            parser = BindingsEarleyParser(grammar, unification_cache=unification_cache, stats=True)
+            stats = parser.parse("Mary sees Jan".split(), grammar.start()).stats()
+            self.assertTrue(stats.unifications > 0)
+            self.assertTrue(stats.unification_failures <= stats.unifications)
+            self.assertTrue(stats.calls['completer'] > 0)
+        self.assertTrue(cache.misses > 0)
+
+class TestCompiledGrammar(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'grammar.pickle')
+        self.grammar = FeatureGrammar.fromstring(GRAMMAR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testfeature_grammar(self):
+        compiled = feature_grammar(self.grammar, BindingsGrammar, self.path)
+        digest = productions_digest(self.grammar.productions())
+        self.assertEqual(productions_digest(reversed(self.grammar.productions())), digest)
+
+        loaded = feature_grammar(self.grammar, BindingsGrammar, self.path)
+        self.assertIsNot(loaded, compiled)
+        self.assertIsInstance(loaded, BindingsGrammar)
+        # the predictions were compiled before saving
+        self.assertTrue(loaded._compiled)
+        self.assertEqual(len(loaded._compiled), len(compiled._compiled))
+        for rule in (rule for rules in loaded._rules.values() for rule in rules):
+            self.assertEqual(hash(rule), hash(pickle.loads(pickle.dumps(rule))))
+
+        tokens = "Mary sees Jan".split()
+        chart_manager = BindingsEarleyParser(loaded).parse(tokens, bindings_grammar(GRAMMAR).start())
+        self.assertTrue(chart_manager.is_recognized())
+
+        # other productions or another format invalidate the file
+        self.assertIsNone(load_grammar(self.path, productions_digest(self.grammar.productions()[1:])))
+        self.assertIsNone(load_grammar(os.path.join(self.directory, 'missing.pickle'), digest))
+
+        # so do classes that were renamed or removed since the grammar was saved
+        for reference in (b'cyaep.parse.earley\nMissingGrammar\n.', b'cyaep.missing_module\nGrammar\n.'):
+            with open(self.path, 'wb') as f:
+                pickle.dump((COMPILED_GRAMMAR_VERSION, digest), f)
+                f.write(reference)
+            self.assertIsNone(load_grammar(self.path, digest))
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
+import io
+import json
 import unittest
 
 from nltk import CFG
 from nltk.grammar import Nonterminal
 from yaep.parse.earley import Rule, Grammar, EarleyParser, \
-    nonterminal_to_term
+    nonterminal_to_term, Chart, State, CompactChart, RuleTable
+from yaep.parse.parse_tree_generator import ExtendedState, EllipsisEarleyParser
 
 
 class TestRule(unittest.TestCase):
@@ -42,6 +45,76 @@ class TestRule(unittest.TestCase):
         self.assertEqual(len(self.rule), 2)
 
 
+class TestChart(unittest.TestCase):
+
+    def setUp(self):
+        productions = CFG.fromstring("""
+        S -> NP VP
+        NP -> Noun
+        VP -> Verb NP
+        Noun -> 'Mary'
+        """).productions()
+        self.rules = tuple(Rule(nonterminal_to_term(production.lhs()),
+                                (nonterminal_to_term(fs) for fs in production.rhs())) for production in productions)
+        self.chart = Chart()
+
+    def testexpecting(self):
+        s_rule, np_rule, vp_rule, noun_rule = self.rules
+        self.chart.add_state(State(s_rule, 0, 0))
+        self.chart.add_state(State(s_rule, 0, 1))
+        self.chart.add_state(State(s_rule, 0, 2))
+        self.chart.add_state(State(noun_rule, 0, 0))
+        np_key = np_rule.lhs().key()
+        self.assertEqual(tuple(self.chart.expecting(np_key)), (State(s_rule, 0, 0),))
+        self.assertEqual(tuple(self.chart.expecting(vp_rule.lhs().key())), (State(s_rule, 0, 1),))
+
+        # states added during the iteration are visited too
+        visited = []
+        for state in self.chart.expecting(np_key):
+            visited.append(state)
+            self.chart.add_state(State(vp_rule, 0, 1))
+        self.assertEqual(visited, [State(s_rule, 0, 0), State(vp_rule, 0, 1)])
+
+        self.chart.remove_state_if_present(State(s_rule, 0, 0))
+        self.assertEqual(tuple(self.chart.expecting(np_key)), (State(vp_rule, 0, 1),))
+
+
+class TestCompactChart(TestChart):
+
+    def setUp(self):
+        super().setUp()
+        self.chart = CompactChart(RuleTable())
+
+    def testadd_state(self):
+        s_rule, np_rule, vp_rule, noun_rule = self.rules
+        states = [State(rule, origin, dot) for rule in self.rules for origin in range(5) for dot in range(len(rule) + 1)]
+        for state in states + states:
+            self.chart.add_state(state)
+        self.assertEqual(len(self.chart), len(states))
+        self.assertEqual(list(self.chart.states()), states)
+        self.assertEqual(self.chart.get_state(3), states[3])
+        self.assertTrue(states[-1] in self.chart)
+
+        self.chart.remove_state_if_present(states[0])
+        self.assertFalse(states[0] in self.chart)
+        self.assertEqual(len(self.chart), len(states) - 1)
+        self.chart.add_state(states[0])
+        self.assertEqual(list(self.chart.states()), states[1:] + states[:1])
+
+    def testunknown_rule(self):
+        s_rule, np_rule, vp_rule, noun_rule = self.rules
+        self.chart.add_state(State(s_rule, 0, 0))
+        # looking up a state of an unknown rule does not intern the rule
+        self.assertFalse(State(np_rule, 0, 0) in self.chart)
+        self.chart.remove_state_if_present(State(vp_rule, 0, 0))
+        self.assertEqual(len(self.chart._rule_table), 1)
+        self.assertIsNone(self.chart._rule_table.lookup(np_rule))
+        self.assertEqual(len(self.chart), 1)
+
+    def testellipsis_parser(self):
+        self.assertRaises(ValueError, EllipsisEarleyParser, Grammar(self.rules, None), compact=True)
+
+
 class TestEarleyParser(unittest.TestCase):
 
     def setUp(self):
@@ -68,6 +141,120 @@ class TestEarleyParser(unittest.TestCase):
         self.parse(self.tokens1)
         self.parse(self.tokens2)
 
+    def testcompile(self):
+        grammar = self.parser._grammar
+        # NP, VP, PP, Noun, Verb, Prep; the start symbol is not set in this grammar
+        self.assertEqual(grammar.compile(), 6)
+        cache = grammar.prediction_cache()
+        self.parse(self.tokens1)
+        misses = cache.misses
+        self.parse(self.tokens2)
+        self.assertEqual(cache.misses, misses)
+        self.assertTrue(cache.hits > 0)
+        self.assertEqual(len(grammar.find_rule(self.start_nonterminal)), 1)
+
+        # the compiled predictions are not evicted by a small prediction cache
+        grammar = Grammar((rule for rules in grammar._rules.values() for rule in rules), None,
+                          self.start_nonterminal, prediction_cache_size=1)
+        self.assertEqual(grammar.compile(), 7)
+        parser = EarleyParser(grammar)
+        for tokens in (self.tokens1, self.tokens2):
+            self.assertTrue(parser.parse(tokens, self.start_nonterminal).is_recognized())
+        self.assertEqual(grammar.prediction_cache().misses, 0)
+
+    def testparse_compact(self):
+        compact_parser = EarleyParser(self.parser._grammar, compact=True)
+        for tokens in (self.tokens1, self.tokens2):
+            chart_manager = self.parser.parse(tokens, self.start_nonterminal)
+            compact_chart_manager = compact_parser.parse(tokens, self.start_nonterminal)
+            self.assertTrue(compact_chart_manager.is_recognized())
+            for chart, compact_chart in zip(chart_manager.charts(), compact_chart_manager.charts()):
+                self.assertEqual(list(chart.states()), list(compact_chart.states()))
+
+    def testparse_permutations(self):
+        recognized = tuple(chart_manager.tokens() for chart_manager in
+                           self.parser.parse_permutations(self.tokens1, self.start_nonterminal)
+                           if chart_manager.is_recognized())
+        self.assertEqual(recognized, (("Mary", "called", "Jan"), ("Jan", "called", "Mary")))
+
+        parser = EarleyParser(self.parser._grammar)
+        for chart_manager in self.parser.parse_permutations(self.tokens2, self.start_nonterminal):
+            expected = parser.parse(list(chart_manager.tokens()), self.start_nonterminal)
+            for chart, expected_chart in zip(chart_manager.charts(), expected.charts()):
+                self.assertEqual(list(chart.states()), list(expected_chart.states()))
+
+        # repeated tokens are expanded once
+        tokens = ["Jan", "called", "Jan"]
+        recognized = tuple(chart_manager.tokens() for chart_manager in
+                           self.parser.parse_permutations(tokens, self.start_nonterminal)
+                           if chart_manager.is_recognized())
+        self.assertEqual(recognized, (("Jan", "called", "Jan"),))
+
+    def testparse_trees(self):
+        tokens3 = self.tokens2 + ["from", "Frankfurt"]
+        for tokens, number_trees in ((self.tokens1, 1), (self.tokens2, 2), (tokens3, 5)):
+            chart_manager = self.parser.parse(tokens, self.start_nonterminal)
+            tree_generator = self.parser.build_tree_generator(chart_manager)
+            self.assertEqual(tree_generator.count_trees(chart_manager), number_trees)
+            trees = tuple(tree_generator.parseTrees(chart_manager))
+            self.assertEqual(len(trees), number_trees)
+            for tree in trees:
+                self.assertEqual(sum(tree.wordsmap().values()), len(tokens))
+
+    def teststats(self):
+        trace_sink = io.StringIO()
+        parser = EarleyParser(self.parser._grammar, stats=True, trace_sink=trace_sink)
+        chart_manager = parser.parse(self.tokens2, self.start_nonterminal)
+        stats = chart_manager.stats()
+        self.assertEqual(stats.states(), [len(chart) for chart in chart_manager.charts()])
+        self.assertEqual(sum(stats.categories().values()), sum(stats.states()))
+        self.assertEqual(stats.calls['scanner'], sum(1 for chart in chart_manager.charts()[:-1]
+                                                     for state in chart.states()
+                                                     if not state.is_finished() and not state.is_next_symbol_nonterminal()))
+        self.assertTrue(stats.calls['predictor'] > 0 and stats.calls['completer'] > 0)
+        self.assertTrue(sum(stats.duplicates()) > 0)
+
+        # one line per chart and one line for the parse
+        records = [json.loads(line) for line in trace_sink.getvalue().splitlines()]
+        self.assertEqual(len(records), len(self.tokens2) + 2)
+        self.assertEqual([record['token'] for record in records[:-1]], [None] + self.tokens2)
+        self.assertEqual(records[2]['states'], stats.states()[2])
+        self.assertEqual(records[-1]['tokens'], self.tokens2)
+        self.assertTrue(records[-1]['recognized'])
+        self.assertEqual(records[-1]['calls'], stats.calls)
+
+        # an unprofiled parser counts the states of the charts only
+        stats = self.parser.parse(self.tokens2, self.start_nonterminal).stats()
+        self.assertEqual(sum(stats.calls.values()), 0)
+        self.assertEqual(stats.duplicates(), chart_manager.stats().duplicates())
+
+        tree_generator = parser.build_tree_generator(chart_manager)
+        trees = tuple(tree_generator.parseTrees(chart_manager))
+        forest_stats = tree_generator.stats()
+        self.assertTrue(forest_stats['nodes'] > 0)
+        self.assertTrue(forest_stats['built_nodes'] >= len(trees))
+
+    def testcount_cyclic_trees(self):
+        # the unit rules form a cycle, so the trees of A depend on the states above it
+        grammar = CFG.fromstring("""
+        S -> A
+        A -> B | 'y' | C
+        B -> A | 'x' | C
+        C -> A | 'x'
+        """)
+        earley_grammar = Grammar((Rule(nonterminal_to_term(production.lhs()),
+                                       (nonterminal_to_term(fs) for fs in production.rhs())) for production
+                                  in grammar.productions()), None)
+        parser = EarleyParser(earley_grammar)
+        chart_manager = parser.parse(["x"], nonterminal_to_term(grammar.start()))
+        tree_generator = parser.build_tree_generator(chart_manager)
+        # every tree of the old generator covers its span here
+        expected = tuple(tree for state in chart_manager.final_states()
+                         for tree in tree_generator.parseState(ExtendedState(state, 1)))
+        self.assertEqual(len(expected), 7)
+        self.assertEqual(tree_generator.count_trees(chart_manager), len(expected))
+        self.assertEqual(len(tuple(tree_generator.parseTrees(chart_manager))), len(expected))
+
     def parse(self, tokens):
 
         chartManager = self.parser.parse(tokens, self.start_nonterminal)
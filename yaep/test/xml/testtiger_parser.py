@@ -0,0 +1,119 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from nltk.topology.pgsql import Lexicon
+from yaep.xml.tiger_parser import extract_grammar, get_wordforms, iter_graphs
+
+CORPUS = """<?xml version="1.0" encoding="UTF-8"?>
+<corpus id="test">
+<head/>
+<body>
+<s id="s1">
+<graph root="s1_500">
+<terminals>
+<t id="s1_1" word="Peter" lemma="Peter" pos="NE" morph="Nom.Sg.Masc"/>
+<t id="s1_2" word="schläft" lemma="schlafen" pos="VVFIN" morph="3.Sg.Pres.Ind"/>
+</terminals>
+<nonterminals>
+<nt id="s1_500" cat="S">
+<edge label="SB" idref="s1_1"/>
+<edge label="HD" idref="s1_2"/>
+</nt>
+</nonterminals>
+</graph>
+</s>
+<s id="s2">
+<graph root="s2_500" discontinuous="true">
+<terminals>
+<t id="s2_1" word="Maria" lemma="Maria" pos="NE" morph="Nom.Sg.Fem"/>
+<t id="s2_2" word="schläft" lemma="schlafen" pos="VVFIN" morph="3.Sg.Pres.Ind"/>
+</terminals>
+<nonterminals>
+<nt id="s2_500" cat="S">
+<edge label="SB" idref="s2_1"/>
+<edge label="HD" idref="s2_2"/>
+</nt>
+</nonterminals>
+</graph>
+</s>
+<s id="s3">
+<graph root="s3_1">
+<terminals>
+<t id="s3_1" word="Ja" lemma="ja" pos="PTKANT" morph="--"/>
+</terminals>
+<nonterminals/>
+</graph>
+</s>
+</body>
+</corpus>
+"""
+
+
+class LemmaConnection(object):
+    """
+    Stand-in for a lexicon database connection, which knows a fixed set of lemmas
+    and records the queried lemmas.
+    """
+
+    def __init__(self, lemmas, queries):
+        self._lemmas = lemmas
+        self._queries = queries
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, lemmas):
+        self._queries.append(lemmas)
+        self._found = [(lemma,) for lemma in lemmas if lemma in self._lemmas]
+
+    def __iter__(self):
+        return iter(self._found)
+
+    def close(self):
+        pass
+
+
+class TestTigerParser(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + os.sep
+        with open(os.path.join(self.directory, 'corpus.xml'), 'w', encoding='utf8') as f:
+            f.write(CORPUS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testiter_graphs(self):
+        roots = [graph.get('root') for graph in iter_graphs(self.path + 'corpus.xml')]
+        self.assertEqual(roots, ['s1_500', 's2_500', 's3_1'])
+
+    def testextract_grammar(self):
+        productions = extract_grammar(self.path, 'corpus.xml')
+        # S -> SB HD, SB -> NE, HD -> VVFIN and schläft are shared by both sentences, the single word is skipped
+        self.assertEqual(len(productions), 6)
+        self.assertEqual(sorted(productions.values()), [1, 1, 2, 2, 2, 2])
+
+        discontinuous = extract_grammar(self.path, 'corpus.xml', discontinuous_only=True)
+        self.assertEqual(sum(discontinuous.values()), 5)
+
+    def testget_wordforms(self):
+        queries = []
+        lexicon = Lexicon(connection_factory=lambda: LemmaConnection({'Peter', 'schlafen'}, queries))
+        get_wordforms(self.path, 'corpus.xml', lexicon)
+        with open(self.path + 'missing_lemmas.csv') as f:
+            missing = [tuple(row) for row in csv.reader(f, delimiter=';', quotechar='|')]
+        self.assertEqual(missing, [('NE', 'Maria', 'Nom.Sg.Fem'), ('PTKANT', 'ja', '--')])
+        # all lemmas are checked with one query
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(queries[0]), ['Maria', 'Peter', 'ja', 'schlafen'])
+
+        get_wordforms(self.path, 'corpus.xml', lexicon)
+        self.assertEqual(len(queries), 1)
+
+# Run the unittests
+if __name__ == '__main__':
+    unittest.main()
@@ -1,29 +1,64 @@
 import csv
 import xml.etree.ElementTree as ET
+from collections import Counter
 from operator import itemgetter
 
 from nltk import TYPE
 from nltk.grammar import FeatStructNonterminal, Production
-from nltk.topology.pgsql import get_word_inf, get_lemma, get_wordform
-
-
-def get_wordforms(path, file_name):
-    tree = ET.parse(path + file_name)
-    root = tree.getroot()
-
-    terminals = root.findall('body/s/graph/terminals/t')
+from nltk.topology.pgsql import get_word_inf, get_wordform, default_lexicon
+
+# number of distinct lemmas, which are checked against the lexicon at once
+LEMMA_BATCH_SIZE = 1000
+
+
+def iter_graphs(file_path):
+    """
+    Stream the sentence graphs of a TIGER XML file. Only the current ``<s>`` element is kept in memory,
+    it is cleared and detached as soon as the caller asks for the next graph.
+    """
+    body = None
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'body':
+                body = elem
+        elif elem.tag == 's':
+            graph = elem.find('graph')
+            if graph is not None:
+                yield graph
+            elem.clear()
+            if body is not None:
+                body.remove(elem)
+
+
+def get_wordforms(path, file_name, lexicon=None):
+    """
+    Write the lemmas of the corpus, which are not in the lexicon, to missing_lemmas.csv.
+    The lemmas are checked in batches of ``LEMMA_BATCH_SIZE`` against the lemmas cached by the lexicon.
+    """
+    if lexicon is None:
+        lexicon = default_lexicon()
     missing_lemmas = set()
-    for child in terminals:
-        # word = child.get('word', default=None)
-        lemma = child.get('lemma', default=None)
-        if lemma != '--':
-            lemma_inf = get_lemma(lemma)
-            if next(lemma_inf, None) is None:
+    pending = dict()    # lemma --> set of (pos, lemma, morph) of its terminals
+
+    def check_pending():
+        known = lexicon.known_lemmas(pending)
+        for lemma, lemma_infs in pending.items():
+            if lemma not in known:
+                missing_lemmas.update(lemma_infs)
+        pending.clear()
+
+    for graph in iter_graphs(path + file_name):
+        for child in graph.iterfind('terminals/t'):
+            # word = child.get('word', default=None)
+            lemma = child.get('lemma', default=None)
+            if lemma is not None and lemma != '--':
                 lemma_atr = child.attrib
-                pos = lemma_atr['pos']
-                morph = lemma_atr['morph']
                 # missing_lemmas.add((None if pos == '--' else pos, lemma, None if morph == '--' else morph))
-                missing_lemmas.add((pos, lemma, morph))
+                pending.setdefault(lemma, set()).add((lemma_atr['pos'], lemma, lemma_atr['morph']))
+        if len(pending) >= LEMMA_BATCH_SIZE:
+            check_pending()
+    if pending:
+        check_pending()
 
     if missing_lemmas:
         with open(path + 'missing_lemmas.csv', "w") as f:
@@ -31,47 +66,69 @@ def get_wordforms(path, file_name):
             for lemma_inf in sorted(missing_lemmas, key=itemgetter(0,1)):
                 csv_writer.writerow(lemma_inf)
 
-def extract_grammar(path, file_name):
-    tree = ET.parse(path + file_name)
-    root = tree.getroot()
-
-    for graph in root.findall('body/s/graph'):
-        root = graph.get('root', default=None)
+def extract_grammar(path, file_name, discontinuous_only=False):
+    """
+    :param discontinuous_only: skip the graphs which are not discontinuous
+    :return: ``Counter`` of the productions of all graphs in the corpus. The node ids are removed from the
+        counted productions, so that equal productions of different sentences are counted together.
+    """
+    productions = Counter()
+    for graph in iter_graphs(path + file_name):
         discontinuous = graph.get('discontinuous', default='').lower() == 'true'
-        if discontinuous:
-            terminals = dict()
-            nonterminals = dict()
-            tree_hierarchy = dict()
-
-            for item in graph:
-                if 'terminals' == item.tag:
-                    for term in iter(item):
-                        terminals[term.get('id')] = term
-                        # print(term.tag + ' ' + str(term.attrib))
-                        # check if terminal has a secondary edge
-                        for secedge in term:
-                           # print(secedge.tag + ' ' + str(secedge.attrib))
-                           idref = secedge.get('idref') # Modified idref of secedge to convert it to the 'normal' edge
-                           secedge.set('idref', term.get('id'))
-                           tree_hierarchy.setdefault(idref, list()).append(secedge)
-                elif 'nonterminals' == item.tag:
-                    for nt in iter(item):
-                        nt_id = nt.get('id')
-                        nonterminals[nt_id] = nt
-                        container = tree_hierarchy.setdefault(nt_id, list())
-                        for edge in nt:
-                            if edge.tag == 'edge':
-                                container.append(edge)
-                            elif edge.tag == 'secedge':
-                                idref = edge.get('idref')   # Modified idref of secedge to convert it to the 'normal' edge
-                                edge.set('idref', nt_id)
-                                tree_hierarchy.setdefault(idref, list()).append(edge)
-        # print(graph.tag + ' ' + str(graph.attrib))
-        # print tree
-        productions = list(generate_CFG(tree_hierarchy, nonterminals, terminals, root))
-        # productions = list(flat_generate_CFG(tree_hierarchy, nonterminals, terminals))
-        print("\n".join(str(prod) for prod in productions))
-        break
+        if discontinuous or not discontinuous_only:
+            productions.update(without_ids(production) for production in graph_productions(graph))
+    return productions
+
+
+def graph_productions(graph):
+    """
+    :return: iterator over the productions of a sentence graph, in which the secondary edges
+        are treated as normal edges of the nodes they refer to
+    """
+    root = graph.get('root', default=None)
+    terminals = dict()
+    nonterminals = dict()
+    tree_hierarchy = dict()
+
+    for item in graph:
+        if 'terminals' == item.tag:
+            for term in iter(item):
+                terminals[term.get('id')] = term
+                # print(term.tag + ' ' + str(term.attrib))
+                # check if terminal has a secondary edge
+                for secedge in term:
+                   # print(secedge.tag + ' ' + str(secedge.attrib))
+                   idref = secedge.get('idref') # Modified idref of secedge to convert it to the 'normal' edge
+                   secedge.set('idref', term.get('id'))
+                   tree_hierarchy.setdefault(idref, list()).append(secedge)
+        elif 'nonterminals' == item.tag:
+            for nt in iter(item):
+                nt_id = nt.get('id')
+                nonterminals[nt_id] = nt
+                container = tree_hierarchy.setdefault(nt_id, list())
+                for edge in nt:
+                    if edge.tag == 'edge':
+                        container.append(edge)
+                    elif edge.tag == 'secedge':
+                        idref = edge.get('idref')   # Modified idref of secedge to convert it to the 'normal' edge
+                        edge.set('idref', nt_id)
+                        tree_hierarchy.setdefault(idref, list()).append(edge)
+    # a sentence of a single word has no edge to build a production from
+    if root not in nonterminals:
+        return iter(())
+    return generate_CFG(tree_hierarchy, nonterminals, terminals, root)
+    # return flat_generate_CFG(tree_hierarchy, nonterminals, terminals)
+
+
+def without_ids(production):
+    """
+    :return: the production without the ``id`` features of its nonterminals
+    """
+    def strip(symbol):
+        if isinstance(symbol, FeatStructNonterminal) and 'id' in symbol:
+            return FeatStructNonterminal({key: val for key, val in symbol.items() if key != 'id'})
+        return symbol
+    return Production(strip(production.lhs()), tuple(strip(symbol) for symbol in production.rhs()))
 
 
 def generate_CFG(tree_hierarchy, nonterminals, terminals, node_id, parent=None):
@@ -133,7 +190,9 @@ if __name__ == "__main__":
     # '/home/kunz/workspace/nltk/fsa/gapping1.xml'
     #get_wordforms('../../fsa/', 'tiger_grammar.xml')
 
-    extract_grammar('../../fsa/', 'gapping_vmfin.xml')
+    productions = extract_grammar('../../fsa/', 'gapping_vmfin.xml')
+    for production, count in productions.most_common():
+        print("{}\t{}".format(count, production))
 
 
     # tokens1 = ["Mary", "called", "Jan"]